@@ -10,6 +10,7 @@
 from collections import defaultdict
 from typing import NamedTuple, Dict, Tuple, List, Set
 from itertools import product
+from time import perf_counter
 #from dataclasses import dataclass
 import pickle
 
@@ -328,6 +329,13 @@ class Observer:
         self.component_recognisers = {}
         self.relation_recognisers = {}
         self.process_recognisers = {}
+        # Batch recognisers recognise all components or relations of their
+        # kind at a time at once, see recognise_components().
+        self.component_batch_recognisers = {}
+        self.relation_batch_recognisers = {}
+
+        # {(category, kind): [calls, hits, seconds]} if counting, see enable_recogniser_stats()
+        self.recogniser_stats = None
 
 
     def dump_memory(self, path):
@@ -368,6 +376,33 @@ class Observer:
         pass
     
 
+    def enable_recogniser_stats(self, enabled=True):
+        """Count calls, hits and seconds of recognisers per kind. Adds a
+        little overhead to each call."""
+        self.recogniser_stats = {} if enabled else None
+
+    def get_recogniser_stats(self):
+        """Counts of recognisers as {category: {kind: {'calls': ..., 'hits':
+        ..., 'seconds': ...}}}, categories being component, relation and
+        process, and component-batch and relation-batch, where hits are the
+        number of components or relations recognised."""
+        stats = defaultdict(dict)
+        for (category, kind), (calls, hits, seconds) in (self.recogniser_stats or {}).items():
+            stats[category][kind] = {'calls': calls, 'hits': hits, 'seconds': seconds}
+        return dict(stats)
+
+    def _call_counted(self, category, kind, recogniser, *args, **kwargs):
+        start = perf_counter()
+        recognised = recogniser(*args, **kwargs)
+        seconds = perf_counter() - start
+        stats = self.recogniser_stats.get((category, kind))
+        if stats is None:
+            stats = self.recogniser_stats[category, kind] = [0, 0, 0.0]
+        stats[0] += 1
+        stats[1] += len(recognised) if category.endswith('-batch') else bool(recognised)
+        stats[2] += seconds
+        return recognised
+
     def recognise_component(self, kind, space, time):
         """Aka. distinction. 
         `kind` is a property name.
@@ -376,7 +411,11 @@ class Observer:
             recogniser = self.component_recognisers[kind]
         except KeyError:
             raise ValueError("Invalid compnent kind specified: " + kind)
-        if recogniser(space, time):
+        if self.recogniser_stats is None:
+            recognised = recogniser(space, time)
+        else:
+            recognised = self._call_counted('component', kind, recogniser, space, time)
+        if recognised:
             component = Component(kind, space, time)
             self.components[time][kind].append(component)
             return component
@@ -387,18 +426,66 @@ class Observer:
             recogniser = self.relation_recognisers[kind]
         except KeyError:
             raise ValueError("Invalid relation kind specified: " + kind)
-        if recogniser(comp1, comp2):
+        if self.recogniser_stats is None:
+            recognised = recogniser(comp1, comp2)
+        else:
+            recognised = self._call_counted('relation', kind, recogniser, comp1, comp2)
+        if recognised:
             relation = ComponentRelation(kind, comp1, comp2)
             self.relations[comp1.time][kind].append(relation)
             return relation
         return None
 
+    def recognise_components(self, kind, time, spaces=None):
+        """Recognise all components of `kind` at `time` at once, with the
+        batch recogniser of the kind, which returns their spaces. If
+        `spaces` are given, the recogniser of the kind is called per space
+        instead, e.g. for kinds without batch recogniser. Returns the new
+        components."""
+        recogniser = self.component_batch_recognisers.get(kind)
+        if spaces is not None or recogniser is None:
+            if spaces is None:
+                raise ValueError("No batch recogniser for component kind: " + kind)
+            components = (self.recognise_component(kind, space, time) for space in spaces)
+            return [component for component in components if component]
+        if self.recogniser_stats is None:
+            spaces = recogniser(time)
+        else:
+            spaces = self._call_counted('component-batch', kind, recogniser, time)
+        components = [Component(kind, space, time) for space in spaces]
+        self.components[time][kind] += components
+        return components
+
+    def recognise_relations(self, kind, time, pairs=None, **options):
+        """Recognise all relations of `kind` between components at `time` at
+        once, with the batch recogniser of the kind, which returns the pairs
+        of related components. `options` are passed on to it. If `pairs` are
+        given, the recogniser of the kind is called per pair instead. Returns
+        the new relations."""
+        recogniser = self.relation_batch_recognisers.get(kind)
+        if pairs is not None or recogniser is None:
+            if pairs is None:
+                raise ValueError("No batch recogniser for relation kind: " + kind)
+            relations = (self.recognise_relation(kind, comp1, comp2) for (comp1, comp2) in pairs)
+            return [relation for relation in relations if relation]
+        if self.recogniser_stats is None:
+            pairs = recogniser(time, **options)
+        else:
+            pairs = self._call_counted('relation-batch', kind, recogniser, time, **options)
+        relations = [ComponentRelation(kind, comp1, comp2) for (comp1, comp2) in pairs]
+        self.relations[time][kind] += relations
+        return relations
+
     def recognise_process(self, kind, comps_start, comps_end):
         try:
             recogniser = self.process_recognisers[kind]
         except KeyError:
             raise ValueError("Invalid process kind specified: " + kind)
-        if recogniser(comps_start, comps_end):
+        if self.recogniser_stats is None:
+            recognised = recogniser(comps_start, comps_end)
+        else:
+            recognised = self._call_counted('process', kind, recogniser, comps_start, comps_end)
+        if recognised:
             process = Process(kind, comps_start, comps_end)
             self.processes[kind].append(process)
             return process
@@ -408,5 +495,8 @@ class Observer:
         component_lists = self.components[time].values()
         components = set(comp for cl in component_lists for comp in cl)
         return components
+
+    def get_all_processes(self):
+        return [proc for procs in self.processes.values() for proc in procs]
     
             
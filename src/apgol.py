@@ -1,15 +1,21 @@
 
 from typing import NamedTuple
-from functools import partial, reduce
+from functools import partial
 from itertools import permutations, combinations, product, cycle, groupby
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, OrderedDict
 from math import sqrt
+from bisect import bisect_left
+from configparser import ConfigParser
 
-import networkx as nx
-import networkx.algorithms.isomorphism as nx_iso
+import numpy as np
 
 import ap
 import util
+import memory
+import history
+import profiling
+import quadtree
+import rules
 
 # Better integration for golly
 #import importlib
@@ -31,6 +37,51 @@ class Location(NamedTuple):
         return left <= self.x and self.x <= right and bottom <= self.y and self.y <= top
 
 
+class Episode(NamedTuple):
+    """DOC"""
+    # Note that in Golly's y-axis direction is flipped compared to the
+    # values in this this tuple. I.e. make sure bottom < top.
+    rect: tuple[int]  # left, top, right, bottom
+    start: int
+    end: int
+    label: str
+
+
+def get_episodes(config):
+    # Episodes are declared in sections named "episode <name>", either in
+    # the main config or in a side file given by computation/episodes_file.
+    episodes_file = config.get('computation', 'episodes_file', fallback=None)
+    if episodes_file:
+        config = ConfigParser()
+        if not config.read(util.get_path(episodes_file)):
+            raise ValueError("Cannot read episodes file: " + episodes_file)
+
+    episodes = []
+    for section in config.sections():
+        if not section.startswith('episode '):
+            continue
+        rect = tuple(int(v) for v in config.get(section, 'rect').split(','))
+        if len(rect) != 4:
+            raise ValueError(f"Invalid episode rect in section '{section}'.")
+        start = config.getint(section, 'start')
+        end = start + config.getint(section, 'duration')
+        label = config.get(section, 'input', fallback=None)
+        episodes.append(Episode(rect, start, end, label))
+
+    return episodes
+
+
+def get_episode_times(config):
+    """Times to observe for detecting computation in the configured episodes.
+    Episodes hold processes starting from their start to their end, so this
+    includes the time after each episode. It also includes the time before,
+    to which processes at the start are linked."""
+    times = set()
+    for episode in get_episodes(config):
+        times.update(range(max(episode.start - 1, 0), episode.end + 2))
+    return sorted(times)
+
+
 class GolCell:
     
     def __init__(self, location, time, value, ancestor=None, descendant=None):
@@ -84,37 +135,267 @@ class GolCell:
     def __repr__(self):
         flag = '#' if self.value else '.'
         return '<CELL {}@{} {}>'.format(self.location, self.time, flag)
-    
+
+
+class LazyGolCell(GolCell):
+    """Cell of an environment with delta-encoded history. Neighbours,
+    ancestor and descendant are looked up in the environment on access
+    instead of being linked, so cells kept by the observer do not keep their
+    whole frame alive."""
+
+    def __init__(self, location, time, value, environment):
+        self.location = location
+        self.time = time
+        self.value = value
+        self._hash = hash((location, time))
+        self._environment = environment
+
+    # Lazy cells are identified by location and time, as the cells of a point
+    # in time may be created more than once.
+    def __eq__(self, other):
+        if not isinstance(other, LazyGolCell):
+            return NotImplemented
+        return self.time == other.time and self.location == other.location
+    def __hash__(self):
+        return self._hash
+
+    # pickled as plain cell, without environment
+    def __reduce__(self):
+        return (GolCell, (self.location, self.time, self.value))
+
+    def get_neighbour(self, dx, dy):
+        self._get_neighbour_index(dx, dy)
+        if not dx and not dy:
+            return self
+        return self._environment.get_cell_or_none((self.location.x + dx, self.location.y + dy), self.time)
+
+    def get_neighbours(self, include_empty=False):
+        x, y = self.location
+        get_cell = self._environment.get_cell_or_none
+        neighbours = [get_cell((x + dx, y + dy), self.time) for (dx, dy) in _NEIGHBOUR_DELTAS]
+        if not include_empty:
+            neighbours = [nb for nb in neighbours if nb]
+        return neighbours
+
+    def set_neighbour(self, neighbour, dx, dy):
+        raise ValueError("Neighbours of lazy cells cannot be set.")
+
+    @property
+    def ancestor(self):
+        if not self._environment.has_time(self.time - 1):
+            return None
+        return self._environment.get_cell(self.location, self.time - 1)
+
+    @property
+    def descendant(self):
+        if not self._environment.has_time(self.time + 1):
+            return None
+        return self._environment.get_cell(self.location, self.time + 1)
+
+
+# (dx, dy) of neighbours, in the order of GolCell.get_neighbours()
+_NEIGHBOUR_DELTAS = [(dx, dy) for dy in range(-1, 2) for dx in range(-1, 2) if dx or dy]
+
 
 # rather GolWorld or GolHistory or GolEnvHist
 class GolEnvironment(ap.Discrete2DEnvironment):
 
-    def __init__(self, golly, rect):
+    HISTORY_MODES = ('full', 'delta', 'quadtree', 'packed')
+
+    def __init__(self, golly, rect, history_mode='full', keyframe_interval=64, frame_cache_size=16, rule=None,
+                 packed_frames=None, times=None):
+        """With `history_mode` 'full' all cells of all times are kept and
+        linked. With 'delta' only changes are stored (see history.py), with
+        'quadtree' each time is a quadtree sharing identical structure with
+        other places and times (see quadtree.py). With 'packed' the history
+        is read-only: `packed_frames` of `times`, which default to
+        consecutive times from 0 (see memory.PackedFrames). In all but 'full'
+        mode cells of the `frame_cache_size` most recently used times are
+        created on demand. `rule` defaults to the rule of the simulator."""
         self._golly = golly
+        if rule is None:
+            rule = golly.getrule() if golly is not None else rules.LIFE
+        self.rule = rule
         left, top, width, height = rect
         self.offset = (left, top)
         self.size = (width, height)
-        self._history = []
+        # Generations in history. All since the start, unless some were
+        # skipped; then cells of skipped generations are not available.
+        self._times = []
+        self._frame_indices = {}  # {time: index of frame}
+        self._time = 0  # generation of the simulation
+        if history_mode not in self.HISTORY_MODES:
+            raise ValueError(f"Unknown history mode: {history_mode}")
+        self.history_mode = history_mode
+        if history_mode == 'full':
+            self._history = []
+            self._live_indices = []  # per frame, indices of live cells in row-major order
+        else:
+            if history_mode == 'delta':
+                self._frames = history.DeltaFrames(width * height, keyframe_interval)
+            elif history_mode == 'quadtree':
+                self._frames = quadtree.QuadTreeFrames(rect)
+            else:
+                if packed_frames is None:
+                    raise ValueError("History mode 'packed' needs packed frames.")
+                self._frames = memory.PackedFrames(packed_frames, width)
+                self._times = list(times) if times is not None else list(range(len(packed_frames)))
+                self._frame_indices = {time: index for (index, time) in enumerate(self._times)}
+            self._frame_cells = OrderedDict()  # {time: [cell, ...]}, least recently used first
+            self._single_cells = OrderedDict()  # {time: {index: cell}} of cells looked up one by one, likewise
+            self._frame_cache_size = frame_cache_size
+
+    @staticmethod
+    def get_history_options(config):
+        """Constructor keyword arguments from the environment section."""
+        return {
+            'history_mode': config.get('environment', 'history', fallback='full'),
+            'keyframe_interval': config.getint('environment', 'keyframe_interval', fallback=64),
+            'frame_cache_size': config.getint('environment', 'frame_cache_size', fallback=16),
+        }
 
     def setup(self):
         self._golly.reset()
+        self._time = 0
         self._add_history_entry()
 
     def simulate_step(self):
         self._golly.step()
+        self._time += 1
         self._add_history_entry()
+
+    def skip_steps(self, steps):
+        """Advance the simulation by `steps` generations without adding
+        them to history, e.g. to fast-forward to a window of interest."""
+        if steps > 0:
+            self._golly.run(steps)
+            self._time += steps
                 
     def get_cell(self, location, time):
         ix, iy = location[0] - self.offset[0], location[1] - self.offset[1]
         width, height = self.size
         if ix < 0 or iy < 0 or ix >= width or iy >= height:
             raise ValueError("Coordinates out of bounds.")
-        return self._history[ix + iy * width + time * width * height]
+        if self.history_mode != 'full':
+            cells = self._frame_cells.get(time)
+            if cells is not None:
+                return cells[ix + iy * width]
+            return self._get_single_cell(ix + iy * width, time)
+        return self._history[ix + iy * width + self._get_frame_index(time) * width * height]
+
+    def get_cell_or_none(self, location, time):
+        ix, iy = location[0] - self.offset[0], location[1] - self.offset[1]
+        width, height = self.size
+        if ix < 0 or iy < 0 or ix >= width or iy >= height:
+            return None
+        return self.get_cell(location, time)
 
     # is it needed?
     def get_cells(self, time):
+        if self.history_mode != 'full':
+            return self._get_frame_cells(time)
         window = self.size[0] * self.size[1]
-        return self._history[time * window:(time + 1) * window]
+        index = self._get_frame_index(time)
+        return self._history[index * window:(index + 1) * window]
+
+    def get_live_cells(self, time, rect=None):
+        """Live cells at `time` in row-major order, only those inside `rect`
+        (left, top, width, height) if given, without going through all
+        cells."""
+        indices = self._get_live_indices(time, rect)
+        if self.history_mode == 'full':
+            start = self._get_frame_index(time) * self.size[0] * self.size[1]
+            return [self._history[start + index] for index in indices]
+
+        if time in self._frame_cells:
+            cells = self._get_frame_cells(time)
+            return [cells[index] for index in indices]
+        return [self._get_single_cell(index, time) for index in indices]
+
+    def _get_live_indices(self, time, rect=None):
+        frame_index = self._get_frame_index(time)
+        if self.history_mode == 'quadtree':
+            # rect query of the tree
+            return self._frames.get_live_indices(frame_index, rect)
+        if self.history_mode == 'full':
+            indices = self._live_indices[frame_index]
+        else:
+            indices = self._frames.get_live_indices(frame_index)
+        if rect is None:
+            return indices
+
+        left, top, width, height = rect
+        offset_x, offset_y = self.offset
+        frame_width, frame_height = self.size
+        x_start, x_end = max(left - offset_x, 0), min(left - offset_x + width, frame_width)
+        y_start, y_end = max(top - offset_y, 0), min(top - offset_y + height, frame_height)
+        if x_start >= x_end or y_start >= y_end:
+            return []
+        # indices are sorted, so the rows of the rect are a slice
+        rows = indices[bisect_left(indices, y_start * frame_width):bisect_left(indices, y_end * frame_width)]
+        return [index for index in rows if x_start <= index % frame_width < x_end]
+
+    def _get_frame_index(self, time):
+        try:
+            return self._frame_indices[time]
+        except KeyError:
+            raise ValueError(f"Time {time} not in history.") from None
+
+    def get_times(self):
+        """Generations in history, in order."""
+        return list(self._times)
+
+    def has_time(self, time):
+        return time in self._frame_indices
+
+    def write_mc(self, path, time):
+        """Write the cells at `time` as macrocell file."""
+        width = self.size[0]
+        cells = [(self.offset[0] + index % width, self.offset[1] + index // width)
+                 for index in self._get_live_indices(time)]
+        quadtree.write_mc_cells(path, cells, self.rule)
+
+    def get_values(self, time):
+        """Cell values at `time` in row-major order."""
+        if self.history_mode != 'full':
+            return [bool(value) for value in self._frames.get_values(self._get_frame_index(time))]
+        return [cell.value for cell in self.get_cells(time)]
+
+    def _get_single_cell(self, index, time):
+        # Only this cell is created, without building its whole frame.
+        cells = self._single_cells.get(time)
+        if cells is None:
+            self._get_frame_index(time)
+            cells = self._single_cells[time] = {}
+            while len(self._single_cells) > self._frame_cache_size:
+                self._single_cells.popitem(last=False)
+        else:
+            self._single_cells.move_to_end(time)
+        cell = cells.get(index)
+        if cell is None:
+            width = self.size[0]
+            location = Location(self.offset[0] + index % width, self.offset[1] + index // width)
+            value = self._frames.get_value(self._frame_indices[time], index)
+            cell = cells[index] = LazyGolCell(location, time, value, self)
+        return cell
+
+    def _get_frame_cells(self, time):
+        cells = self._frame_cells.get(time)
+        if cells is not None:
+            self._frame_cells.move_to_end(time)
+            return cells
+
+        offset_x, offset_y = self.offset
+        width, height = self.size
+        values_iter = iter(self._frames.get_values(self._get_frame_index(time)))
+        cells = [LazyGolCell(Location(x, y), time, bool(next(values_iter)), self)
+                 for y in range(offset_y, offset_y + height)
+                 for x in range(offset_x, offset_x + width)]
+
+        self._frame_cells[time] = cells
+        while len(self._frame_cells) > self._frame_cache_size:
+            self._frame_cells.popitem(last=False)
+        return cells
 
     def _get_cell_rect(self, pos, size, cells, cells_width):
         px, py = pos
@@ -142,27 +423,92 @@ class GolEnvironment(ap.Discrete2DEnvironment):
     #         values[index] = True
     #     return values
 
+    @classmethod
+    def from_frames(cls, rect, frames, golly=None, times=None, rule=None, **history_options):
+        """Rebuild an environment without simulating, e.g. from stored memory.
+        `frames` is an iterable of row-major value lists, one per time in
+        `times`, which defaults to consecutive times from 0."""
+        environment = cls(golly, rect, rule=rule, **history_options)
+        if times is None:
+            for values in frames:
+                environment._add_frame(values)
+        else:
+            for time, values in zip(times, frames):
+                environment._add_frame(values, time)
+        return environment
+
+    @classmethod
+    def from_packed_frames(cls, rect, frames, times=None, rule=None, frame_cache_size=16):
+        """Read-only environment on bit-packed `frames` (see
+        memory.PackedFrames), without copying them. Cells are created on
+        demand as with compact histories."""
+        return cls(None, rect, 'packed', frame_cache_size=frame_cache_size, rule=rule, packed_frames=frames,
+                   times=times)
+
+    def resume(self):
+        """Bring the simulation to the last time in history, e.g. after
+        rebuilding the history from a checkpoint."""
+        self._golly.reset()
+        steps = self.get_duration() - 1
+        if steps > 0:
+            self._golly.run(steps)
+        self._time = steps
+        # make sure the simulated pattern matches the recorded one
+        if self.get_values(steps) != self._get_golly_values():
+            raise ValueError(f"Simulation state at time {steps} does not match recorded history.")
+
+    def get_rect(self):
+        return [*self.offset, *self.size]
+
     def _add_history_entry(self):
+        self._add_frame(self._get_golly_values(), self._time)
+
+    def _get_golly_values(self):
         offset_x, offset_y = self.offset
         width, height = self.size
         rect = [offset_x, offset_y, width, height]
-        grid = []
+        values = [False] * (width * height)
 
-        time = self.get_duration()
         cell_data = self._golly.getcells(rect)
-        alive_cells = list(zip(cell_data[0::2], cell_data[1::2]))
+        for x, y in zip(cell_data[0::2], cell_data[1::2]):
+            values[(x - offset_x) + (y - offset_y) * width] = True
+
+        return values
+
+    def _add_frame(self, values, time=None):
+        if time is None:
+            time = self.get_duration()
+        elif time < self.get_duration():
+            raise ValueError(f"Time {time} is not after the end of history.")
+        self._frame_indices[time] = len(self._times)
+        self._times.append(time)
+
+        if self.history_mode != 'full':
+            self._frames.append(values)
+            return
+
+        offset_x, offset_y = self.offset
+        width, height = self.size
+        grid = []
+        live_indices = []
+
+        values_iter = iter(values)
 
         for y in range(offset_y, offset_y + height):
             for x in range(offset_x, offset_x + width):
                 #value = values[ix + iy * width]
                 #cell = self._grid[x + y * width]
                 #location = Location(self.offset[0] + ix, self.offset[1] + iy)
-                value = ((x, y) in alive_cells)
+                value = next(values_iter)
                 cell = GolCell(Location(x, y), time, value)
                 #cell.set_at(value, time)
+                if value:
+                    live_indices.append(len(grid))
                 grid.append(cell)
 
         self._history += grid
+        self._live_indices.append(live_indices)
+        ancestor_index = self._frame_indices.get(time - 1)
 
         # TODO merge this into loop above
         for iy in range(height):
@@ -179,15 +525,15 @@ class GolEnvironment(ap.Discrete2DEnvironment):
                         neighbour = grid[jx + jy * width]
                         cell.set_neighbour(neighbour, dx, dy)
 
-                if time > 0:
-                    index = ix + iy * width + (time - 1) * width * height
+                if ancestor_index is not None:
+                    index = ix + iy * width + ancestor_index * width * height
                     ancestor = self._history[index]
                     cell.ancestor = ancestor
                     ancestor.descendant = cell
 
     def get_duration(self):
-        width, height = self.size
-        return len(self._history) // (width * height)
+        # up to the last generation in history, including skipped ones
+        return self._times[-1] + 1 if self._times else 0
 
 
 class GolObserver(ap.Observer):
@@ -195,8 +541,59 @@ class GolObserver(ap.Observer):
     def __init__(self, environment, config):
         super().__init__()
         self.environment = environment
+        self.rule = environment.rule
         self.setup_recognisers()
         self.config = config
+        self._process_adjacency = None  # (process count, next_procs, prev_procs)
+        self._label_grids = None  # (time, component count, grids, components, dead)
+        if config.getboolean('profile', 'recognisers', fallback=False):
+            self.enable_recogniser_stats()
+
+
+    def dump_memory(self, path):
+        memory.write_memory(path, self, self.get_process_adjacency()[0])
+
+
+    @classmethod
+    def from_memory_dump(cls, path, environment, config):
+        """Observer of a memory dump. Unless given, the environment reads the
+        memory-mapped frames of the dump. Components, relations and processes
+        are created on first access (see memory.MemoryTables)."""
+        manifest, arrays = memory.read_memory(path)
+        if environment is None:
+            environment = GolEnvironment.from_packed_frames(
+                manifest['rect'], arrays['frames'], manifest.get('times'), manifest.get('rule'),
+                config.getint('environment', 'frame_cache_size', fallback=16))
+        observer = cls(environment, config)
+        memory.MemoryTables(arrays, observer).attach()
+        return observer
+
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint_log, config, golly=None):
+        """Rebuild observer and environment from a loaded checkpoint log. The
+        log continues after the last complete generation."""
+        environment = GolEnvironment.from_frames(
+            checkpoint_log.get_rect(), checkpoint_log.get_frames(), golly, checkpoint_log.get_times(),
+            checkpoint_log.get_rule(), **GolEnvironment.get_history_options(config))
+        observer = cls(environment, config)
+        checkpoint_log.restore(observer)
+        return observer
+
+
+    def get_process_adjacency(self):
+        # Cached, as several phases need it. Processes are only ever added,
+        # so the cache is valid as long as the process count is unchanged.
+        procs = self.processes['bounded-transformation']
+        if self._process_adjacency is None or self._process_adjacency[0] != len(procs):
+            next_procs, prev_procs = util.get_proc_adjacency_matrix(procs, True)
+            self._process_adjacency = (len(procs), next_procs, prev_procs)
+        return self._process_adjacency[1:]
+
+    def set_process_adjacency(self, process_links):
+        # e.g. when restored from memory, (next_procs, prev_procs)
+        procs = self.processes['bounded-transformation']
+        self._process_adjacency = (len(procs), *process_links)
 
     def setup_recognisers(self):
         
@@ -210,12 +607,20 @@ class GolObserver(ap.Observer):
             'alive-bounded': self._is_component_alive_bounded,
             #'alive-bounded-env': self._is_component_alive_bounded_env,
         }
+        self.component_batch_recognisers = {
+            'alive-single': self._recognise_components_alive_single,
+            'alive-contingent': self._recognise_components_alive_contingent,
+            'alive-bounded': self._recognise_components_alive_bounded,
+        }
 
         # component relation
         self.relation_recognisers = {
             #'dead-alive-boundary': self._recognise_dead_alive_boundary,
             'alive-single-link': self._recognise_alive_link,
         }
+        self.relation_batch_recognisers = {
+            'alive-single-link': self._recognise_relations_alive_link,
+        }
         self._create_spatial_relation_recognisers()
 
         # process
@@ -299,64 +704,21 @@ class GolObserver(ap.Observer):
         #print(f"# Observing world at time {time}.")
         
         # single alive cell components
-        cells = self.environment.get_cells(time)
-        for cell in cells:
-            space = {cell}
-            self.recognise_component('alive-single', space, time)
-
-        #print("Single alive cell components:", self.components[time]['alive-single'])
+        with profiling.phase('observe.alive-single'):
+            self.recognise_components('alive-single', time)
 
         # links between single alive cell components
-        alive_single_comps = self.components[time]['alive-single']
-        # brute force, but oh well will do for now
-        comp_pairs = combinations(alive_single_comps, 2)
-        for comp1, comp2 in comp_pairs:
-            self.recognise_relation('alive-single-link', comp1, comp2)
-
-        #print("Links between single alive cell components:", self.relations[time]['alive-single-link'])
+        with profiling.phase('observe.links'):
+            self.recognise_relations('alive-single-link', time)
 
-        # TODO check whether following algo makes more sense via low-level cells-neighbourship instead of relations
         # contingent alive cell components
-        alive_link_rels = self.relations[time]['alive-single-link']
-        comps_to_check = alive_single_comps.copy()
-        groups = []
-        while comps_to_check:
-            group = []
-            groups.append(group)
-            # deep search
-            comp_agenda = [comps_to_check.pop()]
-            while comp_agenda:
-                comp = comp_agenda.pop()
-                group.append(comp)
-                for rel in alive_link_rels:
-                    if comp == rel.first:
-                        linked_comp = rel.second
-                    elif comp == rel.second:
-                        linked_comp = rel.first
-                    else:
-                        continue
-                    if linked_comp in comps_to_check:
-                        comp_agenda.append(linked_comp)
-                        comps_to_check.remove(linked_comp)
-        # print("groups", groups)
-        # for index, group in enumerate(groups):
-        #     print('GROPU', index + 1)
-        #     for comp in group:
-        #         print(util.set_first(comp.space))
-        # group_spaces = [set.union(*[c.space for c in g]) for g in groups]
-        # print(group_spaces)
-        
-        # contingent alive cell components
-        for group in groups:
-            space = frozenset(set.union(*[comp.space for comp in group]))
-            self.recognise_component('alive-contingent', space, time)
+        with profiling.phase('observe.contingent'):
+            self.recognise_components('alive-contingent', time)
 
         # FUTURE algo for growing spaces should be somewhere else
-        for comp in self.components[time]['alive-contingent']:
-            space = frozenset(nb for ce in comp.space for nb in ce.get_neighbours())
-            # TODO better merge those components in nested structure?
-            proc = self.recognise_component('alive-bounded', space, time)
-        
+        with profiling.phase('observe.bounded'):
+            self.recognise_components('alive-bounded', time)
+
         ##print("Bounded alive cell components:", self.components[time]['alive-bounded'])
 
         ## FUTURE algo for growing spaces should be somewhere else
@@ -378,7 +740,7 @@ class GolObserver(ap.Observer):
                 print(f"Contingent alive cell components: {len(comps)}")
 
         # From here we consider temporal things (that also existed earlier).
-        if time == 0:
+        if not self.environment.has_time(time - 1):
             return
 
         # FUTURE stuff below here could be outsourced to another function
@@ -392,44 +754,45 @@ class GolObserver(ap.Observer):
         #        comps_end = frozenset([comp_ab])
         #        self.recognise_process('bounded-transformation', comps_start, comps_end)
 
-        comps_start = self.components[time - 1]['alive-contingent'].copy()
-        comps_end = self.components[time]['alive-contingent'].copy()
+        with profiling.phase('observe.processes'):
+            comps_start = self.components[time - 1]['alive-contingent'].copy()
+            comps_end = self.components[time]['alive-contingent'].copy()
 
-        # ALGO idea: Start with one component at time t1, then find all
-        # components at time t2 that match the space of selected components at
-        # at time t1, then repeat with t1 and t2 swapped. Stop after no set of
-        # components could be extended.
+            # ALGO idea: Start with one component at time t1, then find all
+            # components at time t2 that match the space of selected components at
+            # at time t1, then repeat with t1 and t2 swapped. Stop after no set of
+            # components could be extended.
         
-        # while there are still unconsidered components
-        while comps_start:
-            proc_comps_start = [comps_start.pop()]
-            proc_comps_end = []
-            space_was_extended = True
+            # while there are still unconsidered components
+            while comps_start:
+                proc_comps_start = [comps_start.pop()]
+                proc_comps_end = []
+                space_was_extended = True
 
-            while space_was_extended:
+                while space_was_extended:
 
-                space_was_extended = False
-                space_proc_start = {nb.location for co in proc_comps_start for ce in co.space for nb in ce.get_neighbours()}
+                    space_was_extended = False
+                    space_proc_start = {nb.location for co in proc_comps_start for ce in co.space for nb in ce.get_neighbours()}
 
-                # find matching processes for start components
-                for comp_end in comps_end:
-                    space_comp_end = {ce.location for ce in comp_end.space}
-                    if not space_proc_start.isdisjoint(space_comp_end):
-                        proc_comps_end.append(comp_end)
-                        comps_end.remove(comp_end)
-                        space_was_extended = True
+                    # find matching processes for start components
+                    for comp_end in comps_end:
+                        space_comp_end = {ce.location for ce in comp_end.space}
+                        if not space_proc_start.isdisjoint(space_comp_end):
+                            proc_comps_end.append(comp_end)
+                            comps_end.remove(comp_end)
+                            space_was_extended = True
 
-                # could be optimised by on-the-fly updating in loop above
-                space_proc_end = {ce.location for co in proc_comps_end for ce in co.space}
+                    # could be optimised by on-the-fly updating in loop above
+                    space_proc_end = {ce.location for co in proc_comps_end for ce in co.space}
 
-                for comp_start in comps_start:
-                    space_comp_start = {nb.location for ce in comp_start.space for nb in ce.get_neighbours()}
-                    if not space_comp_start.isdisjoint(space_proc_end):
-                        proc_comps_start.append(comp_start)
-                        comps_start.remove(comp_start)                
-                        space_was_extended = True
+                    for comp_start in comps_start:
+                        space_comp_start = {nb.location for ce in comp_start.space for nb in ce.get_neighbours()}
+                        if not space_comp_start.isdisjoint(space_proc_end):
+                            proc_comps_start.append(comp_start)
+                            comps_start.remove(comp_start)
+                            space_was_extended = True
 
-            self.recognise_process('bounded-transformation', frozenset(proc_comps_start), frozenset(proc_comps_end))
+                self.recognise_process('bounded-transformation', frozenset(proc_comps_start), frozenset(proc_comps_end))
 
         #
         # only debug output below
@@ -535,7 +898,7 @@ class GolObserver(ap.Observer):
         #             else:
         #                 prev_procs[proc_to] = [proc_from]
 
-        next_procs, prev_procs = util.get_proc_adjacency_matrix(procs, True)
+        next_procs, prev_procs = self.get_process_adjacency()
 
         # for later use
         #unlinked_procs = [p for p in procs if p not in next_procs and p not in prev_procs]
@@ -885,25 +1248,32 @@ class GolObserver(ap.Observer):
             util.send_graph_to_cytoscape(graph, "Processes")
 
 
+    def _get_episodes(self):
+        return get_episodes(self.config)
+
+
     def detect_computation(self):
+        """Returns per episode its label and the sizes of its shared, input,
+        output, noise and core nets."""
         # ALGO: find instances of computation
+        import networkx as nx
+        import networkx.algorithms.isomorphism as nx_iso
 
         # parameter: per episode, start, end, space
+        episodes = self._get_episodes()
+        if not episodes:
+            print("No episodes configured, skipping.")
+            return []
+
+        episodes_input_max_units = self.config.getint('computation', 'input_max_units', fallback=7)
+        episodes_output_min_units = self.config.getint('computation', 'output_min_units', fallback=3)
 
-        # Note that in Golly's y-axis direction is flipped compared to the
-        # values in this this tuple. I.e. make sure bottom < top.
-        episode_rect = (-38, 42, -11, 17)  # left, top, right, bottom
-        episode_rect2 = (-38 + 120, 42, -11 + 120, 17)  # left, top, right, bottom
-        episodes = [
-            # (episode_rect, 16, 16 + 88),
-            # (episode_rect, 132, 132 + 88)
-            (episode_rect, 26, 26 + 68),
-            (episode_rect, 146, 146 + 68),
-            (episode_rect2, 26, 26 + 68),
-            (episode_rect2, 146, 146 + 68),
-        ]
-        episodes_input_max_units = 7
-        episodes_output_min_units = 3
+        # from the environment, as components of loaded memories are decoded lazily
+        times = self.environment.get_times()
+        last_time = times[-1] if times else 0
+        for index, episode in enumerate(episodes):
+            if episode.end > last_time:
+                print(f"Warning: Episode {index + 1} ends at {episode.end}, but observation ends at {last_time}.")
         
         # TODO test with mis-aligned episode window starts
         
@@ -950,7 +1320,7 @@ class GolObserver(ap.Observer):
         #                     next_procs[proc_from].append(proc_to)
         #                 else:
         #                     next_procs[proc_from] = [proc_to]
-        next_procs = util.get_proc_adjacency_matrix(procs)
+        next_procs, _ = self.get_process_adjacency()
 
         graph = util.get_procs_graph(next_procs)
 
@@ -958,16 +1328,19 @@ class GolObserver(ap.Observer):
         print("Exploring episodes.")
         episode_infos = []
 
-        for index, (ep_rect, ep_start, ep_end) in enumerate(episodes):
+        for index, (ep_rect, ep_start, ep_end, ep_label) in enumerate(episodes):
 
-            print(f"- Episode {index + 1}")
+            label_str = f" (input {ep_label})" if ep_label else ""
+            print(f"- Episode {index + 1}{label_str}")
  
             ep_procs = tuple(self._filter_processes(procs, start=ep_start, end=ep_end, rect=ep_rect))
-            ep_nodes = [nid for (nid, proc) in graph.nodes(data='entity') if proc in ep_procs]
-            ep_graph = graph.subgraph(ep_nodes)
+            # copy, as node data of a view is shared with the other episodes
+            ep_graph = util.get_procs_subgraph(graph, ep_procs).copy()
             for node, data in ep_graph.nodes(data=True):
                 data['episode'] = index
-            ep_nets = [ep_graph.subgraph(cc) for cc in nx.weakly_connected_components(ep_graph)]
+            # computed once per episode, also used for expanding sub-networks below
+            ep_net_labels, ep_net_members = util.get_weak_component_labels(ep_graph)
+            ep_nets = [ep_graph.subgraph(nodes) for nodes in ep_net_members]
 
             sizes_str = ", ".join(str(size) for size in sorted((len(net) for net in ep_nets), reverse=True))
             print(f"  - Found {len(ep_nets)} networks in {len(ep_procs)} processes.")
@@ -976,8 +1349,7 @@ class GolObserver(ap.Observer):
             # next part could be optimised (it's mostly just copy-pasted)
             ep_input_end = ep_start + episodes_input_max_units
             ep_procs_early = tuple(self._filter_processes(ep_procs, start=ep_start, end=ep_input_end, rect=ep_rect))
-            ep_nodes_early = [nid for (nid, proc) in graph.nodes(data='entity') if proc in ep_procs_early]
-            ep_graph_early = graph.subgraph(ep_nodes_early)
+            ep_graph_early = util.get_procs_subgraph(graph, ep_procs_early)
             ep_nets_early = [ep_graph_early.subgraph(cc) for cc in nx.weakly_connected_components(ep_graph_early)]
 
             sizes_str = ", ".join(str(size) for size in sorted((len(net) for net in ep_nets_early), reverse=True))
@@ -985,9 +1357,12 @@ class GolObserver(ap.Observer):
             
             episode_infos.append({
                 'rect': ep_rect,
+                'label': ep_label,
                 'start': ep_start,
                 'end': ep_end,
                 'graph': ep_graph,
+                'net_labels': ep_net_labels,
+                'net_members': ep_net_members,
                 'nets': ep_nets,
                 'nets_early': ep_nets_early,
                 'input': ep_nets_early.copy(),
@@ -1025,11 +1400,9 @@ class GolObserver(ap.Observer):
             return nx_iso.is_isomorphic(g1, g2, node_match=is_node_equal)
 
         def maximise_subgraph(subgraph, episode_info):
-            # FIXME this is a bad, lazy, possibly expensive solution
             node = util.set_first(subgraph.nodes)
-            graph = episode_info['graph'].to_undirected(as_view=True)
-            nodes = nx.node_connected_component(graph, node)
-            return graph.subgraph(nodes)
+            label = episode_info['net_labels'][node]
+            return episode_info['graph'].subgraph(episode_info['net_members'][label])
 
         def is_subgraph_of(graph1, graph2):
             return all(n in graph2 for n in graph1)
@@ -1085,37 +1458,47 @@ class GolObserver(ap.Observer):
         print()
         print("Building episode-spanning super-graph.")
 
-        all_shared_nets = [ei['shared'] for ei in episode_infos]
-        unlinked_super_graph = reduce(nx.compose, [ei['graph'] for ei in episode_infos])
-        super_graph = nx.Graph(unlinked_super_graph)
+        # The super-graph is not built explicitly. Episode networks and the
+        # links between their shared sub-networks are merged in a union-find
+        # structure over integer process indices instead.
+        node_indices = dict(graph.nodes(data='index'))
+        union_find = util.UnionFind(len(node_indices))
+
+        for episode_info in episode_infos:
+            for nodes in episode_info['net_members']:
+                index_first = node_indices[util.set_first(nodes)]
+                for node in nodes:
+                    union_find.union(index_first, node_indices[node])
 
         # link super-graph subgraphs via some random nodes in shared sub-networks
+        all_shared_nets = [ei['shared'] for ei in episode_infos]
         for shared_nets in zip(*all_shared_nets):
             # shared_nets is an iterable of sets of equal shared nets (iterable length: number of episodes)
-            shared_nodes = [util.set_first(net) for net in shared_nets]
-            for node1, node2 in zip(shared_nodes[:-1], shared_nodes[1:]):
-                super_graph.add_edge(node1, node2, episode_link=True)
-
-        # Now get all the super-graph's sub-graphs that include any episode's input sub-networks.
-        input_nodes = [util.set_first(net) for ei in episode_infos for net in ei['input']]
-        core_sub_graphs = [nx.node_connected_component(super_graph, node) for node in input_nodes]
-        core_graph = super_graph.subgraph(frozenset(node for sg in core_sub_graphs for node in sg))
-
-        print(f"- Core graph has {len(core_graph)} of {len(super_graph)} nodes.")
-
-        noise_graph = super_graph.subgraph(super_graph.nodes - core_graph.nodes)
-        noise_nodes_sub_graphs = list(nx.weakly_connected_components(unlinked_super_graph.subgraph(noise_graph.nodes)))
-        # All nodes within the same noise sub-graph have the same value for the episode attribute.
-        # ... But only if they are derived from the unconnected super-graph!
-        assert all(len({noise_graph.nodes[node]['episode'] for node in nodes}) == 1 for nodes in noise_nodes_sub_graphs)
-    
-        for nodes_sub_graph in noise_nodes_sub_graphs:
-            node = util.set_first(nodes_sub_graph)
-            index = noise_graph.nodes[node]['episode']
-            # print(f"  - noise net, episode {index + 1}, size {len(nodes_sub_graph)}")
-            episode_info = episode_infos[index]
-            sub_graph = episode_info['graph'].subgraph(nodes_sub_graph)
-            episode_info['noise'].append(sub_graph)
+            shared_indices = [node_indices[util.set_first(net)] for net in shared_nets]
+            for index1, index2 in zip(shared_indices[:-1], shared_indices[1:]):
+                union_find.union(index1, index2)
+
+        labels = union_find.get_labels()
+
+        # Now mark all of the super-graph's sub-graphs that include any episode's input sub-networks.
+        input_labels = {labels[node_indices[util.set_first(net)]] for ei in episode_infos for net in ei['input']}
+        super_indices = {node_indices[node] for ei in episode_infos for node in ei['graph']}
+        node_classes = [None] * len(labels)  # {process index: 'core'|'noise'|None}
+        for index in super_indices:
+            node_classes[index] = 'core' if labels[index] in input_labels else 'noise'
+
+        print(f"- Core graph has {node_classes.count('core')} of {len(super_indices)} nodes.")
+
+        # Noise sub-graphs are the episode networks outside the core graph.
+        # Core sub-graphs are connected components of the super-graph, so
+        # any episode network lies either completely inside or outside.
+        for episode_info in episode_infos:
+            for nodes_sub_graph in episode_info['net_members']:
+                if node_classes[node_indices[util.set_first(nodes_sub_graph)]] == 'core':
+                    continue
+                # print(f"  - noise net, episode {index + 1}, size {len(nodes_sub_graph)}")
+                sub_graph = episode_info['graph'].subgraph(nodes_sub_graph)
+                episode_info['noise'].append(sub_graph)
         
         # ep_noise_nodes = {k: g for (k, g) in groupby(noise_nodes, lambda n: super_graph.nodes[n]['episode'])}
         # for index, nodes in ep_noise_nodes.items():
@@ -1171,16 +1554,26 @@ class GolObserver(ap.Observer):
         print("TODO how to detect the same output?")
 
         for index, episode_info in enumerate(episode_infos):
+            ep_graph = episode_info['graph']
             ep_start_nets = episode_info['input'] + episode_info['shared']
-            ep_start_nets_extended = [maximise_subgraph(net, episode_info) for net in ep_start_nets]
-            # episode_info['core'] = ep_start_nets_extended
+            # extend start sub-networks to their full episode networks
+            ep_start_labels = sorted({episode_info['net_labels'][util.set_first(net.nodes)] for net in ep_start_nets})
             
             # FIXME this does not really check whether there are enough output processes chained
             # good enough for now
             min_output_time = episode_info['end'] - episodes_output_min_units
-            ep_end_nodes = [n for net in ep_start_nets_extended for (n, time) in net.nodes(data='time') if time > min_output_time]
-            ep_end_graph = episode_info['graph'].subgraph(ep_end_nodes)
-            ep_end_nets = [ep_end_graph.subgraph(cc) for cc in nx.weakly_connected_components(ep_end_graph)]
+            ep_end_nodes = [n for label in ep_start_labels for n in episode_info['net_members'][label]
+                            if ep_graph.nodes[n]['time'] > min_output_time]
+
+            # end sub-networks are merged in a union-find structure like the super-graph
+            end_indices = {node: end_index for (end_index, node) in enumerate(ep_end_nodes)}
+            end_union_find = util.UnionFind(len(ep_end_nodes))
+            for node1, node2 in ep_graph.subgraph(ep_end_nodes).edges:
+                end_union_find.union(end_indices[node1], end_indices[node2])
+            end_members = {}
+            for node, label in zip(ep_end_nodes, end_union_find.get_labels()):
+                end_members.setdefault(label, []).append(node)
+            ep_end_nets = [ep_graph.subgraph(nodes) for nodes in end_members.values()]
             episode_info['output'] = ep_end_nets
 
             sizes_str = ", ".join(str(size) for size in sorted((len(net) for net in ep_end_nets), reverse=True))
@@ -1210,9 +1603,13 @@ class GolObserver(ap.Observer):
         # print table
         keys = ['shared', 'input', 'output', 'noise', 'core']
         headers = ['Episode'] + [k.capitalize() for k in keys]
-        data = [[i + 1] + [", ".join(str(s) for s in sorted((len(n) for n in ei.get(k, [])), reverse=True)) or "-" for k in keys] for (i, ei) in enumerate(episode_infos)]
+        get_episode_name = lambda i, ei: f"{i + 1} ({ei['label']})" if ei['label'] else str(i + 1)
+        data = [[get_episode_name(i, ei)] + [", ".join(str(s) for s in sorted((len(n) for n in ei.get(k, [])), reverse=True)) or "-" for k in keys] for (i, ei) in enumerate(episode_infos)]
         util.print_tabular_data(data, headers)
         print()
+        summary = [dict(episode=index + 1, label=episode_info['label'],
+                        **{k: sorted((len(n) for n in episode_info.get(k, [])), reverse=True) for k in keys})
+                   for (index, episode_info) in enumerate(episode_infos)]
 
         if self.config.getboolean('cytoscape', 'comp_summary', fallback=False):
             for index, episode_info in enumerate(episode_infos):
@@ -1261,9 +1658,9 @@ class GolObserver(ap.Observer):
         # NOT as most basic form of computation (in GOL)
         # - so in GOL, two parallel/timed NOTs are one AND
         # heuristics have their place here to determine end of computation (/ to work out proc)
-        
-        pass
-                    
+
+        return summary
+
 
     def __old_code_for_reference_do_not_use(self):
 
@@ -1366,13 +1763,16 @@ class GolObserver(ap.Observer):
         if not kinds:
             kinds = self.component_recognisers.keys()
         if not times:
-            times = list(range(self.environment.get_duration()))
+            times = self.environment.get_times()
         for time in times:
             # TODO this only looks at single-cell subspaces
             subspaces = self.environment.get_subspaces((1, 1), time)
             # allow multi-iteration
             subspaces = list(subspaces)
             for kind in kinds:
+                if kind in self.component_batch_recognisers:
+                    self.recognise_components(kind, time)
+                    continue
                 #for cell in self.environment.get_cells(time=time):
                 #    space = frozenset([cell])
                 for space in subspaces:
@@ -1386,11 +1786,19 @@ class GolObserver(ap.Observer):
 
            
     def recognise_all_relations(self, kinds=None, times=None, skip_double_dead=True):
+        """Kinds with batch recogniser are recognised at once, others per
+        pair of components."""
         if not kinds:
             kinds = self.relation_recognisers.keys()
         if not times:
-            times = list(range(len(self.universe.rects)))
+            times = self.environment.get_times()
+        batch_kinds = [kind for kind in kinds if kind in self.relation_batch_recognisers]
+        kinds = [kind for kind in kinds if kind not in self.relation_batch_recognisers]
         for time in times:
+            for kind in batch_kinds:
+                self.recognise_relations(kind, time, skip_double_dead=skip_double_dead)
+            if not kinds:
+                continue
             components = self.get_all_components_at(time)
             # FIXME this can explode
             pairs = permutations(components, 2)
@@ -1678,6 +2086,56 @@ class GolObserver(ap.Observer):
         return all(cell.value for cell in space)
 
 
+    # batch: single alive cells of the generation, from the live cells only
+    def _recognise_components_alive_single(self, time):
+        return [frozenset([cell]) for cell in self.environment.get_live_cells(time)]
+
+
+    # batch: components of linked single alive cells
+    def _recognise_components_alive_contingent(self, time):
+        comps = self.components[time]['alive-single']
+        indices = {util.set_first(comp.space): index for (index, comp) in enumerate(comps)}
+        linked = defaultdict(list)  # {index: [index, ...]}
+        for rel in self.relations[time]['alive-single-link']:
+            first, second = indices[util.set_first(rel.first.space)], indices[util.set_first(rel.second.space)]
+            linked[first].append(second)
+            linked[second].append(first)
+        # deep search, starting from the last component not yet in a group
+        spaces = []
+        grouped = [False] * len(comps)
+        for start in reversed(range(len(comps))):
+            if grouped[start]:
+                continue
+            grouped[start] = True
+            space = set()
+            agenda = [start]
+            while agenda:
+                index = agenda.pop()
+                space.update(comps[index].space)
+                for linked_index in linked[index]:
+                    if not grouped[linked_index]:
+                        grouped[linked_index] = True
+                        agenda.append(linked_index)
+            spaces.append(frozenset(space))
+        return spaces
+
+
+    # batch: contingent components grown by their neighbourhood, if no alive
+    # cell is on the boundary
+    def _recognise_components_alive_bounded(self, time):
+        spaces = []
+        for comp in self.components[time]['alive-contingent']:
+            space = frozenset(nb for ce in comp.space for nb in ce.get_neighbours())
+            # Only the grown component can lie in the space. Any other
+            # contingent component would be linked to it.
+            if not space.issuperset(comp.space):
+                continue
+            if any(cell.value for cell in space - comp.space):
+                continue
+            spaces.append(space)
+        return spaces
+
+
     def _is_component_alive_bounded(self, space, time):
         for component_alive in self.components[time]['alive-contingent']:
             if not space.issuperset(component_alive.space):
@@ -1745,6 +2203,58 @@ class GolObserver(ap.Observer):
         for kind, delta in geography.items():
             recogniser = partial(self._recognise_spatial_relation, delta)
             self.relation_recognisers[kind] = recogniser
+            self.relation_batch_recognisers[kind] = partial(self._recognise_spatial_relations, delta)
+
+
+    def _get_label_grids(self, time):
+        # Grids of the indices of single-cell components at `time` in the
+        # environment's rect, -1 where there is none, and the components.
+        # Cells with several components, e.g. of several kinds, spread them
+        # over several grids. Also whether each component is dead. Cached, as
+        # all spatial relations need them. Components are only ever added, so
+        # the cache is valid as long as the component count is unchanged.
+        count = sum(len(comps) for comps in self.components[time].values())
+        if self._label_grids is not None and self._label_grids[:2] == (time, count):
+            return self._label_grids[2:]
+
+        comps = [comp for kind_comps in self.components[time].values() for comp in kind_comps
+                 if len(comp.space) == 1]
+        (left, top), (width, height) = self.environment.offset, self.environment.size
+        locations = np.array([util.set_first(comp.space).location for comp in comps], dtype=np.int64).reshape(-1, 2)
+        indices = (locations[:, 0] - left) + (locations[:, 1] - top) * width
+        # grid of each component: number of earlier components at its cell
+        order = np.argsort(indices, kind='stable')
+        sorted_indices = indices[order]
+        starts = np.searchsorted(sorted_indices, sorted_indices)
+        layers = np.empty(len(comps), dtype=np.int64)
+        layers[order] = np.arange(len(comps)) - starts
+
+        grids = np.full((layers.max(initial=-1) + 1, height * width), -1, dtype=np.int64)
+        grids[layers, indices] = np.arange(len(comps))
+        grids = grids.reshape(-1, height, width)
+        dead = np.array([comp.kind == 'dead' for comp in comps], dtype=bool)
+        self._label_grids = (time, count, grids, comps, dead)
+        return grids, comps, dead
+
+
+    # batch: pairs of single-cell components at a time, by shifting the grids
+    # of component labels by the delta and pairing labels at the same cell
+    def _recognise_spatial_relations(self, delta, time, skip_double_dead=False):
+        grids, comps, dead = self._get_label_grids(time)
+        dx, dy = delta
+        height, width = grids.shape[1:]
+        # first component at (x, y), second at (x - dx, y - dy)
+        firsts = grids[:, max(dy, 0):height + min(dy, 0), max(dx, 0):width + min(dx, 0)]
+        seconds = grids[:, max(-dy, 0):height + min(-dy, 0), max(-dx, 0):width + min(-dx, 0)]
+        pairs = []
+        for first in firsts:
+            for second in seconds:
+                related = (first >= 0) & (second >= 0)
+                if skip_double_dead:
+                    # labels of -1 are masked out already
+                    related &= ~(dead[first] & dead[second])
+                pairs += [(comps[i], comps[j]) for (i, j) in zip(first[related].tolist(), second[related].tolist())]
+        return pairs
 
 
     def _recognise_spatial_relation(self, delta, comp1, comp2):
@@ -1770,6 +2280,19 @@ class GolObserver(ap.Observer):
         return comp1.kind == 'dead' and comp2.kind == 'alive'
 
 
+    # batch: pairs of neighbouring single alive cell components, each pair in
+    # the order of the components, none of them dead
+    def _recognise_relations_alive_link(self, time, skip_double_dead=False):
+        comps = self.components[time]['alive-single']
+        indices = {util.set_first(comp.space): index for (index, comp) in enumerate(comps)}
+        pairs = []
+        for index, comp in enumerate(comps):
+            neighbour_indices = (indices.get(nb) for nb in util.set_first(comp.space).get_neighbours())
+            linked = sorted(i for i in neighbour_indices if i is not None and i > index)
+            pairs += [(comp, comps[i]) for i in linked]
+        return pairs
+
+
     # two neighbouring alive single-cell components
     def _recognise_alive_link(self, comp1, comp2):
         if len(comp1.space) != 1 or len(comp2.space) != 1:
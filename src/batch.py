@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+
+# Parallel runs of the observer procedure over patterns and config variants.
+#
+# usage: python batch.py <sweep spec> [--output DIR] [--processes N]
+#
+# A sweep spec is an INI file. Its [sweep] section holds:
+#   patterns   pattern files or globs, relative to the spec, separated by '|'
+#   rects      optional rects 'left top width height', separated by '|'
+#   config     base config, default: config.ini of the repository
+#   processes  runs at a time, 0 for one per CPU
+#   timeout    seconds per run, 0 for none
+#   memory_mb  address space per run in MiB, 0 for no limit
+# All other sections give config values to vary, alternatives separated by
+# '|'. There is one run per combination of pattern, rect and values, e.g.:
+#   [sweep]
+#   patterns = ../and-gate*.rle
+#   timeout = 1800
+#   [observer]
+#   generations = 150 | 225
+#   strict_noise_removal = true | false
+#
+# Each run is a golicat.py process. All runs share a result cache (see
+# cache.py) in the output directory. Runs with the same observation key,
+# e.g. differing only in strict_noise_removal, observe only once: the first
+# of them runs alone and the others wait for it, then start from its cached
+# observation. The output directory gets results.csv with a row per run, and
+# logs and JSON results per run in runs/.
+
+import csv
+import resource
+import subprocess
+import sys
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from contextlib import redirect_stdout
+from glob import glob
+from itertools import product
+from json import dumps as json_dumps, load as json_load
+from os import cpu_count, devnull, killpg, makedirs
+from os.path import abspath, dirname, join as path_join, exists as path_exists, relpath
+from signal import SIGKILL
+from time import perf_counter, sleep
+
+import cache
+import engine
+import golicat
+import pipeline
+import util
+
+
+_GOLICAT_PATH = path_join(dirname(abspath(__file__)), 'golicat.py')
+
+# columns of results.csv
+_COLUMNS = ['run', 'pattern', 'rect', 'overrides', 'status', 'seconds', 'seconds_observe',
+            'seconds_detect_computation', 'processes', 'computation']
+
+
+def _split_alternatives(value):
+    return [alternative.strip() for alternative in value.split('|') if alternative.strip()]
+
+
+def read_sweep(path):
+    """Options of the [sweep] section and the runs of a sweep spec. Runs are
+    dicts with pattern path, rect (or None) and config overrides as list of
+    (section, key, value)."""
+    spec = ConfigParser()
+    if not spec.read(path):
+        raise ValueError(f"Cannot read sweep spec: {path}")
+    if not spec.has_section('sweep'):
+        raise ValueError(f"No [sweep] section in sweep spec: {path}")
+    spec_dir = dirname(abspath(path))
+
+    pattern_paths = []
+    for pattern in _split_alternatives(spec.get('sweep', 'patterns', fallback='')):
+        matches = sorted(glob(path_join(spec_dir, pattern)))
+        if not matches:
+            raise ValueError(f"No pattern files match: {pattern}")
+        pattern_paths += matches
+    if not pattern_paths:
+        raise ValueError(f"No patterns in sweep spec: {path}")
+
+    rects = [None]
+    if spec.has_option('sweep', 'rects'):
+        rects = [[int(v) for v in rect.split()] for rect in _split_alternatives(spec.get('sweep', 'rects'))]
+        if any(len(rect) != 4 for rect in rects):
+            raise ValueError(f"Invalid rect in sweep spec, expected 'left top width height': {path}")
+
+    options = {
+        'config': path_join(spec_dir, spec.get('sweep', 'config')) if spec.has_option('sweep', 'config')
+                  else golicat.DEFAULT_CONFIG_PATH,
+        'processes': spec.getint('sweep', 'processes', fallback=0) or cpu_count(),
+        'timeout': spec.getfloat('sweep', 'timeout', fallback=0) or None,
+        'memory_mb': spec.getint('sweep', 'memory_mb', fallback=0) or None,
+    }
+
+    names = [(section, key) for section in spec.sections() if section != 'sweep' for key in spec[section]]
+    alternatives = [_split_alternatives(spec.get(section, key)) for (section, key) in names]
+    runs = []
+    for pattern_path, rect in product(pattern_paths, rects):
+        for values in product(*alternatives):
+            overrides = [(section, key, value) for ((section, key), value) in zip(names, values)]
+            runs.append({'pattern': pattern_path, 'rect': rect, 'overrides': overrides})
+    return options, runs
+
+
+def prepare_runs(runs, options, output_path):
+    """Give each run an id, its paths, its rect and the observation key it
+    shares with other runs."""
+    cache_path = path_join(output_path, 'cache')
+    result_cache = cache.ResultCache(cache_path)
+    for index, run in enumerate(runs):
+        run['id'] = f'{index + 1:04d}'
+        run_path = path_join(output_path, 'runs', run['id'])
+        run['results_path'] = run_path + '.json'
+        run['log_path'] = run_path + '.log'
+        # separate files per run, but one cache for all
+        run['overrides'] = run['overrides'] + [
+            ('cache', 'enabled', 'true'),
+            ('cache', 'path', cache_path),
+            ('main', 'path_memory', run_path + '-memory'),
+            ('main', 'path_checkpoint', run_path + '-checkpoint.log'),
+            ('main', 'path_store', run_path + '-observations.sqlite'),
+        ]
+
+        config = golicat.load_config(options['config'], run['overrides'])
+        rule = config.get('engine', 'rule', fallback='') or None
+        simulator = engine.Engine.from_file(run['pattern'], rule)
+        if run['rect'] is None:
+            with open(devnull, 'w') as f, redirect_stdout(f):
+                run['rect'] = pipeline.get_simulation_rect(simulator)
+        run['key'] = result_cache.get_keys(simulator, run['rect'], config)['observation']
+        simulator.close()
+
+
+def _limit_memory(memory_mb):
+    def limit():
+        size = memory_mb * 2**20
+        resource.setrlimit(resource.RLIMIT_AS, (size, size))
+    return limit
+
+
+def _start_run(run, options):
+    command = [sys.executable, _GOLICAT_PATH, 'run', run['pattern'], '--config', options['config'],
+               '--rect', *(str(v) for v in run['rect']), '--results', run['results_path']]
+    for section, key, value in run['overrides']:
+        command += ['--set', f'{section}.{key}={value}']
+    log_file = open(run['log_path'], 'w')
+    process = subprocess.Popen(
+        command, stdout=log_file, stderr=subprocess.STDOUT, cwd=dirname(_GOLICAT_PATH),
+        start_new_session=True, preexec_fn=options['memory_mb'] and _limit_memory(options['memory_mb']))
+    return process, log_file, perf_counter()
+
+
+def _get_status(run, return_code):
+    if return_code == 0 and path_exists(run['results_path']):
+        return 'done'
+    with open(run['log_path']) as f:
+        if 'MemoryError' in f.read():
+            return 'memory'
+    return 'failed'
+
+
+def execute_runs(runs, options):
+    """Run all runs, at most `processes` at a time. Sets their status and
+    seconds."""
+    # runs wait for the first run with the same key
+    first_runs = {}
+    for run in runs:
+        first_runs.setdefault(run['key'], run)
+    pending = list(runs)
+    running = []  # (run, process, log file, start)
+    finished = 0
+
+    while pending or running:
+        for run in [run for run in pending if 'status' in first_runs[run['key']] or first_runs[run['key']] is run]:
+            if len(running) >= options['processes']:
+                break
+            pending.remove(run)
+            running.append((run, *_start_run(run, options)))
+
+        sleep(0.1)
+        for entry in list(running):
+            run, process, log_file, start = entry
+            seconds = perf_counter() - start
+            return_code = process.poll()
+            if return_code is None and options['timeout'] and seconds > options['timeout']:
+                killpg(process.pid, SIGKILL)
+                process.wait()
+                run['status'] = 'timeout'
+            elif return_code is not None:
+                run['status'] = _get_status(run, return_code)
+            else:
+                continue
+            log_file.close()
+            run['seconds'] = seconds
+            running.remove(entry)
+            finished += 1
+            print(f"Run {run['id']} ({finished}/{len(runs)}): {run['status']} after {seconds:.1f} s.", flush=True)
+
+
+def get_rows(runs, spec_dir):
+    """Rows of results.csv, one per run."""
+    rows = []
+    for run in runs:
+        results = {}
+        if run['status'] == 'done':
+            with open(run['results_path']) as f:
+                results = json_load(f)
+        seconds = results.get('seconds', {})
+        processes = results.get('processes', {})
+        overrides = [f'{section}.{key}={value}' for (section, key, value) in run['overrides']
+                     if section not in ('cache', 'main')]
+        rows.append({
+            'run': run['id'],
+            'pattern': run['pattern'] if relpath(run['pattern'], spec_dir).startswith('..')
+                       else relpath(run['pattern'], spec_dir),
+            'rect': ' '.join(str(v) for v in run['rect']),
+            'overrides': ' '.join(overrides),
+            'status': run['status'],
+            'seconds': f"{run['seconds']:.2f}",
+            'seconds_observe': f"{seconds['observe']:.2f}" if 'observe' in seconds else '',
+            'seconds_detect_computation': (f"{seconds['detect_computation']:.2f}"
+                                           if 'detect_computation' in seconds else ''),
+            'processes': processes.get('bounded-transformation', ''),
+            'computation': json_dumps(results['computation']) if results.get('computation') else '',
+        })
+    return rows
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Parallel runs of the observer procedure over a sweep spec.")
+    parser.add_argument('spec', help="sweep spec (INI)")
+    parser.add_argument('--output', default='batch', help="output directory, default: batch")
+    parser.add_argument('--processes', type=int, help="runs at a time, overrides the spec")
+    args = parser.parse_args(argv)
+
+    options, runs = read_sweep(args.spec)
+    if args.processes:
+        options['processes'] = args.processes
+    output_path = abspath(args.output)
+    makedirs(path_join(output_path, 'runs'), exist_ok=True)
+
+    prepare_runs(runs, options, output_path)
+    print(f"Sweep of {len(runs)} runs in {len({run['key'] for run in runs})} observation groups, "
+          f"{options['processes']} at a time.")
+    execute_runs(runs, options)
+
+    rows = get_rows(runs, dirname(abspath(args.spec)))
+    results_path = path_join(output_path, 'results.csv')
+    with open(results_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, _COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    columns = ['run', 'pattern', 'overrides', 'status', 'seconds', 'processes']
+    util.print_tabular_data([[row[c] for c in columns] for row in rows], [c.capitalize() for c in columns])
+    print(f"Results written to {results_path}.")
+
+
+if __name__ == '__main__':
+    main()
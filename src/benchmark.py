@@ -0,0 +1,562 @@
+#!/usr/bin/env python3
+
+# Benchmarks.
+#
+# usage: python benchmark.py engines [--sizes 256 1024 ...] [--algorithms grid bitgrid]
+#        python benchmark.py leaps [--workloads and-gate ...] [--generations 100000]
+#        python benchmark.py startup [--repeat 5]
+#        python benchmark.py workloads [--workloads soup-32 ...] [--generations 30]
+#                                      [--output new.json] [--compare old.json]
+#        python benchmark.py scaling [--sizes 16 32 ...] [--densities 0.1 0.3 ...]
+#                                    [--generations 5 10 ...] [--memory]
+#
+# engines    generations per second of engine algorithms on random soups
+#            filling square worlds of the given sizes
+# leaps      seconds to run many generations at once, e.g. when the
+#            environment fast-forwards between episodes, on the patterns of
+#            the workloads below
+# startup    seconds to start a run: importing the modules of golly-hook.py in
+#            a fresh interpreter, as measured by -X importtime, split by
+#            package, and reloading them, as golly-hook.py does on every run
+# workloads  seconds per phase of the observer procedure, run headless (see
+#            golicat.py) on bundled patterns and generated ones: random
+#            soups, glider streams, still life fields and arrays of gates;
+#            throughput as cells, components and processes per second of
+#            observing. Results are written as JSON with the commit, and
+#            compared per phase to results of an earlier commit.
+# scaling    empirical complexity per phase: runs on random soups, varying
+#            one of world size, density and generations at a time from a
+#            base, and fits seconds (and peak memory) of each phase as power
+#            of cells, population and generations respectively. Phases with
+#            exponents above the threshold are flagged.
+
+import platform
+import subprocess
+import sys
+from argparse import ArgumentParser
+from collections import defaultdict
+from contextlib import redirect_stdout
+from functools import partial
+from json import dump as json_dump, load as json_load
+from os import devnull
+from os.path import abspath, dirname, join as path_join
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import numpy as np
+
+import engine
+import golicat
+import patterns
+import util
+
+
+# modules imported and reloaded by golly-hook.py
+STARTUP_MODULES = ['ap', 'profiling', 'util', 'memory', 'history', 'quadtree', 'rules', 'patterns', 'engine', 'apgol',
+                   'sqlstore', 'cache', 'pipeline']
+
+
+def make_soup(size, density=0.5, seed=0):
+    """Square array of random cell values."""
+    rng = np.random.default_rng(seed)
+    return (rng.random((size, size)) < density).astype(np.uint8)
+
+
+def time_generations(simulator, min_time=1.0, max_generations=1000):
+    """Run generations until `min_time` seconds have passed. Returns the
+    number of generations and seconds."""
+    generations, start = 0, perf_counter()
+    while generations < max_generations:
+        simulator.run(1)
+        generations += 1
+        if perf_counter() - start >= min_time:
+            break
+    return generations, perf_counter() - start
+
+
+def benchmark_engines(sizes, algorithms, min_time=1.0, density=0.5, seed=0, processes=None):
+    """Rows of size, algorithm, generations, seconds, generations per second
+    and speedup relative to the first algorithm."""
+    rows = []
+    for size in sizes:
+        soup = make_soup(size, density, seed)
+        reference_rate = None
+        for algorithm in algorithms:
+            options = {'processes': processes} if algorithm == 'tiled' else {}
+            simulator = engine.Engine.from_array(soup, algorithm=algorithm, **options)
+            generations, seconds = time_generations(simulator, min_time)
+            simulator.close()
+            rate = generations / seconds
+            reference_rate = reference_rate or rate
+            rows.append([f'{size}x{size}', algorithm, generations, f'{seconds:.2f}', f'{rate:.2f}',
+                         f'{rate / reference_rate:.1f}x'])
+            print('.', end='', flush=True)
+    print()
+    return rows
+
+
+def _run_python(args):
+    """Run Python in src/. Returns stdout, stderr and seconds."""
+    start = perf_counter()
+    process = subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True,
+                             cwd=dirname(abspath(__file__)))
+    return process.stdout, process.stderr, perf_counter() - start
+
+
+def measure_imports(modules):
+    """Seconds to import `modules` in a fresh interpreter, and self seconds
+    of imports per top-level package."""
+    _, output, seconds = _run_python(['-X', 'importtime', '-c', 'import ' + ', '.join(modules)])
+    packages = defaultdict(float)
+    for line in output.splitlines():
+        # import time: <self us> | <cumulative us> | <indented module name>
+        fields = line.removeprefix('import time:').split('|')
+        if not line.startswith('import time:') or len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        packages[fields[2].strip().split('.')[0]] += int(fields[0]) / 1e6
+    return seconds, packages
+
+
+def measure_reload(modules):
+    """Seconds to reload already imported `modules`."""
+    code = (f'import importlib, time, {", ".join(modules)}\n'
+            f'start = time.perf_counter()\n'
+            f'for module in ({", ".join(modules)},): importlib.reload(module)\n'
+            f'print(time.perf_counter() - start)')
+    output, _, _ = _run_python(['-c', code])
+    return float(output)
+
+
+def benchmark_startup(modules, repeat=5, top=12):
+    """Rows of median seconds of interpreter start, imports and reloads,
+    and rows of the packages with the most import time."""
+    interpreter = median(_run_python(['-c', 'pass'])[2] for _ in range(repeat))
+    imports, packages = [], defaultdict(list)
+    for _ in range(repeat):
+        seconds, package_seconds = measure_imports(modules)
+        imports.append(seconds)
+        for package, package_time in package_seconds.items():
+            packages[package].append(package_time)
+        print('.', end='', flush=True)
+    reload = median(measure_reload(modules) for _ in range(repeat))
+    print()
+
+    rows = [
+        ['interpreter', f'{interpreter:.3f}'],
+        ['interpreter and imports', f'{median(imports):.3f}'],
+        ['reload', f'{reload:.3f}'],
+    ]
+    package_rows = sorted(([package, f'{median(times):.3f}', 'yes' if package in modules else '']
+                           for (package, times) in packages.items()),
+                          key=lambda row: float(row[1]), reverse=True)
+    return rows, package_rows[:top]
+
+
+#
+# workloads of the observer procedure
+#
+
+_REPOSITORY_PATH = path_join(dirname(abspath(__file__)), '..')
+
+_GLIDER = [(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)]  # heading south-east
+
+# config overrides of workload runs: observing only, no files written
+_WORKLOAD_OVERRIDES = [
+    ('main', 'load_memory', 'false'),
+    ('main', 'save_memory', 'false'),
+    ('main', 'write_checkpoint', 'false'),
+    ('main', 'write_store', 'false'),
+    ('cache', 'enabled', 'false'),
+    ('observer', 'observe_episodes_only', 'false'),
+    ('observer', 'phase_reflect', 'false'),
+    ('observer', 'phase_detect_computation', 'false'),
+    ('debug', 'verbose_observe', 'false'),
+    ('profile', 'enabled', 'true'),
+    ('profile', 'memory', 'false'),
+    ('profile', 'path_report', ''),
+    ('profile', 'cprofile_phase', ''),
+]
+
+
+def make_soup_cells(size, density=0.5, seed=0):
+    """Cells of a random soup filling a square."""
+    return patterns.array_to_cells(make_soup(size, density, seed))
+
+
+def make_glider_stream(count, spacing=8):
+    """Cells of `count` gliders side by side, on parallel paths."""
+    return {(x + index * spacing, y) for index in range(count) for (x, y) in _GLIDER}
+
+
+def make_still_life_field(size, spacing=4):
+    """Cells of blocks filling a square, apart far enough to stay still."""
+    return {(x + dx, y + dy) for y in range(0, size - 1, spacing) for x in range(0, size - 1, spacing)
+            for dx in (0, 1) for dy in (0, 1)}
+
+
+def make_gate_array(count, path='and-gate.rle', spacing=16):
+    """Cells of `count` by `count` copies of a pattern file."""
+    cells, _ = patterns.read_pattern(path_join(_REPOSITORY_PATH, path))
+    _, (left, top) = patterns.cells_to_array(cells)
+    width = max(x for (x, _) in cells) - left + 1 + spacing
+    height = max(y for (_, y) in cells) - top + 1 + spacing
+    return {(x + ix * width, y + iy * height) for (x, y) in cells for iy in range(count) for ix in range(count)}
+
+
+# {name: (pattern file or function returning cells, margin of the rect around the pattern)}
+WORKLOADS = {
+    'and-gate': ('and-gate.rle', 2),
+    'and-gate-double': ('and-gate-double.rle', 2),
+    'test-world': ('test-world.mc', 2),
+    'soup-32': (partial(make_soup_cells, 32, 0.5, 1), 8),
+    'soup-64-sparse': (partial(make_soup_cells, 64, 0.1, 1), 8),
+    'gliders-16': (partial(make_glider_stream, 16), 12),
+    'still-lifes-64': (partial(make_still_life_field, 64), 2),
+    'gates-2x2': (partial(make_gate_array, 2), 2),
+}
+
+
+def prepare_workload(name, directory):
+    """Pattern file, rect and population of a workload. Generated patterns
+    are written to `directory`."""
+    source, margin = WORKLOADS[name]
+    if isinstance(source, str):
+        path = path_join(_REPOSITORY_PATH, source)
+        cells, _ = patterns.read_pattern(path)
+    else:
+        cells = source()
+        path = path_join(directory, f'{name}.rle')
+        patterns.write_rle(path, cells)
+    return path, _get_rect(cells, margin), len(cells)
+
+
+def _get_rect(cells, margin):
+    _, (left, top) = patterns.cells_to_array(cells)
+    right = max(x for (x, _) in cells) + 1
+    bottom = max(y for (_, y) in cells) + 1
+    return [left - margin, top - margin, right - left + 2 * margin, bottom - top + 2 * margin]
+
+
+def run_workload(path, rect, generations, overrides=()):
+    """Run the observer procedure headless and profiled on a pattern file.
+    Returns the results of golicat.run()."""
+    overrides = [*_WORKLOAD_OVERRIDES, ('observer', 'generations', str(generations)), *overrides]
+    config = golicat.load_config(golicat.DEFAULT_CONFIG_PATH, overrides)
+    with open(devnull, 'w') as f, redirect_stdout(f):
+        _, results = golicat.run(path, config, rect)
+    return results
+
+
+def measure_workload(path, rect, generations, repeat=1, overrides=(), memory=False):
+    """Seconds per phase, the fastest of `repeat` runs, per generation and
+    throughput of observing. With `memory` also peak MiB per phase, of a
+    separate run, as measuring memory slows down runs."""
+    runs = [run_workload(path, rect, generations, overrides) for _ in range(repeat)]
+    phases = {name: min(run['profile']['phases'][name]['seconds'] for run in runs)
+              for name in runs[0]['profile']['phases']}
+    observed = runs[0]['observed_generations']
+    components = sum(runs[0]['components'].values())
+    processes = sum(runs[0]['processes'].values())
+    observe = phases.get('observe') or float('nan')
+    measurement = {
+        'rect': rect,
+        'generations': observed,
+        'seconds': phases,
+        'seconds_per_generation': {name: seconds / observed for (name, seconds) in phases.items()},
+        'components': components,
+        'processes': processes,
+        'throughput': {
+            'cells_per_second': rect[2] * rect[3] * observed / observe,
+            'components_per_second': components / observe,
+            'processes_per_second': processes / observe,
+        },
+    }
+    if memory:
+        run = run_workload(path, rect, generations, [*overrides, ('profile', 'memory', 'true')])
+        measurement['peak_mb'] = {name: stats['peak_mb'] for (name, stats) in run['profile']['phases'].items()}
+    return measurement
+
+
+def benchmark_leaps(names, generations, algorithms, repeat=1):
+    """Rows of workload, algorithm, generations, seconds of one run() call
+    and population after it. The fastest of `repeat` runs counts, each on a
+    fresh engine."""
+    rows = []
+    with TemporaryDirectory() as directory:
+        for name in names:
+            path, _, _ = prepare_workload(name, directory)
+            cells, rule = patterns.read_pattern(path)
+            for algorithm in algorithms:
+                times = []
+                for _ in range(repeat):
+                    simulator = engine.Engine(cells, rule, algorithm=algorithm)
+                    start = perf_counter()
+                    simulator.run(generations)
+                    times.append(perf_counter() - start)
+                    population = simulator.getpop()
+                    simulator.close()
+                rows.append([name, algorithm, generations, f'{min(times):.3f}', population])
+                print('.', end='', flush=True)
+    print()
+    return rows
+
+
+def get_commit():
+    """Commit of the repository, with suffix -dirty if changed, or None."""
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              check=True, cwd=_REPOSITORY_PATH).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark_workloads(names, generations, repeat=1, reflect=False):
+    """Report of measuring workloads, as JSON-compatible dict."""
+    overrides = [('observer', 'phase_reflect', 'true')] if reflect else []
+    report = {
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'generations': generations,
+        'workloads': {},
+    }
+    with TemporaryDirectory() as directory:
+        for name in names:
+            path, rect, population = prepare_workload(name, directory)
+            measurement = measure_workload(path, rect, generations, repeat, overrides)
+            report['workloads'][name] = {'population': population, **measurement}
+            print('.', end='', flush=True)
+    print()
+    return report
+
+
+def get_workload_rows(report):
+    """Rows of throughput per workload and rows of seconds per phase and
+    generation per workload, with the phases."""
+    rows, phase_rows, phases = [], [], []
+    for measurement in report['workloads'].values():
+        phases += [name for name in measurement['seconds'] if name not in phases]
+    for name, measurement in report['workloads'].items():
+        rect, throughput = measurement['rect'], measurement['throughput']
+        rows.append([name, f'{rect[2]}x{rect[3]}', measurement['population'], measurement['generations'],
+                     measurement['components'], measurement['processes'],
+                     f"{throughput['cells_per_second']:.0f}", f"{throughput['components_per_second']:.0f}",
+                     f"{throughput['processes_per_second']:.0f}"])
+        per_generation = measurement['seconds_per_generation']
+        phase_rows.append([name] + [f'{per_generation[phase]:.4f}' if phase in per_generation else '-'
+                                    for phase in phases])
+    return rows, phase_rows, phases
+
+
+def compare_workloads(old_report, new_report, min_seconds=0.01):
+    """Rows of seconds per phase of both reports and speedup, for phases
+    of at least `min_seconds` in either."""
+    rows = []
+    for name, new in new_report['workloads'].items():
+        old = old_report['workloads'].get(name)
+        if old is None or old['generations'] != new['generations']:
+            continue
+        for phase, new_seconds in new['seconds'].items():
+            old_seconds = old['seconds'].get(phase)
+            if old_seconds is None or max(old_seconds, new_seconds) < min_seconds:
+                continue
+            rows.append([name, phase, f'{old_seconds:.3f}', f'{new_seconds:.3f}',
+                         f'{old_seconds / new_seconds:.2f}x' if new_seconds else '-'])
+    return rows
+
+
+#
+# scaling of the observer procedure
+#
+
+# variables of scaling runs and what phases are fitted against
+SCALING_VARIABLES = {
+    'size': 'cells',
+    'density': 'population',
+    'generations': 'generations',
+}
+
+
+def fit_exponent(xs, ys):
+    """Exponent b of y = a * x^b, fitted by least squares of logarithms,
+    or None if there are not two distinct points."""
+    points = [(x, y) for (x, y) in zip(xs, ys) if x > 0 and y > 0]
+    if len({x for (x, _) in points}) < 2:
+        return None
+    slope, _ = np.polyfit(np.log([x for (x, _) in points]), np.log([y for (_, y) in points]), 1)
+    return float(slope)
+
+
+def benchmark_scaling(values, base, repeat=1, memory=False, seed=0, margin=8):
+    """Measurements of random soups, varying one variable of `values`
+    ({variable: [value, ...]}) at a time from `base` ({variable: value}).
+    Returns [(variable, x, measurement), ...] with x the cells of the rect,
+    the population or the generations."""
+    points = []
+    with TemporaryDirectory() as directory:
+        for variable, variable_values in values.items():
+            for value in variable_values:
+                parameters = {**base, variable: value}
+                cells = make_soup_cells(parameters['size'], parameters['density'], seed)
+                path = path_join(directory, 'soup.rle')
+                patterns.write_rle(path, cells)
+                rect = _get_rect(cells, margin)
+                measurement = measure_workload(path, rect, parameters['generations'], repeat, memory=memory)
+                x = {
+                    'size': rect[2] * rect[3],
+                    'density': len(cells),
+                    'generations': measurement['generations'],
+                }[variable]
+                points.append((variable, x, measurement))
+                print('.', end='', flush=True)
+    print()
+    return points
+
+
+def get_scaling_fits(points, min_seconds=0.01):
+    """Exponents of seconds and peak memory per variable and phase, as
+    {variable: {phase: {'seconds': exponent, 'peak_mb': exponent}}}. Phases
+    never taking `min_seconds` are left out, as their times are mostly
+    noise."""
+    fits = {}
+    for variable in SCALING_VARIABLES:
+        variable_points = [(x, measurement) for (v, x, measurement) in points if v == variable]
+        phases = []
+        for _, measurement in variable_points:
+            phases += [phase for phase in measurement['seconds'] if phase not in phases]
+        for phase in phases:
+            seconds = [measurement['seconds'].get(phase, 0) for (_, measurement) in variable_points]
+            if max(seconds, default=0) < min_seconds:
+                continue
+            xs = [x for (x, _) in variable_points]
+            fit = {'seconds': fit_exponent(xs, seconds)}
+            if all('peak_mb' in measurement for (_, measurement) in variable_points):
+                fit['peak_mb'] = fit_exponent(xs, [measurement['peak_mb'].get(phase, 0)
+                                                   for (_, measurement) in variable_points])
+            fits.setdefault(variable, {})[phase] = fit
+    return fits
+
+
+def get_scaling_rows(fits, threshold):
+    """Rows of exponents per variable and phase, flagging those above
+    `threshold`."""
+    def format_exponent(exponent):
+        if exponent is None:
+            return '-'
+        return f'{exponent:.2f}' + (' !' if exponent > threshold else '')
+    rows = []
+    for variable, phases in fits.items():
+        for phase, fit in phases.items():
+            rows.append([variable, SCALING_VARIABLES[variable], phase, format_exponent(fit['seconds']),
+                         format_exponent(fit['peak_mb']) if 'peak_mb' in fit else '-'])
+    return rows
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Benchmarks.")
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    parser_engines = subparsers.add_parser('engines', help="generations per second of engine algorithms")
+    parser_engines.add_argument('--sizes', type=int, nargs='+', default=[256, 512, 1024, 2048, 4096, 8192])
+    parser_engines.add_argument('--algorithms', nargs='+', default=['grid', 'bitgrid'],
+                                choices=sorted(engine.Engine.ALGORITHMS))
+    parser_engines.add_argument('--min-time', type=float, default=1.0,
+                                help="seconds to run each combination at least")
+    parser_engines.add_argument('--density', type=float, default=0.5)
+    parser_engines.add_argument('--seed', type=int, default=0)
+    parser_engines.add_argument('--processes', type=int, default=None,
+                                help="processes of the tiled algorithm, default: number of CPUs")
+
+    parser_leaps = subparsers.add_parser('leaps', help="seconds to run many generations at once")
+    parser_leaps.add_argument('--workloads', nargs='+', default=['and-gate', 'and-gate-double', 'gates-2x2'],
+                              choices=list(WORKLOADS))
+    parser_leaps.add_argument('--generations', type=int, default=100000)
+    parser_leaps.add_argument('--algorithms', nargs='+', default=['hashlife'], choices=sorted(engine.Engine.ALGORITHMS))
+    parser_leaps.add_argument('--repeat', type=int, default=3, help="runs per workload, the fastest counts")
+
+    parser_startup = subparsers.add_parser('startup', help="seconds to import and reload modules")
+    parser_startup.add_argument('--modules', nargs='+', default=STARTUP_MODULES)
+    parser_startup.add_argument('--repeat', type=int, default=5, help="fresh interpreters, median is reported")
+    parser_startup.add_argument('--top', type=int, default=12, help="packages to list")
+
+    parser_workloads = subparsers.add_parser('workloads', help="seconds per phase of observing workloads")
+    parser_workloads.add_argument('--workloads', nargs='+', default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser_workloads.add_argument('--generations', type=int, default=30)
+    parser_workloads.add_argument('--repeat', type=int, default=1, help="runs per workload, the fastest counts")
+    parser_workloads.add_argument('--reflect', action='store_true', help="also run the reflection phase")
+    parser_workloads.add_argument('--output', help="JSON file to write results to")
+    parser_workloads.add_argument('--compare', help="JSON file of earlier results, e.g. of another commit")
+
+    parser_scaling = subparsers.add_parser('scaling', help="empirical complexity per phase")
+    parser_scaling.add_argument('--sizes', type=int, nargs='+', default=[16, 24, 32, 48, 64],
+                                help="sides of square soups")
+    parser_scaling.add_argument('--densities', type=float, nargs='+', default=[0.1, 0.2, 0.3, 0.5])
+    parser_scaling.add_argument('--generations', type=int, nargs='+', default=[5, 10, 20, 40])
+    parser_scaling.add_argument('--base', type=float, nargs=3, default=[32, 0.3, 10],
+                                metavar=('SIZE', 'DENSITY', 'GENERATIONS'),
+                                help="values of the variables not varied")
+    parser_scaling.add_argument('--repeat', type=int, default=1, help="runs per point, the fastest counts")
+    parser_scaling.add_argument('--memory', action='store_true', help="also fit peak memory, in extra runs")
+    parser_scaling.add_argument('--threshold', type=float, default=1.5, help="exponent from which to flag phases")
+    parser_scaling.add_argument('--seed', type=int, default=0)
+    parser_scaling.add_argument('--output', help="JSON file to write measurements and fits to")
+
+    args = parser.parse_args(argv)
+
+    if args.benchmark == 'engines':
+        rows = benchmark_engines(args.sizes, args.algorithms, args.min_time, args.density, args.seed,
+                                 args.processes)
+        util.print_tabular_data(rows, ['World', 'Algorithm', 'Generations', 'Seconds', 'Gen/s', 'Speedup'])
+
+    elif args.benchmark == 'leaps':
+        rows = benchmark_leaps(args.workloads, args.generations, args.algorithms, args.repeat)
+        util.print_tabular_data(rows, ['Workload', 'Algorithm', 'Generations', 'Seconds', 'Population'])
+
+    elif args.benchmark == 'startup':
+        rows, package_rows = benchmark_startup(args.modules, args.repeat, args.top)
+        util.print_tabular_data(rows, ['Stage', 'Seconds'])
+        util.print_tabular_data(package_rows, ['Package', 'Import seconds', 'Own module'])
+
+    elif args.benchmark == 'workloads':
+        report = benchmark_workloads(args.workloads, args.generations, args.repeat, args.reflect)
+        rows, phase_rows, phases = get_workload_rows(report)
+        print(f"Commit: {report['commit']}")
+        util.print_tabular_data(rows, ['Workload', 'Rect', 'Population', 'Generations', 'Components',
+                                       'Processes', 'Cells/s', 'Components/s', 'Processes/s'])
+        print("Seconds per generation:")
+        util.print_tabular_data(phase_rows, ['Workload', *phases])
+        if args.output:
+            with open(args.output, 'w') as f:
+                json_dump(report, f, indent=2)
+            print(f"Results written to {args.output}.")
+        if args.compare:
+            with open(args.compare) as f:
+                old_report = json_load(f)
+            print(f"Compared to commit: {old_report['commit']}")
+            util.print_tabular_data(compare_workloads(old_report, report),
+                                    ['Workload', 'Phase', 'Old seconds', 'New seconds', 'Speedup'])
+
+    elif args.benchmark == 'scaling':
+        values = {'size': args.sizes, 'density': args.densities, 'generations': args.generations}
+        base = {'size': int(args.base[0]), 'density': args.base[1], 'generations': int(args.base[2])}
+        points = benchmark_scaling(values, base, args.repeat, args.memory, args.seed)
+        fits = get_scaling_fits(points)
+        util.print_tabular_data(get_scaling_rows(fits, args.threshold),
+                                ['Variable', 'Against', 'Phase', 'Seconds exponent', 'Memory exponent'])
+        flagged = {phase for phases in fits.values() for (phase, fit) in phases.items()
+                   if any(exponent is not None and exponent > args.threshold for exponent in fit.values())}
+        if flagged:
+            print(f"Exponents above {args.threshold}: {', '.join(sorted(flagged))}")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json_dump({
+                    'commit': get_commit(),
+                    'base': base,
+                    'points': [{'variable': variable, 'x': x, **measurement} for (variable, x, measurement) in points],
+                    'fits': fits,
+                }, f, indent=2)
+            print(f"Results written to {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+
+# Content-addressed cache of intermediate results.
+#
+# Results are cached in stages, each keyed by a digest of its inputs:
+#   simulation   frames of the selection rect; key: initial pattern, rect,
+#                rule, number of generations
+#   observation  observer memory (see memory.py); key: simulation key and the
+#                observer options that affect observing
+#   graph        links between processes; key: observation key
+# A run can thus skip straight to the first stage whose inputs changed.
+# Entries are directories below <cache path>/<stage>/. When the cache
+# exceeds its size limit, least recently used entries are removed.
+
+from hashlib import sha256
+from json import dumps as json_dumps, load as json_load, dump as json_dump
+from os import makedirs, listdir, walk, replace, utime
+from os.path import join as path_join, exists as path_exists, getsize, getmtime
+from shutil import rmtree
+from tempfile import mkdtemp
+
+import numpy as np
+
+import apgol
+import memory
+
+
+CACHE_VERSION = 2
+
+# options of the observer section that only affect analysis, not observing
+_ANALYSIS_OPTIONS = ('phase_reflect', 'phase_detect_computation', 'strict_noise_removal')
+
+
+class FrameReplay:
+    """Replays cached frames through the subset of Golly's interface used by
+    GolEnvironment."""
+
+    def __init__(self, rect, frames, rule):
+        self.rect = rect
+        self._frames = frames
+        self.rule = rule
+        self._time = 0
+
+    def reset(self):
+        self._time = 0
+
+    def step(self):
+        self.run(1)
+
+    def run(self, steps):
+        if self._time + steps >= len(self._frames):
+            raise ValueError("Replay exceeds cached generations.")
+        self._time += steps
+
+    def getcells(self, rect):
+        left, top, width, height = self.rect
+        values = np.unpackbits(self._frames[self._time], axis=-1, count=width)
+        ys, xs = np.nonzero(values)
+        xs, ys = xs + left, ys + top
+        r_left, r_top, r_width, r_height = rect
+        inside = (xs >= r_left) & (xs < r_left + r_width) & (ys >= r_top) & (ys < r_top + r_height)
+        cells = np.empty(2 * inside.sum(), dtype=np.int64)
+        cells[0::2], cells[1::2] = xs[inside], ys[inside]
+        return cells.tolist()
+
+    def getrule(self):
+        return self.rule
+
+
+class ResultCache:
+
+    STAGES = ('simulation', 'observation', 'graph')
+
+    def __init__(self, path, max_size=None):
+        """`max_size` in bytes, unlimited if None."""
+        self.path = path
+        self.max_size = max_size
+
+    @staticmethod
+    def make_key(*parts):
+        data = json_dumps([CACHE_VERSION, memory.FORMAT_VERSION, *parts], sort_keys=True)
+        return sha256(data.encode()).hexdigest()
+
+    def get_keys(self, golly, rect, config):
+        """Keys of all stages as {stage: key}."""
+        pattern_rect = golly.getrect()
+        pattern = list(golly.getcells(pattern_rect)) if pattern_rect else []
+        rule = golly.getrule()
+        generations = config.getint('observer', 'generations')
+        observer_options = {k: v for (k, v) in config.items('observer') if k not in _ANALYSIS_OPTIONS}
+        if config.getboolean('observer', 'observe_episodes_only', fallback=False):
+            observer_options['episode_times'] = apgol.get_episode_times(config)
+
+        key_simulation = self.make_key('simulation', pattern, list(rect), rule, generations)
+        key_observation = self.make_key('observation', key_simulation, observer_options)
+        key_graph = self.make_key('graph', key_observation)
+        return {
+            'simulation': key_simulation,
+            'observation': key_observation,
+            'graph': key_graph,
+        }
+
+    #
+    # entries
+    #
+
+    def _get_entry_path(self, stage, key):
+        return path_join(self.path, stage, key)
+
+    def get_entry(self, stage, key):
+        """Path of the entry directory, or None if not cached."""
+        entry_path = self._get_entry_path(stage, key)
+        if not path_exists(entry_path):
+            return None
+        # modification time of the entry directory tracks its last use
+        utime(entry_path)
+        return entry_path
+
+    def put_entry(self, stage, key, write_entry):
+        """Create an entry by calling `write_entry(path)` with a temporary
+        directory, which then atomically becomes the entry."""
+        stage_path = path_join(self.path, stage)
+        makedirs(stage_path, exist_ok=True)
+        temp_path = mkdtemp(prefix='.tmp-', dir=stage_path)
+        try:
+            write_entry(temp_path)
+            entry_path = self._get_entry_path(stage, key)
+            if path_exists(entry_path):
+                rmtree(entry_path, ignore_errors=True)
+            try:
+                replace(temp_path, entry_path)
+            except OSError:
+                # stored by another process meanwhile, e.g. in batch runs
+                if not path_exists(entry_path):
+                    raise
+        finally:
+            if path_exists(temp_path):
+                rmtree(temp_path)
+        self.evict()
+
+    def _get_entries(self):
+        # [(last use, size, path), ...]
+        entries = []
+        for stage in self.STAGES:
+            stage_path = path_join(self.path, stage)
+            if not path_exists(stage_path):
+                continue
+            for key in listdir(stage_path):
+                if key.startswith('.tmp-'):
+                    continue
+                entry_path = path_join(stage_path, key)
+                size = sum(getsize(path_join(d, f)) for (d, _, fs) in walk(entry_path) for f in fs)
+                entries.append((getmtime(entry_path), size, entry_path))
+        return entries
+
+    def evict(self):
+        if self.max_size is None:
+            return
+        entries = sorted(self._get_entries())
+        total_size = sum(size for (_, size, _) in entries)
+        for _, size, entry_path in entries:
+            if total_size <= self.max_size:
+                break
+            print(f"Evicting cache entry: {entry_path}")
+            rmtree(entry_path)
+            total_size -= size
+
+    #
+    # stages
+    #
+
+    def load_simulation(self, keys):
+        """A FrameReplay of the cached frames, or None if not cached."""
+        entry_path = self.get_entry('simulation', keys['simulation'])
+        if not entry_path:
+            return None
+        with open(path_join(entry_path, 'simulation.json')) as f:
+            info = json_load(f)
+        frames = np.load(path_join(entry_path, 'frames.npy'), mmap_mode='r', allow_pickle=False)
+        return FrameReplay(info['rect'], frames, info['rule'])
+
+    def store_simulation(self, keys, environment):
+        def write_entry(path):
+            duration = environment.get_duration()
+            frames = np.stack([memory.encode_frame(environment, time) for time in range(duration)])
+            np.save(path_join(path, 'frames.npy'), frames, allow_pickle=False)
+            with open(path_join(path, 'simulation.json'), 'w') as f:
+                json_dump({'rect': environment.get_rect(), 'rule': environment.rule}, f)
+        self.put_entry('simulation', keys['simulation'], write_entry)
+
+    def load_observation(self, keys, config):
+        """The cached observer with its environment, or None if not cached."""
+        entry_path = self.get_entry('observation', keys['observation'])
+        if not entry_path:
+            return None
+        return apgol.GolObserver.from_memory_dump(entry_path, None, config)
+
+    def store_observation(self, keys, observer):
+        write_entry = lambda path: memory.write_memory(path, observer)
+        self.put_entry('observation', keys['observation'], write_entry)
+
+    def load_graph(self, keys, observer):
+        """Restore the cached process links into the observer. Returns
+        whether they were cached."""
+        entry_path = self.get_entry('graph', keys['graph'])
+        if not entry_path:
+            return False
+        arrays = {name: np.load(path_join(entry_path, f'{name}.npy'), allow_pickle=False)
+                  for name in ('proc_link_from', 'proc_link_to')}
+        observer.set_process_adjacency(memory.decode_process_links(arrays, observer.get_all_processes()))
+        return True
+
+    def store_graph(self, keys, observer):
+        def write_entry(path):
+            next_procs, _ = observer.get_process_adjacency()
+            arrays = memory.encode_process_links(observer.get_all_processes(), next_procs)
+            for name, array in arrays.items():
+                np.save(path_join(path, f'{name}.npy'), array, allow_pickle=False)
+        self.put_entry('graph', keys['graph'], write_entry)
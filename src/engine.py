@@ -0,0 +1,620 @@
+
+# Headless Game of Life engine.
+#
+# Engine offers the subset of Golly's scripting interface used by
+# GolEnvironment and golly-hook.py, so the pipeline can run without Golly.
+# Algorithms:
+#   hashlife  generations are hash-consed quadtrees (see quadtree.py) and the
+#             future of every node is memoised, so run(n) advances repetitive
+#             patterns by n generations in time sublinear in n
+#   grid      NumPy array with one byte per cell
+#   bitgrid   NumPy array with 64 cells per uint64 word, stepped with
+#             bit-parallel adders; best for large, busy worlds
+#   tiled     bitgrid in shared memory, stepped tile by tile in a pool of
+#             processes, skipping tiles without changes nearby
+# All simulate an unbounded plane. The grids grow when cells reach their
+# border. Any Life-like rule without B0 is supported (see rules.py): grid
+# looks up the next value of each cell in a rule table by its neighbourhood,
+# the others compare bit planes of neighbour counts with the rule's counts.
+
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count
+
+import numpy as np
+
+import patterns
+import rules
+from quadtree import QuadTreeStore, LEAF_LEVEL
+
+
+# smallest root level, so that centers of centers are still nodes
+_MIN_LEVEL = LEAF_LEVEL + 2
+
+# 16x16 grids of two by two leaves as int, bit x + 16 * y
+_GRID_WIDTH = 16
+_GRID_ALL = (1 << _GRID_WIDTH ** 2) - 1
+_GRID_COLUMN_FIRST = sum(1 << (_GRID_WIDTH * y) for y in range(_GRID_WIDTH))
+_GRID_NOT_COLUMN_FIRST = _GRID_ALL ^ _GRID_COLUMN_FIRST
+_GRID_NOT_COLUMN_LAST = _GRID_ALL ^ (_GRID_COLUMN_FIRST << (_GRID_WIDTH - 1))
+
+
+def _match_count(planes, count):
+    """Bits where the count given by bit `planes`, lowest first, equals
+    `count`."""
+    match = None
+    for bit, plane in enumerate(planes):
+        term = plane if count >> bit & 1 else ~plane
+        match = term if match is None else match & term
+    return match
+
+
+def _apply_rule(planes, cells, birth_counts, survival_counts):
+    """Next cells from bit `planes` of counts per cell, where dead cells are
+    born with a count in `birth_counts` and live cells survive with a count
+    in `survival_counts`. Works on ints and NumPy arrays alike."""
+    matches = {}
+
+    def match_any(counts):
+        match = None
+        for count in counts:
+            if count not in matches:
+                matches[count] = _match_count(planes, count)
+            match = matches[count] if match is None else match | matches[count]
+        return match
+
+    born, survived = match_any(birth_counts), match_any(survival_counts)
+    if born is None:
+        return cells & survived if survived is not None else cells & 0
+    if survived is None:
+        return born & ~cells
+    # survived where alive, born where dead
+    return born ^ ((born ^ survived) & cells)
+
+
+def _add_neighbourhoods(west, center, east, get_above, get_row, get_below):
+    """Bit planes of the totals of all neighbourhoods of three by three
+    cells, center included, lowest first. `get_above`, `get_row` and
+    `get_below` return for rows of cells the rows above, at and below each
+    row of the result. Works on ints and NumPy arrays alike."""
+    # horizontal sums of three as two bit planes
+    xor_we = west ^ center
+    sum_0 = xor_we ^ east
+    sum_1 = (west & center) | (east & xor_we)
+
+    # vertical sums of three horizontal sums
+    above_0, center_0, below_0 = get_above(sum_0), get_row(sum_0), get_below(sum_0)
+    above_1, center_1, below_1 = get_above(sum_1), get_row(sum_1), get_below(sum_1)
+    xor_0 = above_0 ^ center_0
+    total_1 = xor_0 ^ below_0
+    carry_1 = (above_0 & center_0) | (below_0 & xor_0)
+    # above_1 + center_1 + below_1 + carry_1, in units of two
+    xor_a, and_a = above_1 ^ center_1, above_1 & center_1
+    xor_b, and_b = below_1 ^ carry_1, below_1 & carry_1
+    total_2 = xor_a ^ xor_b
+    carry_2 = xor_a & xor_b
+    total_4 = and_a ^ and_b ^ carry_2
+    total_8 = (and_a & and_b) | (carry_2 & (and_a ^ and_b))
+    return total_1, total_2, total_4, total_8
+
+
+def _step_grid(grid, birth_totals, survival_totals):
+    """One generation of a 16x16 grid, treating cells outside as dead.
+    Only cells at least one cell away from the border are valid after it.
+    Counts are totals of neighbourhoods, center included."""
+    totals = _add_neighbourhoods(
+        (grid << 1) & _GRID_NOT_COLUMN_FIRST, grid, (grid >> 1) & _GRID_NOT_COLUMN_LAST,
+        lambda rows: (rows << _GRID_WIDTH) & _GRID_ALL, lambda rows: rows, lambda rows: rows >> _GRID_WIDTH)
+    return _apply_rule(totals, grid, birth_totals, survival_totals) & _GRID_ALL
+
+
+class HashLife:
+
+    def __init__(self, rule=rules.LIFE, max_nodes=1000000):
+        """Nodes are collected when there are more than `max_nodes`."""
+        self.birth, self.survival = rules.parse_rule(rule)
+        # counts of _step_grid() include the center
+        self._total_counts = (self.birth, frozenset(count + 1 for count in self.survival))
+        self.max_nodes = max_nodes
+        self._clear()
+
+    def _clear(self):
+        self.store = QuadTreeStore()
+        self._results = {}  # {(node, step exponent): node}
+        self.root = 0
+        self.level = _MIN_LEVEL
+        self.origin = (0, 0)
+
+    def set_cells(self, cells):
+        cells = list(cells)
+        self._clear()
+        if not cells:
+            return
+        left, top = min(x for (x, _) in cells), min(y for (_, y) in cells)
+        extent = max(max(x - left, y - top) for (x, y) in cells)
+        self.level = max(_MIN_LEVEL, extent.bit_length())
+        self.origin = (left, top)
+        self.root = self.store.from_cells(((x - left, y - top) for (x, y) in cells), self.level)
+
+    def get_cells(self, rect=None):
+        """Live cells (x, y), only those inside `rect` (left, top, width,
+        height) if given."""
+        left, top = self.origin
+        if rect is not None:
+            rect = (rect[0] - left, rect[1] - top, rect[2], rect[3])
+        for x, y in self.store.get_cells(self.root, self.level, rect):
+            yield x + left, y + top
+
+    def set_array(self, values, origin=(0, 0)):
+        ys, xs = np.nonzero(values)
+        self.set_cells(zip((xs + origin[0]).tolist(), (ys + origin[1]).tolist()))
+
+    def get_population(self):
+        return self.store.get_population(self.root)
+
+    def run(self, steps):
+        if len(self.store) > self.max_nodes:
+            self.set_cells(list(self.get_cells()))
+        # advance by powers of two
+        while steps > 0:
+            exponent = steps.bit_length() - 1
+            self._advance(exponent)
+            steps -= 1 << exponent
+
+    def _advance(self, exponent):
+        # The result of a node is its center half. Patterns grow by at most
+        # one cell per generation, so the root is expanded until all cells are
+        # within its central quarter and the step fits into the margin.
+        while self.level < exponent + 3 or not self._is_centered():
+            self._expand()
+        self.root = self._get_result(self.root, self.level, exponent)
+        quarter = 1 << (self.level - 2)
+        self.origin = (self.origin[0] + quarter, self.origin[1] + quarter)
+        self.level -= 1
+
+    def _is_centered(self):
+        inner = self._get_center(self._get_center(self.root, self.level), self.level - 1)
+        return self.store.get_population(inner) == self.store.get_population(self.root)
+
+    def _expand(self):
+        make = self.store.make_node
+        nw, ne, sw, se = self.store.get_children(self.root)
+        self.root = make(make(0, 0, 0, nw), make(0, 0, ne, 0), make(0, sw, 0, 0), make(se, 0, 0, 0))
+        half = 1 << (self.level - 1)
+        self.origin = (self.origin[0] - half, self.origin[1] - half)
+        self.level += 1
+
+    def _get_grid(self, node):
+        # 16x16 grid of a node of level 4
+        grid = 0
+        for leaf, (ox, oy) in zip(self.store.get_children(node), ((0, 0), (8, 0), (0, 8), (8, 8))):
+            mask = self.store.get_mask(leaf)
+            for y in range(8):
+                row = (mask >> (8 * y)) & 0xFF
+                if row:
+                    grid |= row << (ox + _GRID_WIDTH * (oy + y))
+        return grid
+
+    def _get_grid_center(self, grid):
+        mask = 0
+        for y in range(8):
+            mask |= ((grid >> (4 + _GRID_WIDTH * (4 + y))) & 0xFF) << (8 * y)
+        return self.store.make_leaf(mask)
+
+    def _get_center(self, node, level):
+        """Node of `level` - 1 at the center of `node`."""
+        if not node:
+            return 0
+        if level == LEAF_LEVEL + 1:
+            return self._get_grid_center(self._get_grid(node))
+        children = self.store.get_children
+        nw, ne, sw, se = children(node)
+        return self.store.make_node(children(nw)[3], children(ne)[2], children(sw)[1], children(se)[0])
+
+    def _get_result(self, node, level, exponent):
+        """Center of `node` after 2^`exponent` generations, where `exponent`
+        is at most `level` - 2."""
+        if not node:
+            return 0
+        key = (node, exponent)
+        result = self._results.get(key)
+        if result is not None:
+            return result
+
+        if level == LEAF_LEVEL + 1:
+            grid = self._get_grid(node)
+            for _ in range(1 << exponent):
+                grid = _step_grid(grid, *self._total_counts)
+            result = self._get_grid_center(grid)
+
+        else:
+            make = self.store.make_node
+            children = self.store.get_children
+            nw, ne, sw, se = children(node)
+            nw_c, ne_c, sw_c, se_c = children(nw), children(ne), children(sw), children(se)
+            # nine overlapping nodes of level - 1, row by row
+            subnodes = (
+                nw, make(nw_c[1], ne_c[0], nw_c[3], ne_c[2]), ne,
+                make(nw_c[2], nw_c[3], sw_c[0], sw_c[1]), make(nw_c[3], ne_c[2], sw_c[1], se_c[0]),
+                make(ne_c[2], ne_c[3], se_c[0], se_c[1]),
+                sw, make(sw_c[1], se_c[0], sw_c[3], se_c[2]), se)
+            if exponent == level - 2:
+                # full speed: half of the generations in each of two stages
+                exponent -= 1
+                r = [self._get_result(sn, level - 1, exponent) for sn in subnodes]
+            else:
+                r = [self._get_center(sn, level - 1) for sn in subnodes]
+            quads = (
+                make(r[0], r[1], r[3], r[4]), make(r[1], r[2], r[4], r[5]),
+                make(r[3], r[4], r[6], r[7]), make(r[4], r[5], r[7], r[8]))
+            result = make(*(self._get_result(quad, level - 1, exponent) for quad in quads))
+
+        self._results[key] = result
+        return result
+
+
+class GridLife:
+    """Byte per cell grid. Subclasses may store cells differently, in rows
+    of `_CELLS_PER_UNIT` cells per array element."""
+
+    _CELLS_PER_UNIT = 1
+    _MARGIN = 16  # minimum of cells added beyond the border when growing
+
+    def __init__(self, rule=rules.LIFE):
+        self.birth, self.survival = rules.parse_rule(rule)
+        self._table = rules.make_rule_table(self.birth, self.survival)
+        self._clear()
+
+    def _clear(self):
+        self.origin = (0, 0)
+        self.grid = np.zeros((1, 1), dtype=self._get_dtype())
+
+    @staticmethod
+    def _get_dtype():
+        return np.uint8
+
+    def set_cells(self, cells):
+        values, origin = patterns.cells_to_array(cells)
+        if not values.size:
+            self._clear()
+            return
+        self.set_array(values, origin)
+
+    def set_array(self, values, origin=(0, 0)):
+        """Set cells from a 2D array of values, row by row, with its first
+        value at `origin`."""
+        height, width = values.shape
+        units = -(-(width + 2 * self._MARGIN) // self._CELLS_PER_UNIT)
+        padded = np.zeros((height + 2 * self._MARGIN, units * self._CELLS_PER_UNIT), dtype=np.uint8)
+        padded[self._MARGIN:self._MARGIN + height, self._MARGIN:self._MARGIN + width] = values != 0
+        self.origin = (origin[0] - self._MARGIN, origin[1] - self._MARGIN)
+        self.grid = self._pack(padded)
+
+    def _pack(self, values):
+        return values
+
+    def _unpack(self, grid):
+        return grid
+
+    def get_cells(self, rect=None):
+        """Live cells (x, y), only those inside `rect` (left, top, width,
+        height) if given."""
+        left, top = self.origin
+        values = self._unpack(self.grid)
+        if rect is not None:
+            r_left, r_top, r_width, r_height = rect
+            x0, y0 = max(r_left - left, 0), max(r_top - top, 0)
+            x1 = min(r_left + r_width - left, values.shape[1])
+            y1 = min(r_top + r_height - top, values.shape[0])
+            if x1 <= x0 or y1 <= y0:
+                return []
+            values = values[y0:y1, x0:x1]
+            left, top = left + x0, top + y0
+        ys, xs = np.nonzero(values)
+        return list(zip((xs + left).tolist(), (ys + top).tolist()))
+
+    def get_population(self):
+        return int(np.count_nonzero(self._unpack(self.grid)))
+
+    def run(self, steps):
+        for _ in range(steps):
+            self._grow()
+            self.grid = self._step(self.grid)
+
+    def _has_border_cells(self):
+        grid = self.grid
+        return bool(grid[0].any() or grid[-1].any() or grid[:, 0].any() or grid[:, -1].any())
+
+    def _grow(self):
+        # keep a dead border, so that the grid behaves like an unbounded plane
+        if not self._has_border_cells():
+            return
+        # grow in proportion to the size, so that growing is rare
+        height, units = self.grid.shape
+        margin_y = max(self._MARGIN, height // 4)
+        margin_x = -(-max(self._MARGIN, units * self._CELLS_PER_UNIT // 4) // self._CELLS_PER_UNIT)
+        self.grid = np.pad(self.grid, ((margin_y, margin_y), (margin_x, margin_x)))
+        self.origin = (self.origin[0] - margin_x * self._CELLS_PER_UNIT, self.origin[1] - margin_y)
+
+    def _step(self, grid):
+        # neighbourhood of each cell as index into the rule table, from
+        # three bits per row of three cells
+        padded = np.pad(grid, 1)
+        rows = padded[:, :-2] | (padded[:, 1:-1] << 1) | (padded[:, 2:] << 2)
+        neighbourhoods = rows[:-2].astype(np.uint16)
+        neighbourhoods |= rows[1:-1].astype(np.uint16) << 3
+        neighbourhoods |= rows[2:].astype(np.uint16) << 6
+        return self._table.take(neighbourhoods)
+
+
+class BitLife(GridLife):
+    """Bit-packed grid, cell x of a row in bit x % 64 of word x // 64. A
+    generation is computed for all words at once: horizontal sums of three
+    cells, then vertical sums of three rows, with full adders on bit planes."""
+
+    _CELLS_PER_UNIT = 64
+
+    def __init__(self, rule=rules.LIFE):
+        super().__init__(rule)
+        # counts of _step_bits() include the center
+        self._total_counts = (self.birth, frozenset(count + 1 for count in self.survival))
+
+    @staticmethod
+    def _get_dtype():
+        return np.uint64
+
+    def _pack(self, values):
+        return np.packbits(values, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+    def _unpack(self, grid):
+        return np.unpackbits(grid.astype('<u8').view(np.uint8), axis=1, bitorder='little')
+
+    def _has_border_cells(self):
+        grid = self.grid
+        return bool(grid[0].any() or grid[-1].any()
+                    or (grid[:, 0] & np.uint64(1)).any() or (grid[:, -1] >> np.uint64(63)).any())
+
+    def _step(self, grid):
+        return _step_bits(grid, *self._total_counts)
+
+
+def _step_bits(grid, birth_totals, survival_totals):
+    """Next generation of a bit-packed grid, where dead cells are born with
+    totals of their neighbourhood, center included, in `birth_totals` and
+    live cells survive with totals in `survival_totals`."""
+    one, high = np.uint64(1), np.uint64(63)
+    # a dead row above and below, so that neighbouring rows are views
+    padded = np.zeros((grid.shape[0] + 2, grid.shape[1]), dtype=np.uint64)
+    padded[1:-1] = grid
+    # cells to the west and east, across word boundaries
+    west = padded << one
+    west[:, 1:] |= padded[:, :-1] >> high
+    east = padded >> one
+    east[:, :-1] |= padded[:, 1:] << high
+
+    totals = _add_neighbourhoods(
+        west, padded, east, lambda rows: rows[:-2], lambda rows: rows[1:-1], lambda rows: rows[2:])
+    return _apply_rule(totals, grid, birth_totals, survival_totals)
+
+
+# shared memory attached in a worker process, {name: (SharedMemory, array)}
+_worker_arrays = {}
+
+
+def _get_worker_array(name, shape):
+    if name not in _worker_arrays:
+        memory = SharedMemory(name)
+        _worker_arrays[name] = (memory, np.ndarray(shape, dtype=np.uint64, buffer=memory.buf))
+    return _worker_arrays[name][1]
+
+
+def _release_worker_arrays(keep):
+    for name in [name for name in _worker_arrays if name not in keep]:
+        memory, _ = _worker_arrays.pop(name)
+        memory.close()
+
+
+def _step_tile(task):
+    """Step one tile from the current into the next grid, in a worker
+    process. Returns whether the tile changed."""
+    name_current, name_next, shape, (row_0, row_1, unit_0, unit_1), total_counts = task
+    _release_worker_arrays((name_current, name_next))
+    current = _get_worker_array(name_current, shape)
+    following = _get_worker_array(name_next, shape)
+    # the tile with a halo of one row and one word, cells beyond are dead
+    halo_row_0, halo_unit_0 = max(row_0 - 1, 0), max(unit_0 - 1, 0)
+    region = current[halo_row_0:min(row_1 + 1, shape[0]), halo_unit_0:min(unit_1 + 1, shape[1])]
+    stepped = _step_bits(region, *total_counts)
+    tile = stepped[row_0 - halo_row_0:row_1 - halo_row_0, unit_0 - halo_unit_0:unit_1 - halo_unit_0]
+    following[row_0:row_1, unit_0:unit_1] = tile
+    return not np.array_equal(tile, current[row_0:row_1, unit_0:unit_1])
+
+
+class TiledLife(BitLife):
+    """Bit-packed grid in shared memory, partitioned into tiles that are
+    stepped by a pool of processes. Tiles read their halo directly from the
+    neighbouring tiles of the current generation and write into a second
+    grid for the next. A tile is only stepped if it or one of its neighbours
+    changed in the previous generation; otherwise both grids hold the same
+    cells for it already."""
+
+    def __init__(self, rule=rules.LIFE, processes=None, tile_rows=256, tile_units=16):
+        """Tiles have `tile_rows` rows of `tile_units` words of 64 cells."""
+        self.processes = processes or cpu_count()
+        self.tile_rows = tile_rows
+        self.tile_units = tile_units
+        self._pool = None
+        self._memories = []  # SharedMemory of current and next grid
+        self._shared_grids = ()  # arrays in shared memory, current first
+        self._active = None  # per tile whether to step it
+        super().__init__(rule)
+
+    def _is_shared(self):
+        return bool(self._shared_grids) and self.grid is self._shared_grids[0]
+
+    def _share(self):
+        # move the grid into shared memory, e.g. after it was replaced
+        grid = self.grid
+        self._release()
+        for _ in range(2):
+            self._memories.append(SharedMemory(create=True, size=max(grid.nbytes, 1)))
+        self._shared_grids = tuple(
+            np.ndarray(grid.shape, dtype=np.uint64, buffer=memory.buf) for memory in self._memories)
+        for shared_grid in self._shared_grids:
+            shared_grid[...] = grid
+        self.grid = self._shared_grids[0]
+        tiles_y = -(-grid.shape[0] // self.tile_rows)
+        tiles_x = -(-grid.shape[1] // self.tile_units)
+        self._active = np.ones((tiles_y, tiles_x), dtype=bool)
+
+    def _release(self):
+        if self._is_shared():
+            self.grid = np.array(self.grid)
+        # no views may remain when closing
+        self._shared_grids = ()
+        for memory in self._memories:
+            memory.close()
+            memory.unlink()
+        self._memories = []
+
+    def close(self):
+        if self._pool:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+        self._release()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def run(self, steps):
+        for _ in range(steps):
+            self._grow()
+            if not self._is_shared():
+                self._share()
+            self._step_tiles()
+
+    def _step_tiles(self):
+        if self._pool is None:
+            self._pool = Pool(self.processes)
+        names = (self._memories[0].name, self._memories[1].name)
+        tiles = [(ty, tx) for (ty, tx) in zip(*np.nonzero(self._active))]
+        tasks = [(*names, self.grid.shape, (
+                  ty * self.tile_rows, min((ty + 1) * self.tile_rows, self.grid.shape[0]),
+                  tx * self.tile_units, min((tx + 1) * self.tile_units, self.grid.shape[1])),
+                  self._total_counts)
+                 for (ty, tx) in tiles]
+        chunk_size = max(1, len(tasks) // (4 * self.processes))
+        changes = self._pool.map(_step_tile, tasks, chunk_size)
+
+        changed = np.zeros_like(self._active)
+        for (ty, tx), tile_changed in zip(tiles, changes):
+            changed[ty, tx] = tile_changed
+        # tiles with a changed tile nearby may change next
+        padded = np.pad(changed, 1)
+        height, width = changed.shape
+        self._active = np.zeros_like(changed)
+        for dy in range(3):
+            for dx in range(3):
+                self._active |= padded[dy:dy + height, dx:dx + width]
+
+        self._shared_grids = self._shared_grids[::-1]
+        self._memories.reverse()
+        self.grid = self._shared_grids[0]
+
+
+class Engine:
+    """Golly-like simulator. Rects are lists [left, top, width, height] and
+    cell lists are flat [x0, y0, x1, y1, ...], as in Golly."""
+
+    ALGORITHMS = {
+        'hashlife': HashLife,
+        'grid': GridLife,
+        'bitgrid': BitLife,
+        'tiled': TiledLife,
+    }
+
+    def __init__(self, cells=(), rule=rules.LIFE, algorithm='hashlife', **algorithm_options):
+        """`rule` is a Life-like rule (see rules.py). `algorithm_options` are
+        passed to the algorithm's class, e.g. `processes` for 'tiled'."""
+        birth, survival = rules.parse_rule(rule)
+        if 0 in birth:
+            # the empty plane would turn alive
+            raise ValueError(f"Rules with B0 are not supported: {rule}")
+        if algorithm not in self.ALGORITHMS:
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        self.rule = rules.format_rule(birth, survival)
+        self.algorithm = algorithm
+        self._initial_cells = list(cells)
+        self._initial_array = None
+        self._universe = self.ALGORITHMS[algorithm](self.rule, **algorithm_options)
+        self.reset()
+
+    @classmethod
+    def from_golly(cls, golly, rule=None, **kwargs):
+        """Engine with the current pattern of Golly, and its rule unless
+        `rule` is given."""
+        rect = golly.getrect()
+        cells = golly.getcells(rect) if rect else []
+        return cls(zip(cells[0::2], cells[1::2]), rule or golly.getrule(), **kwargs)
+
+    @classmethod
+    def from_array(cls, values, origin=(0, 0), rule=rules.LIFE, **kwargs):
+        """Engine with cells from a 2D array of values, e.g. large soups."""
+        engine = cls(rule=rule, **kwargs)
+        engine._initial_array = (values, origin)
+        engine.reset()
+        return engine
+
+    @classmethod
+    def from_file(cls, path, rule=None, **kwargs):
+        """Engine with the pattern of a .rle or .mc file (see patterns.py),
+        and its rule unless `rule` is given."""
+        values, origin, file_rule = patterns.read_pattern_array(path)
+        return cls.from_array(values, origin, rule or file_rule, **kwargs)
+
+    def close(self):
+        """Release processes and shared memory, if any."""
+        if hasattr(self._universe, 'close'):
+            self._universe.close()
+
+    def reset(self):
+        if self._initial_array is not None:
+            self._universe.set_array(*self._initial_array)
+        else:
+            self._universe.set_cells(self._initial_cells)
+        self._generation = 0
+
+    def step(self):
+        self.run(1)
+
+    def run(self, steps):
+        self._universe.run(steps)
+        self._generation += steps
+
+    def getcells(self, rect):
+        return [v for cell in self._universe.get_cells(rect) for v in cell]
+
+    def getrect(self):
+        cells = list(self._universe.get_cells())
+        if not cells:
+            return []
+        left, top = min(x for (x, _) in cells), min(y for (_, y) in cells)
+        right, bottom = max(x for (x, _) in cells), max(y for (_, y) in cells)
+        return [left, top, right - left + 1, bottom - top + 1]
+
+    def getselrect(self):
+        # no selection without GUI
+        return []
+
+    def getrule(self):
+        return self.rule
+
+    def getgen(self):
+        return str(self._generation)
+
+    def getpop(self):
+        return str(self._universe.get_population())
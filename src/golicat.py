@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# Command line interface, without Golly.
+#
+# usage: python -m golicat run <pattern> [--generations N] [--rect LEFT TOP WIDTH HEIGHT]
+#                              [--set SECTION.KEY=VALUE ...] [--results PATH]
+#
+# run  runs the observer procedure (see pipeline.py) on a .rle or .mc pattern
+#      with the headless engine, configured by config.ini and overrides, and
+#      writes results as JSON: seconds per phase, numbers of components and
+#      processes per kind, the summary of detecting computation and, if
+#      enabled in the [profile] section, the profile of phases and counts of
+#      recognisers
+#
+# Run from src/ or with src/ on PYTHONPATH. Relative paths in the config are
+# resolved against the directory of the config file.
+
+import sys
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from contextlib import redirect_stdout
+from json import dump as json_dump
+from os.path import abspath, dirname, join as path_join
+
+import engine
+import pipeline
+import util
+
+
+DEFAULT_CONFIG_PATH = path_join(dirname(abspath(__file__)), '..', 'config.ini')
+
+
+def parse_override(text):
+    """Override 'section.key=value' as (section, key, value). Sections may
+    contain dots and spaces, e.g. 'episode 1.start=90'."""
+    name, sep, value = text.partition('=')
+    section, dot, key = name.rpartition('.')
+    if not sep or not dot or not section or not key:
+        raise ValueError(f"Invalid config override, expected section.key=value: {text}")
+    return section.strip(), key.strip(), value.strip()
+
+
+def load_config(path, overrides=()):
+    """Config of `path` with `overrides` of (section, key, value). Relative
+    paths of the config are resolved against the directory of `path`."""
+    config = ConfigParser()
+    if not config.read(path):
+        raise ValueError(f"Cannot read config file: {path}")
+    for section, key, value in overrides:
+        if not config.has_section(section):
+            config.add_section(section)
+        config.set(section, key, value)
+    util.base_path = dirname(abspath(path))
+    return config
+
+
+def get_results(observer, results, pattern_path, rect, config):
+    """Machine-readable results of a run, as JSON-compatible dict."""
+    environment = observer.environment
+    components = {}
+    for kinds in observer.components.values():
+        for kind, comps in kinds.items():
+            components[kind] = components.get(kind, 0) + len(comps)
+    run_results = {
+        'pattern': pattern_path,
+        'rule': environment.rule,
+        'rect': list(rect) if rect is not None else environment.get_rect(),
+        'generations': environment.get_duration() - 1,
+        'observed_generations': len(environment.get_times()),
+        'seconds': results['seconds'],
+        'components': dict(sorted(components.items())),
+        'processes': {kind: len(procs) for (kind, procs) in sorted(observer.processes.items())},
+        'computation': results['computation'],
+        'config': {section: dict(config.items(section)) for section in config.sections()},
+    }
+    for key in ('profile', 'recognisers'):
+        if key in results:
+            run_results[key] = results[key]
+    return run_results
+
+
+def run(pattern_path, config, rect=None):
+    """Run the observer procedure on a pattern file. Returns the observer
+    and the results (see get_results())."""
+    if not config.has_section('engine'):
+        config.add_section('engine')
+    config.set('engine', 'simulator', 'headless')
+    rule = config.get('engine', 'rule', fallback='') or None
+    simulator = engine.Engine.from_file(pattern_path, rule, **pipeline.get_engine_options(config))
+    try:
+        observer, results = pipeline.run(config, simulator, rect)
+    finally:
+        simulator.close()
+    return observer, get_results(observer, results, pattern_path, rect, config)
+
+
+def main(argv=None):
+    parser = ArgumentParser(prog='golicat', description="Observer procedure without Golly.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_run = subparsers.add_parser('run', help="observe a pattern and detect computation")
+    parser_run.add_argument('pattern', help=".rle or .mc file")
+    parser_run.add_argument('--config', default=DEFAULT_CONFIG_PATH,
+                            help="config file, default: config.ini of the repository")
+    parser_run.add_argument('--generations', type=int, help="overrides observer.generations")
+    parser_run.add_argument('--rect', type=int, nargs=4, metavar=('LEFT', 'TOP', 'WIDTH', 'HEIGHT'),
+                            help="simulation rect, default: bounding box of the pattern with a margin")
+    parser_run.add_argument('--rule', help="overrides engine.rule, e.g. B36/S23")
+    parser_run.add_argument('--algorithm', choices=sorted(engine.Engine.ALGORITHMS),
+                            help="overrides engine.algorithm")
+    parser_run.add_argument('--set', dest='overrides', action='append', default=[], metavar='SECTION.KEY=VALUE',
+                            help="overrides a config value, may be repeated")
+    parser_run.add_argument('--results', help="JSON file to write results to, - for stdout")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        try:
+            overrides = [parse_override(text) for text in args.overrides]
+        except ValueError as e:
+            parser.error(str(e))
+        if args.generations is not None:
+            overrides.append(('observer', 'generations', str(args.generations)))
+        if args.rule is not None:
+            overrides.append(('engine', 'rule', args.rule))
+        if args.algorithm is not None:
+            overrides.append(('engine', 'algorithm', args.algorithm))
+        config = load_config(args.config, overrides)
+
+        # keep stdout for the results if they are written there
+        with redirect_stdout(sys.stderr if args.results == '-' else sys.stdout):
+            _, results = run(args.pattern, config, args.rect)
+
+        if args.results == '-':
+            json_dump(results, sys.stdout, indent=2)
+            print()
+        elif args.results:
+            with open(args.results, 'w') as f:
+                json_dump(results, f, indent=2)
+            print(f"Results written to {args.results}.")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,13 +9,33 @@ import golly as g
 
 import ap
 import apgol
+import profiling
 import util
+import memory
+import history
+import quadtree
+import rules
+import patterns
+import engine
+import sqlstore
+import cache
+import pipeline
 
 # better integration for Golly
 import importlib
 importlib.reload(ap)
+importlib.reload(profiling)
 importlib.reload(util)
+importlib.reload(memory)
+importlib.reload(history)
+importlib.reload(quadtree)
+importlib.reload(rules)
+importlib.reload(patterns)
+importlib.reload(engine)
 importlib.reload(apgol)
+importlib.reload(sqlstore)
+importlib.reload(cache)
+importlib.reload(pipeline)
 
 
 
@@ -53,16 +73,6 @@ def golly_get_sel_values(g, rect):
     return values
 
 
-def get_simulation_rect(g):
-    rect = g.getselrect()
-    if not rect:
-        margin = 2
-        r_x, r_y, r_w, r_h = g.getrect()
-        rect = [r_x - margin, r_y - margin, r_w + 2 * margin, r_h + 2 * margin]
-        print("No rectangle selected. Auto-selecting:", rect)
-    return rect
-
-    
 def main():
 
     config = ConfigParser()
@@ -71,67 +81,7 @@ def main():
     for _ in range(5): print()
     util.print_banner("Computational Autopoietic Theory in Game of Life", 0)
 
-    if config.getboolean('main', 'load_memory', fallback=False):
-        memory_path = util.get_path(config.get('main', 'path_memory'))        
-        # util.print_banner("Loading stored memory", 1)
-        print("Loading stored memory.")
-        
-        env = None
-        obs = apgol.GolObserver.from_memory_dump(memory_path, env, config)
-        
-    else:
-        
-        util.print_banner("Setting up and simulating environment", 1)
-        
-        g.reset()
-        rect = get_simulation_rect(g)
-        env = apgol.GolEnvironment(g, rect)
-        env.setup()
-    
-        obs = apgol.GolObserver(env, config)
-
-        # observation phase
-
-        util.print_banner("Observing initial state", 1)
-        verbose_observe = config.getboolean('debug', 'verbose_observe', fallback=False)
-        generations = config.getint('observer', 'generations')
-        obs.observe()
-
-        for gen in range(generations):
-            if verbose_observe:
-                # FUTURE may include time as parameter here
-                util.print_banner(f"Observing state at time unit {gen}", 2)
-            else:
-                print('.', end='', flush=True)
-                
-            env.simulate_step()
-            obs.observe()
-
-        if verbose_observe:
-            print(flush=True)
-            print(flush=True)
-
-        # reflection phase
-
-        if config.getboolean('observer', 'phase_reflect', fallback=True):
-            util.print_banner("Reflecting", 1)
-            obs.reflect()
-
-    # detect computation
-            
-    if config.getboolean('observer', 'phase_detect_computation', fallback=True):
-        util.print_banner("Detect computation", 1)
-        obs.detect_computation()
-
-    util.print_banner("End of observer procedure", 1)
-
-    # store memory
-
-    if config.getboolean('main', 'save_memory', fallback=False):
-        memory_path = util.get_path(config.get('main', 'path_memory'))
-        print("Storing memory.")
-
-        obs.dump_memory(memory_path)
+    pipeline.run(config, g)
 
 
 def main_old():
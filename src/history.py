@@ -0,0 +1,95 @@
+
+# Compact storage of environment history.
+#
+# DeltaFrames keeps the values of all cells only every `keyframe_interval`
+# generations. For the generations in between it stores the indices of cells
+# whose value changed since the previous generation. A frame is reconstructed
+# by replaying deltas from the closest earlier keyframe, or from the frame
+# reconstructed last if that is closer, so reading generations in order costs
+# only the number of changed cells per generation. The indices of live cells
+# are kept per generation as well, updated from the changed cells, so live
+# cells can be listed without reconstructing a frame.
+
+from array import array
+from bisect import bisect_left
+
+
+class DeltaFrames:
+
+    def __init__(self, cell_count, keyframe_interval=64):
+        if keyframe_interval < 1:
+            raise ValueError(f"Invalid keyframe interval: {keyframe_interval}")
+        self.cell_count = cell_count
+        self.keyframe_interval = keyframe_interval
+        self._keyframes = []  # bytes, one byte per cell
+        self._deltas = []  # array of changed cell indices per generation, empty at keyframes
+        self._live = []  # sorted array of live cell indices per generation
+        self._latest = None  # values of the latest generation
+        self._cursor = (None, None)  # (time, bytearray) of the frame reconstructed last
+
+    def __len__(self):
+        return len(self._deltas)
+
+    def append(self, values):
+        """Add the next generation, `values` in row-major order."""
+        frame = bytes(map(bool, values))
+        if len(frame) != self.cell_count:
+            raise ValueError(f"Frame has {len(frame)} cells instead of {self.cell_count}.")
+        delta = array('I')
+        if len(self._deltas) % self.keyframe_interval == 0:
+            self._keyframes.append(frame)
+            live = _find_ones(frame)
+        else:
+            # bytes are 0 or 1, so the xor is 1 exactly at changed cells
+            changed = (int.from_bytes(self._latest, 'little') ^ int.from_bytes(frame, 'little'))
+            delta = _find_ones(changed.to_bytes(self.cell_count, 'little'))
+            # changed cells are born or die
+            live = array('I', sorted(set(self._live[-1]).symmetric_difference(delta)))
+        self._deltas.append(delta)
+        self._live.append(live)
+        self._latest = frame
+
+    def get_values(self, time):
+        """Values of generation `time` as bytes, one per cell."""
+        if time < 0 or time >= len(self._deltas):
+            raise IndexError(f"Time {time} not in history.")
+        if time == len(self._deltas) - 1:
+            return self._latest
+        keyframe_time = time - time % self.keyframe_interval
+        cursor_time, frame = self._cursor
+        if cursor_time is None or cursor_time > time or cursor_time < keyframe_time:
+            cursor_time = keyframe_time
+            frame = bytearray(self._keyframes[keyframe_time // self.keyframe_interval])
+        for delta in self._deltas[cursor_time + 1:time + 1]:
+            for index in delta:
+                frame[index] ^= 1
+        self._cursor = (time, frame)
+        return bytes(frame)
+
+    def get_value(self, time, index):
+        """Value of cell `index` of generation `time`, without
+        reconstructing the frame."""
+        live = self.get_live_indices(time)
+        position = bisect_left(live, index)
+        return position < len(live) and live[position] == index
+
+    def get_live_indices(self, time):
+        """Sorted indices of the live cells of generation `time`."""
+        if time < 0 or time >= len(self._live):
+            raise IndexError(f"Time {time} not in history.")
+        return self._live[time]
+
+    def get_size(self):
+        """Approximate size of the stored data in bytes."""
+        return (sum(len(frame) for frame in self._keyframes)
+                + sum(delta.itemsize * len(delta) for delta in self._deltas)
+                + sum(live.itemsize * len(live) for live in self._live))
+
+
+def _find_ones(data):
+    indices = array('I')
+    index = data.find(1)
+    while index >= 0:
+        indices.append(index)
+        index = data.find(1, index + 1)
+    return indices
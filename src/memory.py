@@ -0,0 +1,603 @@
+
+# Columnar storage of observer memory.
+#
+# A memory dump is a directory holding a manifest (JSON) and one NumPy array
+# file per column. Components, relations and processes are stored as tables
+# that refer to each other via integer row ids; variable-length fields (the
+# cells of a component, the components of a process) are stored CSR-style as
+# a flat array plus an offset array. Arrays are memory-mapped on loading and
+# stay so: frames are read through PackedFrames, and components, relations
+# and processes are created on first access (see MemoryTables).
+#
+# Columns:
+#   frames                 uint8, (time, height, ceil(width / 8)), bit-packed cell values
+#   comp_kinds             str, kind names referred to by comp_kind
+#   comp_time, comp_kind   per component
+#   comp_cells_ptr         offsets into comp_cells, length is component count + 1
+#   comp_cells             cell indices within a frame (x + y * width)
+#   rel_kinds, rel_kind    per relation
+#   rel_first, rel_second  component ids
+#   proc_kinds, proc_kind  per process
+#   proc_start_ptr, proc_start, proc_end_ptr, proc_end
+#                          component ids, CSR-style
+#   proc_link_from, proc_link_to
+#                          process ids of adjacent processes (optional)
+#
+# A checkpoint log stores the same tables incrementally, one record per
+# generation, see CheckpointLog.
+
+from collections import defaultdict
+from json import load as json_load, dump as json_dump, loads as json_loads, dumps as json_dumps
+from os import makedirs, listdir, remove
+from io import BytesIO
+from struct import Struct
+from os.path import join as path_join, exists as path_exists
+
+import numpy as np
+
+import ap
+
+
+FORMAT_NAME = 'golicat-memory'
+FORMAT_VERSION = 2
+
+_MANIFEST_FILE_NAME = 'manifest.json'
+
+_CHECKPOINT_MAGIC = b'golicat-checkpoint\n'
+_CHECKPOINT_RECORD_HEADER = Struct('<Q')  # payload size
+
+
+def encode_frame(environment, time):
+    width, height = environment.size
+    values = np.fromiter(environment.get_values(time), dtype=bool, count=width * height)
+    return np.packbits(values.reshape(height, width), axis=-1)
+
+
+def decode_frame(packed, size):
+    width, height = size
+    values = np.unpackbits(packed, axis=-1, count=width)
+    # plain Python bools, as stored in cells during simulation
+    return values.astype(bool).ravel().tolist()
+
+
+class PackedFrames:
+    """Bit-packed frames as stored, e.g. memory-mapped, with the interface of
+    history.DeltaFrames. Read-only."""
+
+    def __init__(self, frames, width):
+        self.frames = frames  # (time, height, ceil(width / 8))
+        self.width = width
+
+    def __len__(self):
+        return len(self.frames)
+
+    def append(self, values):
+        raise ValueError("Packed frames cannot be appended to.")
+
+    def _unpack(self, time):
+        return np.unpackbits(self.frames[time], axis=-1, count=self.width)
+
+    def get_values(self, time):
+        """Values of generation `time` as bytes, one per cell."""
+        return self._unpack(time).tobytes()
+
+    def get_value(self, time, index):
+        y, x = divmod(index, self.width)
+        return bool(self.frames[time, y, x >> 3] >> (7 - (x & 7)) & 1)
+
+    def get_live_indices(self, time):
+        return np.flatnonzero(self._unpack(time)).tolist()
+
+
+class ComponentIds:
+    """Assigns consecutive ids to components in the order they are encoded.
+    Components are keyed by object identity, as some component spaces are
+    not hashable."""
+
+    def __init__(self):
+        self._ids = {}
+        self.count = 0
+
+    def add(self, comp):
+        self._ids.setdefault(id(comp), self.count)
+        self.count += 1
+
+    def __getitem__(self, comp):
+        return self._ids[id(comp)]
+
+    def __contains__(self, comp):
+        return id(comp) in self._ids
+
+
+def _get_kind_code(kinds, kind):
+    try:
+        return kinds.index(kind)
+    except ValueError:
+        kinds.append(kind)
+        return len(kinds) - 1
+
+
+def encode_tables(observer, times, processes, comp_ids, process_links=None):
+    """Encode components and relations at `times` and the given processes.
+    `comp_ids` is updated, so that consecutive calls can refer to components
+    encoded earlier. `process_links` is a {proc: [proc, ...]} dict."""
+    width = observer.environment.size[0]
+    offset_x, offset_y = observer.environment.offset
+
+    comp_kinds, comp_time, comp_kind, comp_cells_ptr, comp_cells = [], [], [], [0], []
+    for time in times:
+        for kind, comps in observer.components.get(time, {}).items():
+            code = _get_kind_code(comp_kinds, kind)
+            for comp in comps:
+                comp_ids.add(comp)
+                comp_time.append(time)
+                comp_kind.append(code)
+                for cell in comp.space:
+                    x, y = cell.location
+                    comp_cells.append((x - offset_x) + (y - offset_y) * width)
+                comp_cells_ptr.append(len(comp_cells))
+
+    rel_kinds, rel_kind, rel_first, rel_second = [], [], [], []
+    for time in times:
+        for kind, rels in observer.relations.get(time, {}).items():
+            code = _get_kind_code(rel_kinds, kind)
+            for rel in rels:
+                rel_kind.append(code)
+                rel_first.append(comp_ids[rel.first])
+                rel_second.append(comp_ids[rel.second])
+
+    proc_kinds, proc_kind = [], []
+    proc_start_ptr, proc_start, proc_end_ptr, proc_end = [0], [], [0], []
+    for proc in processes:
+        proc_kind.append(_get_kind_code(proc_kinds, proc.kind))
+        proc_start.extend(comp_ids[comp] for comp in proc.start)
+        proc_start_ptr.append(len(proc_start))
+        proc_end.extend(comp_ids[comp] for comp in proc.end)
+        proc_end_ptr.append(len(proc_end))
+
+    arrays = {
+        'comp_kinds': np.array(comp_kinds, dtype=str),
+        'comp_time': np.array(comp_time, dtype=np.int32),
+        'comp_kind': np.array(comp_kind, dtype=np.uint8),
+        'comp_cells_ptr': np.array(comp_cells_ptr, dtype=np.int64),
+        'comp_cells': np.array(comp_cells, dtype=np.int32),
+        'rel_kinds': np.array(rel_kinds, dtype=str),
+        'rel_kind': np.array(rel_kind, dtype=np.uint8),
+        'rel_first': np.array(rel_first, dtype=np.int64),
+        'rel_second': np.array(rel_second, dtype=np.int64),
+        'proc_kinds': np.array(proc_kinds, dtype=str),
+        'proc_kind': np.array(proc_kind, dtype=np.uint8),
+        'proc_start_ptr': np.array(proc_start_ptr, dtype=np.int64),
+        'proc_start': np.array(proc_start, dtype=np.int64),
+        'proc_end_ptr': np.array(proc_end_ptr, dtype=np.int64),
+        'proc_end': np.array(proc_end, dtype=np.int64),
+    }
+
+    if process_links is not None:
+        arrays.update(encode_process_links(processes, process_links))
+
+    return arrays
+
+
+def encode_process_links(processes, process_links):
+    """Encode a {proc: [proc, ...]} dict as rows of process ids, i.e. of
+    indices into `processes`."""
+    proc_ids = {proc: index for (index, proc) in enumerate(processes)}
+    links = [(proc_ids[pf], proc_ids[pt]) for (pf, pts) in process_links.items() for pt in pts]
+    links_from, links_to = zip(*links) if links else ((), ())
+    return {
+        'proc_link_from': np.array(links_from, dtype=np.int64),
+        'proc_link_to': np.array(links_to, dtype=np.int64),
+    }
+
+
+def decode_process_links(arrays, processes):
+    """Returns ({proc: [proc, ...]}, {proc: [proc, ...]}) for both directions."""
+    next_procs, prev_procs = {}, {}
+    for index_from, index_to in zip(arrays['proc_link_from'].tolist(), arrays['proc_link_to'].tolist()):
+        proc_from, proc_to = processes[index_from], processes[index_to]
+        next_procs.setdefault(proc_from, []).append(proc_to)
+        prev_procs.setdefault(proc_to, []).append(proc_from)
+    return next_procs, prev_procs
+
+
+def decode_tables(arrays, observer, components):
+    """Add components, relations and processes in `arrays` to the observer.
+    `components` is the list of components decoded so far, indexed by id, and
+    is extended. Returns the list of decoded processes and, if stored, their
+    links as ({proc: [proc, ...]}, {proc: [proc, ...]}) for both directions."""
+    environment = observer.environment
+
+    comp_kinds = arrays['comp_kinds'].tolist()
+    comp_cells_ptr = arrays['comp_cells_ptr'].tolist()
+    comp_cells = arrays['comp_cells'].tolist()
+    frame_time, frame_cells = None, None
+
+    for row, (time, code) in enumerate(zip(arrays['comp_time'].tolist(), arrays['comp_kind'].tolist())):
+        if time != frame_time:
+            frame_time, frame_cells = time, environment.get_cells(time)
+        kind = comp_kinds[code]
+        cell_indices = comp_cells[comp_cells_ptr[row]:comp_cells_ptr[row + 1]]
+        comp = ap.Component(kind, frozenset(frame_cells[index] for index in cell_indices), time)
+        observer.components[time][kind].append(comp)
+        components.append(comp)
+
+    rel_kinds = arrays['rel_kinds'].tolist()
+    rel_columns = (arrays[key].tolist() for key in ('rel_kind', 'rel_first', 'rel_second'))
+    for code, first, second in zip(*rel_columns):
+        comp1, comp2 = components[first], components[second]
+        relation = ap.ComponentRelation(rel_kinds[code], comp1, comp2)
+        observer.relations[comp1.time][relation.kind].append(relation)
+
+    proc_kinds = arrays['proc_kinds'].tolist()
+    proc_start_ptr, proc_start, proc_end_ptr, proc_end = (
+        arrays[key].tolist() for key in ('proc_start_ptr', 'proc_start', 'proc_end_ptr', 'proc_end'))
+    processes = []
+    for row, code in enumerate(arrays['proc_kind'].tolist()):
+        comps_start = frozenset(components[i] for i in proc_start[proc_start_ptr[row]:proc_start_ptr[row + 1]])
+        comps_end = frozenset(components[i] for i in proc_end[proc_end_ptr[row]:proc_end_ptr[row + 1]])
+        process = ap.Process(proc_kinds[code], comps_start, comps_end)
+        observer.processes[process.kind].append(process)
+        processes.append(process)
+
+    if 'proc_link_from' not in arrays:
+        return processes, None
+
+    return processes, decode_process_links(arrays, processes)
+
+
+class MemoryTables:
+    """Lazy per-time index over the tables of a memory dump. Attached to an
+    observer, components and relations of a time are created when that time
+    is first accessed, and processes, with their links, when any process is
+    first accessed. Processes only create the components they refer to."""
+
+    def __init__(self, arrays, observer):
+        self.arrays = arrays
+        self.observer = observer
+        comp_time = arrays['comp_time']
+        self._comp_rows = self._index_by_time(comp_time)
+        self._rel_rows = self._index_by_time(comp_time[arrays['rel_first']])
+        self._components = [None] * len(comp_time)  # by id, once created
+        self.pending = set(self._comp_rows)  # times not decoded yet
+        self._comp_kinds = arrays['comp_kinds'].tolist()
+        self._rel_kinds = arrays['rel_kinds'].tolist()
+
+    @staticmethod
+    def _index_by_time(times):
+        # {time: row ids}, rows in stored order
+        order = np.argsort(times, kind='stable')
+        unique_times, starts = np.unique(times[order], return_index=True)
+        return {time: rows for (time, rows) in zip(unique_times.tolist(), np.split(order, starts[1:]))}
+
+    def attach(self):
+        observer = self.observer
+        observer.components = _LazyTimes(self)
+        observer.relations = _LazyTimes(self)
+        observer.processes = _LazyProcesses(self)
+
+    def decode_time(self, time):
+        """Create the components and relations at `time`, unless done
+        already. Returns whether the time was pending."""
+        if time not in self.pending:
+            return False
+        self.pending.discard(time)
+        arrays = self.arrays
+
+        components = defaultdict(list)
+        rows = self._comp_rows[time]
+        cells_start, cells_end = arrays['comp_cells_ptr'][rows].tolist(), arrays['comp_cells_ptr'][rows + 1].tolist()
+        comp_cells = arrays['comp_cells']
+        for row, code, start, end in zip(rows.tolist(), arrays['comp_kind'][rows].tolist(), cells_start, cells_end):
+            comp = self._components[row]
+            if comp is None:
+                # unless created already for a process
+                cells = self._get_cells(comp_cells[start:end].tolist(), time)
+                comp = self._components[row] = ap.Component(self._comp_kinds[code], cells, time)
+            components[comp.kind].append(comp)
+
+        relations = defaultdict(list)
+        rows = self._rel_rows.get(time, np.empty(0, dtype=np.int64))
+        rel_columns = (arrays[key][rows].tolist() for key in ('rel_kind', 'rel_first', 'rel_second'))
+        for code, first, second in zip(*rel_columns):
+            relation = ap.ComponentRelation(self._rel_kinds[code], self.get_component(first), self.get_component(second))
+            relations[relation.kind].append(relation)
+
+        dict.__setitem__(self.observer.components, time, components)
+        dict.__setitem__(self.observer.relations, time, relations)
+        return True
+
+    def decode_all_times(self):
+        for time in sorted(self.pending):
+            self.decode_time(time)
+
+    def get_component(self, comp_id):
+        """Component of an id, created on its own if its time is not decoded
+        yet. Decoding the time later keeps it."""
+        comp = self._components[comp_id]
+        if comp is None:
+            arrays = self.arrays
+            time = int(arrays['comp_time'][comp_id])
+            start, end = arrays['comp_cells_ptr'][comp_id:comp_id + 2].tolist()
+            cells = self._get_cells(arrays['comp_cells'][start:end].tolist(), time)
+            comp = ap.Component(self._comp_kinds[int(arrays['comp_kind'][comp_id])], cells, time)
+            self._components[comp_id] = comp
+        return comp
+
+    def _get_cells(self, indices, time):
+        # cells of indices within a frame
+        environment = self.observer.environment
+        width = environment.size[0]
+        offset_x, offset_y = environment.offset
+        return frozenset(environment.get_cell((offset_x + index % width, offset_y + index // width), time)
+                         for index in indices)
+
+    def decode_processes(self):
+        """Create all processes, with the components they refer to, and
+        restore their links if stored."""
+        arrays = self.arrays
+        proc_kinds = arrays['proc_kinds'].tolist()
+        proc_start_ptr, proc_start, proc_end_ptr, proc_end = (
+            arrays[key].tolist() for key in ('proc_start_ptr', 'proc_start', 'proc_end_ptr', 'proc_end'))
+        get_component = self.get_component
+        processes = []
+        for row, code in enumerate(arrays['proc_kind'].tolist()):
+            comps_start = frozenset(get_component(i) for i in proc_start[proc_start_ptr[row]:proc_start_ptr[row + 1]])
+            comps_end = frozenset(get_component(i) for i in proc_end[proc_end_ptr[row]:proc_end_ptr[row + 1]])
+            process = ap.Process(proc_kinds[code], comps_start, comps_end)
+            dict.setdefault(self.observer.processes, process.kind, []).append(process)
+            processes.append(process)
+        if 'proc_link_from' in arrays:
+            self.observer.set_process_adjacency(decode_process_links(arrays, processes))
+
+
+class _LazyTimes(dict):
+    # {time: {kind: [item, ...]}} like the observer's defaultdicts. Stored
+    # times are decoded on lookup; iterating decodes all of them.
+
+    def __init__(self, tables):
+        super().__init__()
+        self._tables = tables
+
+    def __missing__(self, time):
+        if self._tables.decode_time(time):
+            return dict.__getitem__(self, time)
+        value = self[time] = defaultdict(list)
+        return value
+
+    def __contains__(self, time):
+        return time in self._tables.pending or dict.__contains__(self, time)
+
+    def get(self, time, default=None):
+        return self[time] if time in self else default
+
+    def __iter__(self):
+        self._tables.decode_all_times()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._tables.decode_all_times()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._tables.decode_all_times()
+        return dict.keys(self)
+
+    def values(self):
+        self._tables.decode_all_times()
+        return dict.values(self)
+
+    def items(self):
+        self._tables.decode_all_times()
+        return dict.items(self)
+
+
+class _LazyProcesses(dict):
+    # {kind: [process, ...]} like the observer's defaultdict, decoded as a
+    # whole on first access.
+
+    def __init__(self, tables):
+        super().__init__()
+        self._tables = tables
+
+    def _decode(self):
+        if self._tables is not None:
+            tables, self._tables = self._tables, None
+            tables.decode_processes()
+
+    def __missing__(self, kind):
+        self._decode()
+        if dict.__contains__(self, kind):
+            return dict.__getitem__(self, kind)
+        value = self[kind] = []
+        return value
+
+    def __contains__(self, kind):
+        self._decode()
+        return dict.__contains__(self, kind)
+
+    def get(self, kind, default=None):
+        self._decode()
+        return dict.get(self, kind, default)
+
+    def __iter__(self):
+        self._decode()
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._decode()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._decode()
+        return dict.keys(self)
+
+    def values(self):
+        self._decode()
+        return dict.values(self)
+
+    def items(self):
+        self._decode()
+        return dict.items(self)
+
+
+def write_memory(path, observer, process_links=None):
+    environment = observer.environment
+    duration = environment.get_duration()
+    times = environment.get_times()
+
+    arrays = encode_tables(observer, times, observer.get_all_processes(), ComponentIds(), process_links)
+    width, height = environment.size
+    frames = np.empty((len(times), height, (width + 7) // 8), dtype=np.uint8)
+    for index, time in enumerate(times):
+        frames[index] = encode_frame(environment, time)
+    arrays['frames'] = frames
+
+    makedirs(path, exist_ok=True)
+    # remove columns of an earlier dump at the same path
+    for file_name in listdir(path):
+        if file_name.endswith('.npy') or file_name == _MANIFEST_FILE_NAME:
+            remove(path_join(path, file_name))
+
+    for name, array in arrays.items():
+        np.save(path_join(path, f'{name}.npy'), array, allow_pickle=False)
+
+    manifest = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'rect': environment.get_rect(),
+        'rule': environment.rule,
+        'duration': duration,
+        # times of frames, if generations were skipped
+        'times': times if len(times) != duration else None,
+        'columns': sorted(arrays.keys()),
+    }
+    # written last, marks the dump as complete
+    with open(path_join(path, _MANIFEST_FILE_NAME), 'w') as f:
+        json_dump(manifest, f, indent=2)
+
+
+def read_memory(path):
+    """Returns the manifest and the memory-mapped columns of a dump."""
+    manifest_path = path_join(path, _MANIFEST_FILE_NAME)
+    if not path_exists(manifest_path):
+        raise ValueError("Not a memory dump (no manifest): " + path)
+    with open(manifest_path) as f:
+        manifest = json_load(f)
+    if manifest.get('format') != FORMAT_NAME or manifest.get('version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported memory format in {path}: {manifest.get('format')} v{manifest.get('version')}")
+    arrays = {}
+    for name in manifest['columns']:
+        array = np.load(path_join(path, f'{name}.npy'), mmap_mode='r', allow_pickle=False)
+        arrays[name] = array
+    return manifest, arrays
+
+
+class CheckpointLog:
+    """Appendable log with one record per observed generation.
+
+    The file starts with a magic line and a JSON header line. Each record is
+    a payload size followed by an uncompressed .npz payload holding the
+    generation's bit-packed frame and the tables (see encode_tables()) of the
+    components and relations at that time and the processes added since the
+    previous record. A record that was not written completely, e.g. because
+    the run was aborted, is ignored and overwritten when resuming."""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.records = []
+        self._file = None
+        self._end_offset = None
+        self._comp_ids = ComponentIds()
+        self._proc_counts = {}  # {kind: count}
+
+    def exists(self):
+        return path_exists(self.path)
+
+    def start(self, environment):
+        """Start a new log, overwriting an existing one."""
+        self.header = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'rect': environment.get_rect(),
+            'rule': environment.rule,
+        }
+        self._file = open(self.path, 'wb')
+        self._file.write(_CHECKPOINT_MAGIC + json_dumps(self.header).encode() + b'\n')
+        self._file.flush()
+
+    def load(self):
+        """Read header and all complete records."""
+        self.records = []
+        with open(self.path, 'rb') as f:
+            if f.readline() != _CHECKPOINT_MAGIC:
+                raise ValueError("Not a checkpoint log: " + self.path)
+            self.header = json_loads(f.readline())
+            if self.header.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported checkpoint version in {self.path}: {self.header.get('version')}")
+            self._end_offset = f.tell()
+            while True:
+                size_data = f.read(_CHECKPOINT_RECORD_HEADER.size)
+                if len(size_data) < _CHECKPOINT_RECORD_HEADER.size:
+                    break
+                size, = _CHECKPOINT_RECORD_HEADER.unpack(size_data)
+                payload = f.read(size)
+                if len(payload) < size:
+                    break
+                with np.load(BytesIO(payload), allow_pickle=False) as record:
+                    self.records.append(dict(record))
+                self._end_offset = f.tell()
+
+    def get_rect(self):
+        return self.header['rect']
+
+    def get_rule(self):
+        return self.header.get('rule')
+
+    def get_frames(self):
+        size = self.header['rect'][2:]
+        for record in self.records:
+            yield decode_frame(record['frame'], size)
+
+    def get_times(self):
+        return [int(record['time']) for record in self.records]
+
+    def restore(self, observer):
+        """Add the loaded records' contents to the observer, whose environment
+        must hold the loaded frames, then continue the log after the last
+        complete record."""
+        components = []
+        for record in self.records:
+            decode_tables(record, observer, components)
+        for comp in components:
+            self._comp_ids.add(comp)
+        self._proc_counts = {kind: len(procs) for (kind, procs) in observer.processes.items()}
+
+        self._file = open(self.path, 'r+b')
+        self._file.truncate(self._end_offset)
+        self._file.seek(self._end_offset)
+        # not needed anymore, now part of the observer's memory
+        self.records = []
+
+    def append(self, observer, time):
+        processes = []
+        for kind, procs in observer.processes.items():
+            count = self._proc_counts.get(kind, 0)
+            processes.extend(procs[count:])
+            self._proc_counts[kind] = len(procs)
+
+        arrays = encode_tables(observer, [time], processes, self._comp_ids)
+        arrays['time'] = np.array(time)
+        arrays['frame'] = encode_frame(observer.environment, time)
+
+        buffer = BytesIO()
+        np.savez(buffer, **arrays)
+        payload = buffer.getvalue()
+        self._file.write(_CHECKPOINT_RECORD_HEADER.pack(len(payload)) + payload)
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+# Reading and writing pattern files.
+#
+# usage: python patterns.py <input> <output>   converts between formats
+#
+# Formats, chosen by file content when reading and by extension when writing:
+#   .rle  run length encoded cells, e.g. and-gate.rle
+#   .mc   Golly's macrocell format (see quadtree.py)
+# Patterns are read into a set of live cells (x, y) or a NumPy array of
+# values with its origin. Files are read line by line, so large files are
+# never held in memory as text. Cells are placed as in Golly: at the
+# position of a '#CXRLE Pos=x,y' line if given, otherwise centered.
+
+import re
+from argparse import ArgumentParser
+from itertools import chain
+
+import numpy as np
+
+import quadtree
+import rules
+
+
+RLE_LINE_LENGTH = 70
+
+_RLE_HEADER = re.compile(r'x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)(?:\s*,\s*rule\s*=\s*(\S+))?', re.IGNORECASE)
+_RLE_POSITION = re.compile(r'Pos\s*=\s*(-?\d+)\s*,\s*(-?\d+)')
+_RLE_RUN = re.compile(r'(\d*)(\D)')
+
+
+#
+# run length encoded
+#
+
+def _read_rle_header(lines):
+    """Read comment and header lines. Returns the header as dict and the
+    remaining lines."""
+    header = {'width': None, 'height': None, 'rule': rules.LIFE, 'position': None}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#'):
+            if line.startswith('#CXRLE'):
+                match = _RLE_POSITION.search(line)
+                if match:
+                    header['position'] = (int(match.group(1)), int(match.group(2)))
+            elif line.startswith('#r'):
+                header['rule'] = line[2:].strip()
+            continue
+        match = _RLE_HEADER.match(line)
+        if match:
+            header['width'], header['height'] = int(match.group(1)), int(match.group(2))
+            if match.group(3):
+                header['rule'] = match.group(3)
+            return header, lines
+        # no header line, so this line already holds cells
+        return header, chain([line], lines)
+    return header, iter(())
+
+
+def _get_rle_origin(header):
+    if header['position'] is not None:
+        return header['position']
+    if header['width'] is None:
+        return 0, 0
+    return -(header['width'] // 2), -(header['height'] // 2)
+
+
+def _iter_rle_cells(lines):
+    """Live cells (x, y) relative to the top left corner. Runs and their
+    counts may span lines."""
+    x, y = 0, 0
+    pending = ''  # digits of a count at the end of the previous line
+    for line in lines:
+        if line.startswith('#'):
+            continue
+        text = pending + ''.join(line.split())
+        digits = len(text) - len(text.rstrip('0123456789'))
+        text, pending = text[:len(text) - digits], text[len(text) - digits:]
+        for count, tag in _RLE_RUN.findall(text):
+            count = int(count) if count else 1
+            if tag == 'o':
+                for offset in range(count):
+                    yield x + offset, y
+                x += count
+            elif tag == 'b':
+                x += count
+            elif tag == '$':
+                x, y = 0, y + count
+            elif tag == '!':
+                return
+            else:
+                raise ValueError(f"Unsupported RLE tag, only two states are supported: {tag}")
+
+
+def read_rle(path):
+    """Live cells (x, y) of a .rle file as set and its rule."""
+    with open(path) as f:
+        header, lines = _read_rle_header(f)
+        left, top = _get_rle_origin(header)
+        cells = {(x + left, y + top) for (x, y) in _iter_rle_cells(lines)}
+    return cells, rules.normalize_rule(header['rule'])
+
+
+def read_rle_array(path):
+    """Values of a .rle file as 2D array, its origin and rule. The array is
+    filled while reading if the header gives the size."""
+    with open(path) as f:
+        header, lines = _read_rle_header(f)
+        if header['width'] is None:
+            values, (left, top) = cells_to_array(_iter_rle_cells(lines))
+            origin = _get_rle_origin(header)
+            origin = (origin[0] + left, origin[1] + top)
+        else:
+            values = np.zeros((header['height'], header['width']), dtype=np.uint8)
+            for x, y in _iter_rle_cells(lines):
+                if x >= header['width'] or y >= header['height']:
+                    raise ValueError(f"Cell outside of the size given in the header of {path}: {x}, {y}")
+                values[y, x] = 1
+            origin = _get_rle_origin(header)
+    return values, origin, rules.normalize_rule(header['rule'])
+
+
+def _iter_rle_tokens(cells, left, top):
+    # cells sorted row by row
+    x, y = 0, 0  # position after the cells encoded so far
+    run_x, run_length = None, 0
+    for cx, cy in cells:
+        cx, cy = cx - left, cy - top
+        if run_length and cy == y and cx == run_x + run_length:
+            run_length += 1
+            continue
+        if run_length:
+            yield _format_run(run_length, 'o')
+            x = run_x + run_length
+        if cy > y:
+            yield _format_run(cy - y, '$')
+            x, y = 0, cy
+        if cx > x:
+            yield _format_run(cx - x, 'b')
+        run_x, run_length = cx, 1
+    if run_length:
+        yield _format_run(run_length, 'o')
+    yield '!'
+
+
+def _format_run(count, tag):
+    return f'{count}{tag}' if count > 1 else tag
+
+
+def write_rle(path, cells, rule=rules.LIFE):
+    """Write live cells (x, y) as .rle file, positioned as they are."""
+    cells = sorted(set(cells), key=lambda cell: (cell[1], cell[0]))
+    left = min((x for (x, _) in cells), default=0)
+    top = cells[0][1] if cells else 0
+    width = max((x for (x, _) in cells), default=left - 1) - left + 1
+    height = cells[-1][1] - top + 1 if cells else 0
+    with open(path, 'w') as f:
+        f.write(f'#CXRLE Pos={left},{top}\n')
+        f.write(f'x = {width}, y = {height}, rule = {rules.normalize_rule(rule)}\n')
+        line = ''
+        for token in _iter_rle_tokens(cells, left, top):
+            if len(line) + len(token) > RLE_LINE_LENGTH:
+                f.write(line + '\n')
+                line = ''
+            line += token
+        f.write(line + '\n')
+
+
+#
+# any format
+#
+
+def _is_mc(path):
+    with open(path) as f:
+        return f.readline().startswith('[M2]')
+
+
+def read_pattern(path):
+    """Live cells (x, y) of a .rle or .mc file as set and its rule."""
+    if _is_mc(path):
+        cells, rule = quadtree.read_mc_cells(path)
+        return set(cells), rules.normalize_rule(rule)
+    return read_rle(path)
+
+
+def read_pattern_array(path):
+    """Values of a .rle or .mc file as 2D array, its origin and rule."""
+    if _is_mc(path):
+        cells, rule = read_pattern(path)
+        return (*cells_to_array(cells), rule)
+    return read_rle_array(path)
+
+
+def write_pattern(path, cells, rule=rules.LIFE):
+    """Write live cells (x, y) as .mc file if `path` ends with .mc, as .rle
+    file otherwise."""
+    if path.lower().endswith('.mc'):
+        quadtree.write_mc_cells(path, cells, rules.normalize_rule(rule))
+    else:
+        write_rle(path, cells, rule)
+
+
+def cells_to_array(cells):
+    """2D array of the values of live cells (x, y) and its origin."""
+    cells = np.array(list(cells), dtype=np.int64).reshape(-1, 2)
+    if not len(cells):
+        return np.zeros((0, 0), dtype=np.uint8), (0, 0)
+    left, top = cells.min(axis=0)
+    right, bottom = cells.max(axis=0) + 1
+    values = np.zeros((bottom - top, right - left), dtype=np.uint8)
+    values[cells[:, 1] - top, cells[:, 0] - left] = 1
+    return values, (int(left), int(top))
+
+
+def array_to_cells(values, origin=(0, 0)):
+    """Live cells (x, y) of a 2D array of values with its first value at
+    `origin`."""
+    ys, xs = np.nonzero(values)
+    return set(zip((xs + origin[0]).tolist(), (ys + origin[1]).tolist()))
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Convert between .rle and .mc pattern files.")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    args = parser.parse_args(argv)
+
+    cells, rule = read_pattern(args.input)
+    write_pattern(args.output, cells, rule)
+    print(f"Wrote {len(cells)} cells to {args.output}.")
+
+
+if __name__ == '__main__':
+    main()
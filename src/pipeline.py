@@ -0,0 +1,283 @@
+
+# Observer procedure: setting up and simulating the environment, observing,
+# reflecting and detecting computation.
+#
+# Shared by golly-hook.py, which runs it on the pattern opened in Golly, and
+# golicat.py, which runs it headless on pattern files. The simulator is
+# either Golly's scripting module or an engine.Engine, which offers the same
+# interface.
+#
+# Phases are timed by the profiler configured in the [profile] section (see
+# profiling.py).
+
+from time import perf_counter
+
+import apgol
+import cache
+import engine
+import memory
+import profiling
+import rules
+import sqlstore
+import util
+
+
+def get_simulation_rect(simulator):
+    rect = simulator.getselrect()
+    if not rect:
+        margin = 2
+        r_x, r_y, r_w, r_h = simulator.getrect()
+        rect = [r_x - margin, r_y - margin, r_w + 2 * margin, r_h + 2 * margin]
+        print("No rectangle selected. Auto-selecting:", rect)
+    return rect
+
+
+def get_engine_options(config):
+    """Keyword arguments of engine.Engine from the engine section."""
+    algorithm = config.get('engine', 'algorithm', fallback='hashlife')
+    options = {'algorithm': algorithm}
+    if algorithm == 'tiled':
+        options['processes'] = config.getint('engine', 'processes', fallback=0) or None
+    return options
+
+
+def simulate_and_observe(config, golly, rect, result_cache=None, cache_keys=None):
+
+    checkpoint_log = None
+    if config.getboolean('main', 'write_checkpoint', fallback=False):
+        checkpoint_path = util.get_path(config.get('main', 'path_checkpoint'))
+        checkpoint_log = memory.CheckpointLog(checkpoint_path)
+
+    store_path = None
+    if config.getboolean('main', 'write_store', fallback=False):
+        store_path = util.get_path(config.get('main', 'path_store'))
+
+    # replay cached frames instead of simulating in Golly if possible
+    simulator = result_cache and result_cache.load_simulation(cache_keys)
+    replaying = bool(simulator)
+    if replaying:
+        print("Using cached simulation.")
+    elif isinstance(golly, engine.Engine):
+        simulator = golly
+    elif config.get('engine', 'simulator', fallback='golly') == 'headless':
+        print("Simulating with headless engine.")
+        simulator = engine.Engine.from_golly(golly, **get_engine_options(config))
+    else:
+        simulator = golly
+
+    resumed = bool(checkpoint_log and checkpoint_log.exists()
+                   and config.getboolean('main', 'resume_checkpoint', fallback=False))
+    if resumed:
+
+        util.print_banner("Resuming from checkpoint", 1)
+
+        checkpoint_log.load()
+        obs = apgol.GolObserver.from_checkpoint(checkpoint_log, config, simulator)
+        env = obs.environment
+        env.resume()
+        print(f"Resuming after time unit {env.get_duration() - 1}.")
+
+    else:
+
+        util.print_banner("Setting up and simulating environment", 1)
+
+        env = apgol.GolEnvironment(simulator, rect, **apgol.GolEnvironment.get_history_options(config))
+        with profiling.phase('simulate'):
+            env.setup()
+
+        obs = apgol.GolObserver(env, config)
+
+        # observation phase
+
+        util.print_banner("Observing initial state", 1)
+        with profiling.phase('observe'):
+            obs.observe()
+
+        if checkpoint_log:
+            with profiling.phase('checkpoint'):
+                checkpoint_log.start(env)
+                checkpoint_log.append(obs, 0)
+
+    store = None
+    if store_path:
+        print(f"Writing observations to store: {store_path}")
+        store = sqlstore.ObservationStore(store_path, env, resume=resumed)
+        with profiling.phase('store'):
+            if resumed:
+                store.resume(obs)
+            elif env.get_duration() == 1:
+                store.add_generation(obs, 0)
+
+    verbose_observe = config.getboolean('debug', 'verbose_observe', fallback=False)
+    generations = config.getint('observer', 'generations')
+
+    # observe either all generations or only those of episodes, skipping
+    # the others in one go
+    observe_times = None
+    if config.getboolean('observer', 'observe_episodes_only', fallback=False):
+        observe_times = frozenset(apgol.get_episode_times(config))
+        print(f"Observing {len(observe_times & frozenset(range(1, generations + 1)))} "
+              f"of {generations} generations in episodes.")
+
+    for gen in range(env.get_duration() - 1, generations):
+        if observe_times is not None and gen + 1 not in observe_times:
+            continue
+
+        if verbose_observe:
+            # FUTURE may include time as parameter here
+            util.print_banner(f"Observing state at time unit {gen}", 2)
+        else:
+            print('.', end='', flush=True)
+
+        with profiling.phase('simulate'):
+            env.skip_steps(gen + 1 - env.get_duration())
+            env.simulate_step()
+        with profiling.phase('observe'):
+            obs.observe()
+
+        if checkpoint_log:
+            with profiling.phase('checkpoint'):
+                checkpoint_log.append(obs, gen + 1)
+        if store:
+            with profiling.phase('store'):
+                store.add_generation(obs, gen + 1)
+
+    if checkpoint_log:
+        checkpoint_log.close()
+    if store:
+        store.close()
+    if isinstance(simulator, engine.Engine):
+        simulator.close()
+
+    if verbose_observe:
+        print(flush=True)
+        print(flush=True)
+
+    if result_cache:
+        # only complete simulations can be replayed
+        if not replaying and len(env.get_times()) == env.get_duration():
+            result_cache.store_simulation(cache_keys, env)
+        result_cache.store_observation(cache_keys, obs)
+
+    return obs
+
+
+def run(config, golly, rect=None):
+    """Run all phases enabled in `config` on the pattern of `golly`, within
+    `rect` if given. Returns the observer and results: seconds per phase,
+    the summary of detecting computation and, if enabled, the profile and
+    counts of recognisers."""
+    results = {'seconds': {}, 'computation': None}
+    seconds = results['seconds']
+    profiler = profiling.Profiler.from_config(config)
+    if profiler:
+        profiler.start()
+    start = perf_counter()
+
+    if config.getboolean('main', 'load_memory', fallback=False):
+        memory_path = util.get_path(config.get('main', 'path_memory'))
+        # util.print_banner("Loading stored memory", 1)
+        print("Loading stored memory.")
+
+        env = None
+        obs = apgol.GolObserver.from_memory_dump(memory_path, env, config)
+        seconds['load_memory'] = perf_counter() - start
+
+    else:
+
+        golly.reset()
+        if rect is None:
+            rect = get_simulation_rect(golly)
+
+        # rule of the config instead of the pattern's
+        rule = config.get('engine', 'rule', fallback='')
+        if rule and rules.normalize_rule(rule) != golly.getrule():
+            golly.setrule(rules.normalize_rule(rule))
+        print("Rule:", golly.getrule())
+
+        result_cache, cache_keys = None, None
+        if config.getboolean('cache', 'enabled', fallback=False):
+            cache_path = util.get_path(config.get('cache', 'path'))
+            cache_max_size = config.getint('cache', 'max_size_mb', fallback=None)
+            result_cache = cache.ResultCache(cache_path, cache_max_size and cache_max_size * 2**20)
+            cache_keys = result_cache.get_keys(golly, rect, config)
+
+        obs = result_cache and result_cache.load_observation(cache_keys, config)
+
+        if obs:
+            print("Using cached observation.")
+        else:
+            obs = simulate_and_observe(config, golly, rect, result_cache, cache_keys)
+        seconds['observe'] = perf_counter() - start
+
+        if result_cache:
+            if not result_cache.load_graph(cache_keys, obs):
+                result_cache.store_graph(cache_keys, obs)
+
+        # reflection phase
+
+        if config.getboolean('observer', 'phase_reflect', fallback=True):
+            util.print_banner("Reflecting", 1)
+            phase_start = perf_counter()
+            with profiling.phase('reflect'):
+                obs.reflect()
+            seconds['reflect'] = perf_counter() - phase_start
+
+    # detect computation
+
+    if config.getboolean('observer', 'phase_detect_computation', fallback=True):
+        util.print_banner("Detect computation", 1)
+        phase_start = perf_counter()
+        with profiling.phase('detect_computation'):
+            results['computation'] = obs.detect_computation()
+        seconds['detect_computation'] = perf_counter() - phase_start
+
+    if obs.recogniser_stats is not None:
+        write_recogniser_stats(obs)
+        results['recognisers'] = obs.get_recogniser_stats()
+
+    util.print_banner("End of observer procedure", 1)
+
+    # store memory
+
+    if config.getboolean('main', 'save_memory', fallback=False):
+        memory_path = util.get_path(config.get('main', 'path_memory'))
+        print("Storing memory.")
+
+        with profiling.phase('save_memory'):
+            obs.dump_memory(memory_path)
+
+    seconds['total'] = perf_counter() - start
+
+    if profiler:
+        profiler.stop()
+        write_profile(config, profiler)
+        results['profile'] = profiler.get_report()
+    return obs, results
+
+
+def write_recogniser_stats(obs):
+    """Print counts of recognisers as table."""
+    util.print_banner("Recognisers", 1)
+    rows = []
+    for category, kinds in obs.get_recogniser_stats().items():
+        for kind, stats in kinds.items():
+            # hits of batch recognisers are the number recognised
+            hit_rate = '-' if category.endswith('-batch') else f"{stats['hits'] / stats['calls']:.1%}"
+            rows.append([category, kind, stats['calls'], stats['hits'], hit_rate,
+                         f"{stats['seconds']:.3f}", f"{stats['seconds'] / stats['calls'] * 1e6:.1f}"])
+    util.print_tabular_data(rows, ['Category', 'Kind', 'Calls', 'Hits', 'Hit rate', 'Seconds', 'us/call'])
+
+
+def write_profile(config, profiler):
+    """Print the profile as table and write it as configured."""
+    util.print_banner("Profile", 1)
+    util.print_tabular_data(*profiler.get_table())
+    if config.get('profile', 'path_report', fallback=''):
+        report_path = util.get_path(config.get('profile', 'path_report'))
+        profiler.write_report(report_path)
+        print(f"Profile written to {report_path}.")
+    if profiler.cprofile_phase:
+        cprofile_path = util.get_path(config.get('profile', 'path_cprofile', fallback='profile.prof'))
+        profiler.write_cprofile(cprofile_path)
+        print(f"cProfile statistics of phase {profiler.cprofile_phase} written to {cprofile_path}.")
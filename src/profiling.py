@@ -0,0 +1,158 @@
+
+# Wall time, call counts and peak memory of phases of the observer procedure.
+#
+# Code marks phases with `with profiling.phase('observe'):` or the decorator
+# @profiling.timed('export'). Unless a Profiler is active, marking costs next
+# to nothing. pipeline.py activates one as configured in the [profile]
+# section. Phases may nest, and the time of a nested phase also counts for
+# the enclosing ones. Sub-stages are named after their phase, e.g.
+# 'observe.links'.
+#
+# Peak memory is the most memory allocated by Python above that at the
+# start of a phase, measured with tracemalloc. This slows down runs
+# considerably, so it is optional. One phase can also be profiled with
+# cProfile, over all of its calls.
+
+import cProfile
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from json import dump as json_dump
+from time import perf_counter
+
+
+# profiler of the current run, or None
+active = None
+
+_NO_PHASE = nullcontext()
+
+
+def phase(name):
+    """Context manager marking a phase for the active profiler, if any."""
+    if active is None:
+        return _NO_PHASE
+    return active.phase(name)
+
+
+def timed(name):
+    """Decorator marking each call of a function as phase."""
+    def decorate(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class Profiler:
+
+    def __init__(self, memory=False, cprofile_phase=None):
+        self.memory = memory
+        self.cprofile_phase = cprofile_phase
+        self._cprofile = cProfile.Profile() if cprofile_phase else None
+        self._phases = {}  # {name: [calls, seconds, peak bytes]}, in order of first call
+        self._stack = []  # [[name, start, memory at start, peak memory], ...] of running phases
+        self._tracing = False
+        self._start = None
+        self._seconds = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Profiler as configured by the profile section, or None if
+        disabled."""
+        if not config.getboolean('profile', 'enabled', fallback=False):
+            return None
+        return cls(config.getboolean('profile', 'memory', fallback=False),
+                   config.get('profile', 'cprofile_phase', fallback='') or None)
+
+    def start(self):
+        """Make this the active profiler."""
+        global active
+        if active is not None:
+            # left over by an aborted run
+            active.stop()
+        active = self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self._start = perf_counter()
+
+    def stop(self):
+        global active
+        self._seconds = perf_counter() - self._start
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        if active is self:
+            active = None
+
+    @contextmanager
+    def phase(self, name):
+        stats = self._phases.setdefault(name, [0, 0.0, 0])
+        stats[0] += 1
+        # time of recursive calls counts once
+        outermost = all(entry[0] != name for entry in self._stack)
+        profiling = outermost and name == self.cprofile_phase
+
+        entry = [name, None, 0, 0]
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # the peak so far belongs to the enclosing phase
+            if self._stack:
+                self._stack[-1][3] = max(self._stack[-1][3], peak)
+            tracemalloc.reset_peak()
+            entry[2] = entry[3] = current
+        self._stack.append(entry)
+        if profiling:
+            self._cprofile.enable()
+        entry[1] = perf_counter()
+        try:
+            yield
+        finally:
+            seconds = perf_counter() - entry[1]
+            if profiling:
+                self._cprofile.disable()
+            self._stack.pop()
+            if outermost:
+                stats[1] += seconds
+            if self.memory:
+                peak = max(entry[3], tracemalloc.get_traced_memory()[1])
+                stats[2] = max(stats[2], peak - entry[2])
+                if self._stack:
+                    self._stack[-1][3] = max(self._stack[-1][3], peak)
+
+    def get_report(self):
+        """Seconds of the whole run and calls, seconds and peak MiB per
+        phase, as JSON-compatible dict."""
+        seconds = self._seconds if self._seconds is not None else perf_counter() - self._start
+        phases = {}
+        for name, (calls, phase_seconds, peak) in self._phases.items():
+            phases[name] = {'calls': calls, 'seconds': phase_seconds}
+            if self.memory:
+                phases[name]['peak_mb'] = peak / 2**20
+        return {'seconds': seconds, 'phases': phases}
+
+    def get_table(self):
+        """Rows and headers of a summary table of the report."""
+        report = self.get_report()
+        headers = ['Phase', 'Calls', 'Seconds', 'Seconds/call', 'Share']
+        if self.memory:
+            headers.append('Peak MiB')
+        rows = []
+        for name, stats in report['phases'].items():
+            row = [name, stats['calls'], f"{stats['seconds']:.3f}", f"{stats['seconds'] / stats['calls']:.6f}",
+                   f"{stats['seconds'] / report['seconds']:.1%}" if report['seconds'] else '-']
+            if self.memory:
+                row.append(f"{stats['peak_mb']:.1f}")
+            rows.append(row)
+        return rows, headers
+
+    def write_report(self, path):
+        with open(path, 'w') as f:
+            json_dump(self.get_report(), f, indent=2)
+
+    def write_cprofile(self, path):
+        """Write cProfile statistics of the profiled phase, for pstats or
+        e.g. snakeviz."""
+        self._cprofile.dump_stats(path)
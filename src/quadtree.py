@@ -0,0 +1,300 @@
+
+# Hash-consed quadtrees of Game of Life generations.
+#
+# Nodes are kept once per distinct content in a QuadTreeStore and referred
+# to by integer ids, so identical subtrees are shared across space and, when
+# generations use the same store, across time. Leaves are 8x8 blocks (level
+# 3) stored as 64-bit masks with bit x + 8 * y set for live cells. Nodes of
+# level L > 3 cover 2^L x 2^L cells and have four children of level L - 1
+# (nw, ne, sw, se). Id 0 is the empty node of any level.
+#
+# This is the structure of Golly's macrocell format (.mc), which can be read
+# and written. In .mc files the root is centered at the origin, i.e. a root
+# of level L covers -2^(L-1) <= x, y < 2^(L-1).
+
+from collections import defaultdict
+
+
+LEAF_LEVEL = 3
+MC_HEADER = '[M2] (golicat)'
+
+
+def _count_bits(mask):
+    return bin(mask).count('1')
+
+
+class QuadTreeStore:
+
+    def __init__(self):
+        self._nodes = [None]  # {id: leaf mask or (nw, ne, sw, se)}
+        self._populations = [0]
+        self._ids = {}  # {leaf mask or (nw, ne, sw, se): id}
+
+    def __len__(self):
+        """Number of distinct nodes."""
+        return len(self._nodes)
+
+    def _intern(self, key, population):
+        node = self._ids.get(key)
+        if node is None:
+            node = len(self._nodes)
+            self._nodes.append(key)
+            self._populations.append(population)
+            self._ids[key] = node
+        return node
+
+    # Children determine the level of a node, as every non-empty node has a
+    # fixed level. Hence no level is needed in the key.
+
+    def make_leaf(self, mask):
+        if not mask:
+            return 0
+        return self._intern(mask, _count_bits(mask))
+
+    def make_node(self, nw, ne, sw, se):
+        if not (nw or ne or sw or se):
+            return 0
+        children = (nw, ne, sw, se)
+        return self._intern(children, sum(self._populations[child] for child in children))
+
+    def get_children(self, node):
+        return self._nodes[node] if node else (0, 0, 0, 0)
+
+    def get_mask(self, leaf):
+        return self._nodes[leaf] if leaf else 0
+
+    def get_population(self, node):
+        return self._populations[node]
+
+    def from_cells(self, cells, level):
+        """Root of a tree of `level` with the live `cells` (x, y), where
+        0 <= x, y < 2^level."""
+        if level < LEAF_LEVEL:
+            raise ValueError(f"Level below leaf level: {level}")
+        size = 1 << level
+        masks = defaultdict(int)  # {(leaf x, leaf y): mask}
+        for x, y in cells:
+            if x < 0 or y < 0 or x >= size or y >= size:
+                raise ValueError(f"Cell outside of tree: {x}, {y}")
+            masks[(x >> 3, y >> 3)] |= 1 << ((x & 7) + 8 * (y & 7))
+        nodes = {pos: self.make_leaf(mask) for (pos, mask) in masks.items()}
+        for _ in range(level - LEAF_LEVEL):
+            parents = defaultdict(lambda: [0, 0, 0, 0])
+            for (nx, ny), node in nodes.items():
+                parents[(nx >> 1, ny >> 1)][(nx & 1) + 2 * (ny & 1)] = node
+            nodes = {pos: self.make_node(*children) for (pos, children) in parents.items()}
+        return nodes.get((0, 0), 0)
+
+    def get_value(self, node, level, x, y):
+        """Whether cell (x, y) of the tree is alive."""
+        if x < 0 or y < 0 or x >= 1 << level or y >= 1 << level:
+            return False
+        while node and level > LEAF_LEVEL:
+            half = 1 << (level - 1)
+            node = self._nodes[node][(x >= half) + 2 * (y >= half)]
+            x, y = x & (half - 1), y & (half - 1)
+            level -= 1
+        return bool(node) and bool(self._nodes[node] >> (x + 8 * y) & 1)
+
+    def get_cells(self, node, level, rect=None):
+        """Live cells (x, y) of the tree, only those inside `rect` (left,
+        top, width, height) if given."""
+        if rect is None:
+            rect = (0, 0, 1 << level, 1 << level)
+        left, top, width, height = rect
+        right, bottom = left + width, top + height
+        stack = [(node, level, 0, 0)]
+        while stack:
+            node, level, ox, oy = stack.pop()
+            size = 1 << level
+            if not node or ox >= right or oy >= bottom or ox + size <= left or oy + size <= top:
+                continue
+            if level == LEAF_LEVEL:
+                mask = self._nodes[node]
+                while mask:
+                    bit = mask & -mask
+                    index = bit.bit_length() - 1
+                    x, y = ox + (index & 7), oy + (index >> 3)
+                    if left <= x < right and top <= y < bottom:
+                        yield x, y
+                    mask ^= bit
+            else:
+                half = size >> 1
+                nw, ne, sw, se = self._nodes[node]
+                stack += [
+                    (se, level - 1, ox + half, oy + half), (sw, level - 1, ox, oy + half),
+                    (ne, level - 1, ox + half, oy), (nw, level - 1, ox, oy)]
+
+
+class QuadTreeFrames:
+    """Generations of a rect as quadtrees sharing one store, with the
+    interface of history.DeltaFrames."""
+
+    def __init__(self, rect, store=None):
+        self.rect = rect
+        left, top, width, height = rect
+        self.level = max(LEAF_LEVEL, (max(width, height) - 1).bit_length())
+        self.store = store if store is not None else QuadTreeStore()
+        self._roots = []
+
+    def __len__(self):
+        return len(self._roots)
+
+    def append(self, values):
+        """Add the next generation, `values` in row-major order."""
+        width = self.rect[2]
+        cells = ((index % width, index // width) for (index, value) in enumerate(values) if value)
+        self._roots.append(self.store.from_cells(cells, self.level))
+
+    def get_values(self, time):
+        """Values of generation `time` as bytes, one per cell."""
+        left, top, width, height = self.rect
+        frame = bytearray(width * height)
+        for x, y in self.store.get_cells(self._roots[time], self.level, (0, 0, width, height)):
+            frame[x + y * width] = 1
+        return bytes(frame)
+
+    def get_live_indices(self, time, rect=None):
+        """Sorted indices (row-major) of the live cells at `time`, only those
+        inside `rect` (see get_cells()) if given, visiting only non-empty
+        nodes."""
+        left, top, width, height = self.rect
+        return sorted((x - left) + (y - top) * width for (x, y) in self.get_cells(time, rect))
+
+    def get_value(self, time, index):
+        """Value of cell `index` (row-major) of generation `time`, looked up
+        in its tree."""
+        width = self.rect[2]
+        return self.store.get_value(self._roots[time], self.level, index % width, index // width)
+
+    def get_cells(self, time, rect=None):
+        """Live cells (x, y) at `time` inside `rect` (left, top, width,
+        height), in absolute coordinates."""
+        left, top, width, height = self.rect
+        if rect is None:
+            rect = self.rect
+        # clip to the frame, as the tree may be larger
+        clip_left, clip_top = max(rect[0] - left, 0), max(rect[1] - top, 0)
+        clip_right = min(rect[0] - left + rect[2], width)
+        clip_bottom = min(rect[1] - top + rect[3], height)
+        clip = (clip_left, clip_top, max(clip_right - clip_left, 0), max(clip_bottom - clip_top, 0))
+        return [(x + left, y + top) for (x, y) in self.store.get_cells(self._roots[time], self.level, clip)]
+
+    def get_node_count(self):
+        """Number of distinct nodes of all generations."""
+        return len(self.store)
+
+    def write_mc(self, path, time, rule='B3/S23'):
+        write_mc_cells(path, self.get_cells(time), rule)
+
+
+#
+# macrocell format
+#
+
+def read_mc(path, store=None):
+    """Read a two-state .mc file into `store`. Returns (store, root, level,
+    rule, header), header being the first line naming the writer."""
+    store = store if store is not None else QuadTreeStore()
+    nodes, levels = [0], [None]  # by line number, 0 being empty
+    rule = 'B3/S23'
+    header = MC_HEADER
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('[M2]'):
+                header = line
+                continue
+            if not line:
+                continue
+            if line.startswith('#'):
+                if line.startswith('#R'):
+                    rule = line[2:].strip()
+                continue
+            if line[0] in '.*$':
+                mask, x, y = 0, 0, 0
+                for char in line:
+                    if char == '$':
+                        x, y = 0, y + 1
+                    else:
+                        if char == '*':
+                            mask |= 1 << (x + 8 * y)
+                        x += 1
+                nodes.append(store.make_leaf(mask))
+                levels.append(LEAF_LEVEL)
+            else:
+                level, *children = (int(field) for field in line.split())
+                if level <= LEAF_LEVEL or len(children) != 4:
+                    raise ValueError(f"Unsupported macrocell node: {line}")
+                for child in children:
+                    if child and levels[child] != level - 1:
+                        raise ValueError(f"Invalid child level in macrocell node: {line}")
+                nodes.append(store.make_node(*(nodes[child] for child in children)))
+                levels.append(level)
+    if len(nodes) < 2:
+        raise ValueError(f"No nodes in macrocell file: {path}")
+    return store, nodes[-1], levels[-1], rule, header
+
+
+def write_mc(path, store, root, level, rule='B3/S23', header=MC_HEADER):
+    """Write the tree at `root` as .mc file, shared nodes only once.
+    `header` is kept from read_mc() to reproduce a file."""
+    lines = []
+    numbers = {0: 0}  # {node id: line number}
+
+    def add_node(node, level):
+        if node in numbers:
+            return numbers[node]
+        if level == LEAF_LEVEL:
+            mask = store.get_mask(node)
+            rows = [''.join('*' if mask >> (x + 8 * y) & 1 else '.' for x in range(8)).rstrip('.')
+                    for y in range(8)]
+            while not rows[-1]:
+                rows.pop()
+            lines.append(''.join(row + '$' for row in rows))
+        else:
+            children = [add_node(child, level - 1) for child in store.get_children(node)]
+            lines.append(' '.join(str(value) for value in (level, *children)))
+        numbers[node] = len(lines)
+        return numbers[node]
+
+    if level <= LEAF_LEVEL:
+        raise ValueError(f"Root level must be above leaf level: {level}")
+    if root:
+        add_node(root, level)
+    else:
+        # an empty universe still needs a root
+        lines.append(f'{level} 0 0 0 0')
+    with open(path, 'w') as f:
+        f.write(f'{header}\n#R {rule}\n')
+        f.writelines(line + '\n' for line in lines)
+
+
+def read_mc_cells(path):
+    """Live cells (x, y) of a .mc file and its rule."""
+    store, root, level, rule, _ = read_mc(path)
+    offset = 1 << (level - 1)
+    return [(x - offset, y - offset) for (x, y) in store.get_cells(root, level)], rule
+
+
+def write_mc_cells(path, cells, rule='B3/S23'):
+    cells = list(cells)
+    extent = max((max(x, y, -x - 1, -y - 1) for (x, y) in cells), default=0)
+    # root of level L covers -2^(L-1) <= x, y < 2^(L-1)
+    level = max(LEAF_LEVEL + 1, extent.bit_length() + 1)
+    offset = 1 << (level - 1)
+    store = QuadTreeStore()
+    root = store.from_cells(((x + offset, y + offset) for (x, y) in cells), level)
+    write_mc(path, store, root, level, rule)
+
+
+def read_mc_values(path, rect):
+    """Row-major cell values of `rect` (left, top, width, height) of a .mc
+    file, e.g. for GolEnvironment.from_frames()."""
+    left, top, width, height = rect
+    values = [False] * (width * height)
+    cells, _ = read_mc_cells(path)
+    for x, y in cells:
+        if left <= x < left + width and top <= y < top + height:
+            values[(x - left) + (y - top) * width] = True
+    return values
@@ -0,0 +1,66 @@
+
+# Life-like rules.
+#
+# A Life-like rule gives the numbers of live neighbours for which a dead
+# cell is born and a live cell survives, written in B/S notation, e.g.
+# 'B3/S23' for Conway's Life or 'B36/S23' for HighLife. The older S/B
+# notation, e.g. '23/3', is accepted as well. Rules are normalised to B/S
+# notation with sorted digits, as used in Golly and in .rle and .mc headers.
+#
+# Rule tables map a 3x3 neighbourhood, with cell (dx, dy) in bit
+# (dx + 1) + 3 * (dy + 1) and hence the center in bit 4, to the value of the
+# center in the next generation.
+
+import numpy as np
+
+
+LIFE = 'B3/S23'
+
+CENTER_BIT = 4
+
+
+def _parse_counts(digits, rule):
+    if digits and not digits.isdigit():
+        raise ValueError(f"Invalid rule: {rule}")
+    counts = frozenset(int(digit) for digit in digits)
+    if len(counts) != len(digits) or any(count > 8 for count in counts):
+        raise ValueError(f"Invalid rule: {rule}")
+    return counts
+
+
+def parse_rule(rule):
+    """Birth and survival counts of a rule as (frozenset, frozenset)."""
+    if ':' in rule:
+        raise ValueError(f"Rules with bounded grids are not supported: {rule}")
+    parts = rule.strip().upper().split('/')
+    if len(parts) != 2:
+        raise ValueError(f"Invalid rule: {rule}")
+    if parts[0].startswith('S') and parts[1].startswith('B'):
+        parts.reverse()
+    if parts[0].startswith('B') and parts[1].startswith('S'):
+        birth, survival = parts[0][1:], parts[1][1:]
+    elif parts[0].startswith(('B', 'S')) or parts[1].startswith(('B', 'S')):
+        raise ValueError(f"Invalid rule: {rule}")
+    else:
+        # S/B notation
+        survival, birth = parts
+    return _parse_counts(birth, rule), _parse_counts(survival, rule)
+
+
+def format_rule(birth, survival):
+    return 'B' + ''.join(map(str, sorted(birth))) + '/S' + ''.join(map(str, sorted(survival)))
+
+
+def normalize_rule(rule):
+    """Rule in B/S notation with sorted digits, e.g. 'B36/S23' for '23/63'."""
+    return format_rule(*parse_rule(rule))
+
+
+def make_rule_table(birth, survival):
+    """Next value of the center for each of the 512 neighbourhoods."""
+    table = np.zeros(512, dtype=np.uint8)
+    for neighbourhood in range(512):
+        count = bin(neighbourhood & ~(1 << CENTER_BIT)).count('1')
+        alive = neighbourhood >> CENTER_BIT & 1
+        table[neighbourhood] = count in (survival if alive else birth)
+    return table
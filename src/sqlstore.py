@@ -0,0 +1,334 @@
+
+# SQLite-backed store of observations for post-hoc analysis.
+#
+# Holds the observer's components, processes and links between processes,
+# indexed by time, kind, signature (Process.to_hash()) and bounding box.
+# Bounding boxes are kept in R*Tree tables keyed by row id. Component
+# relations are not stored. Generations are added one at a time, each in a
+# single transaction, so runs too large to keep in memory can be written
+# while observing and queried afterwards.
+#
+# A file may hold several runs, each with its rule and rect. A store object
+# writes or reads one run. A run resumed from a checkpoint continues its
+# stored run (see ObservationStore.resume()).
+#
+# Rects in queries follow the episode convention: (left, top, right, bottom)
+# with bottom <= top.
+
+import sqlite3
+from array import array
+from collections import defaultdict
+
+import ap
+from apgol import GolCell, Location
+
+
+SCHEMA_VERSION = 2
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    rule TEXT NOT NULL,
+    rect TEXT NOT NULL  -- left,top,width,height
+);
+CREATE TABLE IF NOT EXISTS components (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    cells BLOB NOT NULL  -- int32 triples: x, y, value, sorted
+);
+CREATE TABLE IF NOT EXISTS processes (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    time_start INTEGER NOT NULL,
+    time_end INTEGER,  -- NULL for destructive processes
+    signature TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS process_components (
+    process_id INTEGER NOT NULL,
+    component_id INTEGER NOT NULL,
+    role INTEGER NOT NULL  -- 0: start, 1: end
+);
+CREATE TABLE IF NOT EXISTS process_links (
+    from_id INTEGER NOT NULL,
+    to_id INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS components_bb USING rtree_i32 (id, x_min, x_max, y_min, y_max);
+CREATE VIRTUAL TABLE IF NOT EXISTS processes_bb USING rtree_i32 (id, x_min, x_max, y_min, y_max);
+CREATE INDEX IF NOT EXISTS components_time_kind ON components (run_id, time, kind);
+CREATE INDEX IF NOT EXISTS components_kind ON components (run_id, kind);
+CREATE INDEX IF NOT EXISTS processes_time ON processes (run_id, time_start, time_end);
+CREATE INDEX IF NOT EXISTS processes_kind ON processes (run_id, kind);
+CREATE INDEX IF NOT EXISTS processes_signature ON processes (signature);
+CREATE INDEX IF NOT EXISTS process_components_process ON process_components (process_id, role);
+CREATE INDEX IF NOT EXISTS process_components_component ON process_components (component_id, role);
+CREATE INDEX IF NOT EXISTS process_links_from ON process_links (from_id);
+CREATE INDEX IF NOT EXISTS process_links_to ON process_links (to_id);
+'''
+
+
+def _get_bb(cells):
+    # in the column order of the R*Tree tables
+    xs = [cell.location.x for cell in cells]
+    ys = [cell.location.y for cell in cells]
+    return min(xs), max(xs), min(ys), max(ys)
+
+
+def _encode_cells(cells):
+    # sorted, so that equal components are stored equally
+    values = sorted((*cell.location, bool(cell.value)) for cell in cells)
+    return array('i', (v for value in values for v in value)).tobytes()
+
+
+class ObservationStore:
+
+    def __init__(self, path, environment=None, run_id=None, resume=False):
+        """With `environment` a new run is written, whose observations refer
+        to the environment's cells, or with `resume` the latest run of the
+        same rule and rect is continued (see resume()). Without, run
+        `run_id`, by default the latest, is read and queried components
+        refer to unlinked cells created from the stored values."""
+        self.environment = environment
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SCHEMA)
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)', ('schema_version', str(SCHEMA_VERSION)))
+        version = self._get_meta('schema_version')
+        if version != str(SCHEMA_VERSION):
+            raise ValueError(f"Unsupported store schema version in {path}: {version}")
+        if environment is not None:
+            run_key = (environment.rule, ','.join(str(v) for v in environment.get_rect()))
+            row = self._connection.execute('SELECT MAX(id) FROM runs WHERE rule = ? AND rect = ?', run_key).fetchone()
+            run_id = row[0] if resume else None
+            if run_id is None:
+                with self._connection:
+                    run_id = self._connection.execute('INSERT INTO runs (rule, rect) VALUES (?, ?)', run_key).lastrowid
+        elif run_id is None:
+            run_id = self._get_max_id('runs')
+        self.run_id = run_id
+        # ids continue after those of other runs stored in the same file
+        self._comp_ids = {}  # {id(component): stored id}, keyed by identity as not all spaces are hashable
+        self._next_comp_id = self._get_max_id('components') + 1
+        self._proc_counts = {}  # {kind: count}
+        self._next_proc_id = self._get_max_id('processes') + 1
+        self._comp_cache = {}  # {id: Component}
+
+    def get_rule(self):
+        """Rule of the run, None if not known."""
+        row = self._connection.execute('SELECT rule FROM runs WHERE id = ?', (self.run_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_runs(self):
+        """Runs in the file as [(id, rule, rect), ...]."""
+        rows = self._connection.execute('SELECT id, rule, rect FROM runs ORDER BY id')
+        return [(run_id, rule, [int(v) for v in rect.split(',')]) for (run_id, rule, rect) in rows]
+
+    def _get_meta(self, key):
+        row = self._connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _get_max_id(self, table):
+        return self._connection.execute(f'SELECT COALESCE(MAX(id), -1) FROM {table}').fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+    #
+    # writing
+    #
+
+    def resume(self, observer):
+        """Continue the run with `observer` resumed e.g. from a checkpoint.
+        Its components are mapped to the stored ones, and generations it
+        observed but that were not stored yet are added."""
+        stored_ids = defaultdict(list)  # {(time, kind, cells): [id, ...]}
+        rows = self._connection.execute(
+            'SELECT id, time, kind, cells FROM components WHERE run_id = ? ORDER BY id', (self.run_id,))
+        for comp_id, time, kind, cells in rows:
+            stored_ids[(time, kind, cells)].append(comp_id)
+        missing_times = []
+        for time in self.environment.get_times():
+            comps = [(kind, comp) for (kind, kind_comps) in observer.components.get(time, {}).items()
+                     for comp in kind_comps]
+            for kind, comp in comps:
+                ids = stored_ids.get((time, kind, _encode_cells(comp.space)))
+                if ids:
+                    self._comp_ids[id(comp)] = ids.pop(0)
+            if comps and not any(id(comp) in self._comp_ids for (_, comp) in comps):
+                missing_times.append(time)
+        rows = self._connection.execute(
+            'SELECT kind, COUNT(*) FROM processes WHERE run_id = ? GROUP BY kind', (self.run_id,))
+        self._proc_counts = dict(rows)
+        self._add_generations(observer, missing_times)
+
+    def add_generation(self, observer, time):
+        """Store the components at `time` and the processes added to the
+        observer since the previous call, in one transaction."""
+        self._add_generations(observer, [time])
+
+    def _add_generations(self, observer, times):
+        comp_rows, comp_bb_rows = [], []
+        for time in times:
+            for kind, comps in observer.components.get(time, {}).items():
+                for comp in comps:
+                    if id(comp) in self._comp_ids:
+                        continue
+                    comp_id = self._comp_ids[id(comp)] = self._next_comp_id
+                    self._next_comp_id += 1
+                    comp_rows.append((comp_id, self.run_id, kind, time, _encode_cells(comp.space)))
+                    comp_bb_rows.append((comp_id, *_get_bb(comp.space)))
+
+        proc_rows, proc_bb_rows, proc_comp_rows = [], [], []
+        first_proc_id = self._next_proc_id
+        for kind, procs in observer.processes.items():
+            count = self._proc_counts.get(kind, 0)
+            for proc in procs[count:]:
+                proc_id = self._next_proc_id
+                self._next_proc_id += 1
+                time_start = min(co.time for co in proc.start)
+                time_end = max(co.time for co in proc.end) if proc.end else None
+                cells = [ce for co in frozenset.union(proc.start, proc.end) for ce in co.space]
+                proc_rows.append((proc_id, self.run_id, kind, time_start, time_end, proc.to_hash()))
+                proc_bb_rows.append((proc_id, *_get_bb(cells)))
+                for role, comps in enumerate((proc.start, proc.end)):
+                    for comp in comps:
+                        proc_comp_rows.append((proc_id, self._comp_ids[id(comp)], role))
+            self._proc_counts[kind] = max(count, len(procs))
+
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO components (id, run_id, kind, time, cells) VALUES (?, ?, ?, ?, ?)', comp_rows)
+            self._connection.executemany(
+                'INSERT INTO components_bb (id, x_min, x_max, y_min, y_max) VALUES (?, ?, ?, ?, ?)', comp_bb_rows)
+            self._connection.executemany(
+                'INSERT INTO processes (id, run_id, kind, time_start, time_end, signature) '
+                'VALUES (?, ?, ?, ?, ?, ?)', proc_rows)
+            self._connection.executemany(
+                'INSERT INTO processes_bb (id, x_min, x_max, y_min, y_max) VALUES (?, ?, ?, ?, ?)', proc_bb_rows)
+            self._connection.executemany(
+                'INSERT INTO process_components (process_id, component_id, role) VALUES (?, ?, ?)', proc_comp_rows)
+            # link new processes to processes ending in one of their start components
+            self._connection.execute(
+                'INSERT INTO process_links (from_id, to_id) '
+                'SELECT DISTINCT pe.process_id, ps.process_id FROM process_components ps '
+                'JOIN process_components pe ON pe.component_id = ps.component_id AND pe.role = 1 '
+                'WHERE ps.role = 0 AND ps.process_id >= ?', (first_proc_id,))
+
+    #
+    # querying
+    #
+
+    def _make_filter(self, table, kind=None, time_start=None, time_end=None, rect=None, signature=None,
+                     time_columns=('time', 'time')):
+        # FROM and WHERE clauses of a query of `table`
+        source = table
+        clauses, params = [f'{table}.run_id = ?'], [self.run_id]
+        if kind is not None:
+            clauses.append('kind = ?')
+            params.append(kind)
+        if time_start is not None:
+            clauses.append(f'{time_columns[0]} >= ?')
+            params.append(time_start)
+        if time_end is not None:
+            clauses.append(f'COALESCE({time_columns[1]}, {time_columns[0]}) <= ?')
+            params.append(time_end)
+        if rect is not None:
+            left, top, right, bottom = rect
+            # the R*Tree search comes first, rows are then looked up by id
+            source = f'{table}_bb bb CROSS JOIN {table} ON {table}.id = bb.id'
+            clauses.append('bb.x_max >= ? AND bb.x_min <= ? AND bb.y_max >= ? AND bb.y_min <= ?')
+            params.extend((left, right, bottom, top))
+        if signature is not None:
+            clauses.append('signature = ?')
+            params.append(signature)
+        return f'{source} WHERE ' + ' AND '.join(clauses), params
+
+    def _get_components(self, comp_ids):
+        missing = [ci for ci in comp_ids if ci not in self._comp_cache]
+        # stay below SQLite's limit of host parameters
+        for index in range(0, len(missing), 500):
+            chunk = missing[index:index + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self._connection.execute(
+                f'SELECT id, kind, time, cells FROM components WHERE id IN ({placeholders})', chunk)
+            for row in rows:
+                self._comp_cache[row[0]] = self._make_component(*row[1:])
+        return [self._comp_cache[ci] for ci in comp_ids]
+
+    def _make_component(self, kind, time, cells_data):
+        values = array('i')
+        values.frombytes(cells_data)
+        cells = []
+        for x, y, value in zip(values[0::3], values[1::3], values[2::3]):
+            if self.environment:
+                cells.append(self.environment.get_cell((x, y), time))
+            else:
+                cells.append(GolCell(Location(x, y), time, bool(value)))
+        return ap.Component(kind, frozenset(cells), time)
+
+    def query_components(self, kind=None, time_start=None, time_end=None, rect=None):
+        """Components of `kind` between `time_start` and `time_end` (both
+        inclusive) whose bounding box touches `rect`."""
+        source, params = self._make_filter('components', kind, time_start, time_end, rect)
+        rows = self._connection.execute(f'SELECT components.id FROM {source} ORDER BY components.id', params)
+        return self._get_components([row[0] for row in rows])
+
+    def query_process_ids(self, kind=None, time_start=None, time_end=None, rect=None, signature=None):
+        source, params = self._make_filter(
+            'processes', kind, time_start, time_end, rect, signature, ('time_start', 'time_end'))
+        rows = self._connection.execute(f'SELECT processes.id FROM {source} ORDER BY processes.id', params)
+        return [row[0] for row in rows]
+
+    def get_processes(self, proc_ids):
+        """{id: Process} for the given process ids."""
+        proc_comps = {pi: ([], []) for pi in proc_ids}
+        for index in range(0, len(proc_ids), 500):
+            chunk = proc_ids[index:index + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self._connection.execute(
+                'SELECT process_id, component_id, role FROM process_components '
+                f'WHERE process_id IN ({placeholders})', chunk)
+            for proc_id, comp_id, role in rows:
+                proc_comps[proc_id][role].append(comp_id)
+        kinds = {}
+        for index in range(0, len(proc_ids), 500):
+            chunk = proc_ids[index:index + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self._connection.execute(f'SELECT id, kind FROM processes WHERE id IN ({placeholders})', chunk)
+            kinds.update(rows)
+        processes = {}
+        for proc_id, (start_ids, end_ids) in proc_comps.items():
+            comps_start = frozenset(self._get_components(start_ids))
+            comps_end = frozenset(self._get_components(end_ids))
+            processes[proc_id] = ap.Process(kinds[proc_id], comps_start, comps_end)
+        return processes
+
+    def query_processes(self, kind=None, time_start=None, time_end=None, rect=None, signature=None):
+        """Processes of `kind` that start and end between `time_start` and
+        `time_end` (both inclusive), whose bounding box touches `rect` and
+        whose hash equals `signature`."""
+        proc_ids = self.query_process_ids(kind, time_start, time_end, rect, signature)
+        processes = self.get_processes(proc_ids)
+        return [processes[pi] for pi in proc_ids]
+
+    def query_process_links(self, proc_ids):
+        """Links between the given processes as {id: [id, ...]} adjacency
+        dict, see util.get_proc_adjacency_matrix()."""
+        proc_ids_set = frozenset(proc_ids)
+        next_procs = {}
+        for index in range(0, len(proc_ids), 500):
+            chunk = proc_ids[index:index + 500]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self._connection.execute(
+                f'SELECT from_id, to_id FROM process_links WHERE from_id IN ({placeholders})', chunk)
+            for proc_from, proc_to in rows:
+                if proc_to in proc_ids_set:
+                    next_procs.setdefault(proc_from, []).append(proc_to)
+        return next_procs
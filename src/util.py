@@ -11,13 +11,13 @@ from threading import Thread
 from queue import Queue, Empty
 from datetime import datetime
 
+import profiling
+
 #from ap import StructureClass, ComponentRelationConstraint
 
-import networkx as nx
-import py4cytoscape as p4c
-from matplotlib import pyplot as plot
+# networkx, py4cytoscape, matplotlib and pandas are imported where they are
+# used, so that runs only pay their import time if they use the feature
 # import subprocess
-import pandas as pd
 
 
 BANNER_GLYPHS = '#*+'
@@ -164,6 +164,7 @@ def pattern_mirror_y(pattern):
 
 
 def get_comps_and_procs_graph(processes):
+    import networkx as nx
     graph = nx.DiGraph()
     component_names = {}
 
@@ -206,6 +207,7 @@ def get_comps_and_procs_graph(processes):
 
 def get_procs_graph(graph_dict):
     # graph_dict is a {node: [node,...]} adjecency dict-of-lists
+    import networkx as nx
     graph = nx.DiGraph()
     component_names = {}
 
@@ -227,9 +229,53 @@ def get_procs_graph(graph_dict):
     for pf, pt in links:
         graph.add_edge(node_ids[pf], node_ids[pt])
 
+    # persistent index for looking up nodes by process, see get_procs_subgraph()
+    graph.graph['node_ids'] = node_ids
+
     return graph
 
 
+def get_procs_subgraph(graph, procs):
+    # graph is expected to be built by get_procs_graph()
+    # processes without any links are not part of the graph and are skipped
+    node_ids = graph.graph['node_ids']
+    nodes = [node_ids[proc] for proc in procs if proc in node_ids]
+    return graph.subgraph(nodes)
+
+
+def get_weak_component_labels(graph):
+    # Label each node with the index of its weakly connected component.
+    # Returns {node: label} and the list of node sets, indexed by label.
+    import networkx as nx
+    labels = {}
+    members = []
+    for label, nodes in enumerate(nx.weakly_connected_components(graph)):
+        members.append(nodes)
+        for node in nodes:
+            labels[node] = label
+    return labels, members
+
+
+class UnionFind:
+    # disjoint sets over the integers 0..size-1
+    def __init__(self, size):
+        self.parents = list(range(size))
+    def find(self, item):
+        parents = self.parents
+        while parents[item] != item:
+            # path halving
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+        return item
+    def union(self, item1, item2):
+        root1, root2 = self.find(item1), self.find(item2)
+        if root1 != root2:
+            self.parents[max(root1, root2)] = min(root1, root2)
+    def get_labels(self):
+        # label of each item is the smallest item of its set
+        return [self.find(item) for item in range(len(self.parents))]
+
+
 def get_proc_adjacency_matrix(procs, also_backward_links=False):
     # By putting processes into time buckets and single-looping over pairs
     # afterwards we reduce time complexity from O(n^2) to O(k*n) for some
@@ -278,7 +324,11 @@ def get_proc_adjacency_matrix(procs, also_backward_links=False):
         return next_procs
 
 
+@profiling.timed('export')
 def write_graph(graph, output_file_path, separate_components=True, do_labels=True, zoom=5, multipartite_layout=True):
+    import networkx as nx
+    from matplotlib import pyplot as plot
+
     ##  for page in pages:
     ##    graph.add_node(page.id)
     ##    for id in re_findall(export.Page.regex_link, page.text):
@@ -483,6 +533,7 @@ def group_overlapping_processes(processes):
     return groups
 
 
+@profiling.timed('export')
 def write_graph_explorer(graph, dest_dir):
     if not path_exists(dest_dir):
         os.mkdir(dest_dir)
@@ -602,8 +653,16 @@ def terminate_cytoscape_connection():
         __cytoscape_task_queue.stop()
     
         
+@profiling.timed('export')
 def send_graph_to_cytoscape(graph, network_title):
     global __cytoscape_task_queue
+    try:
+        import networkx as nx
+        import pandas as pd
+        import py4cytoscape as p4c
+    except ImportError as ex:
+        print(f"Cannot import {ex.name}, not exporting to Cytoscape.")
+        return
     
     if not __cytoscape_task_queue:
         try:
@@ -709,11 +768,17 @@ def send_graph_to_cytoscape(graph, network_title):
     #         print(ex)
 
 
+# directory that relative paths are resolved against, by default the parent
+# of the working directory, as when running from src/ in Golly
+base_path = None
+
+
 def get_path(rel_path):
-    return path_join(getcwd(), '..', rel_path)
+    return path_join(base_path if base_path is not None else path_join(getcwd(), '..'), rel_path)
 
 
 def print_tabular_data_old(data, headers):
+    import pandas as pd
     index = range(1, len(data) + 1)
     # this is pretty stupid, but will do to avoid unnecessary external dependencies
     headers = [f' |  {h}' for h in headers]
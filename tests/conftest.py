@@ -0,0 +1,7 @@
+
+# Tests import the modules of src/ like golly-hook.py and golicat.py do.
+
+import sys
+from os.path import abspath, dirname, join as path_join
+
+sys.path.insert(0, path_join(dirname(dirname(abspath(__file__))), 'src'))
@@ -0,0 +1,116 @@
+
+# Keys, entries and eviction of the result cache.
+
+from contextlib import redirect_stdout
+from io import StringIO
+from os import makedirs, utime
+from os.path import abspath, dirname, join as path_join
+from shutil import copyfile
+
+import cache
+import engine
+import golicat
+import patterns
+from test_memory import BLINKER, BLOCK, GLIDER, get_memory
+
+REPOSITORY_PATH = dirname(dirname(abspath(__file__)))
+
+RECT = [-2, -2, 20, 18]
+
+
+def load_config(directory, overrides=()):
+    config_path = str(directory / 'config.ini')
+    copyfile(path_join(REPOSITORY_PATH, 'config.ini'), config_path)
+    return golicat.load_config(config_path, [
+        ('main', 'load_memory', 'false'),
+        ('main', 'save_memory', 'false'),
+        ('main', 'write_checkpoint', 'false'),
+        ('main', 'write_store', 'false'),
+        ('cache', 'enabled', 'true'),
+        ('observer', 'generations', '6'),
+        ('observer', 'observe_episodes_only', 'false'),
+        ('observer', 'phase_reflect', 'false'),
+        ('observer', 'phase_detect_computation', 'false'),
+        ('debug', 'verbose_observe', 'false'),
+        ('profile', 'enabled', 'false'),
+        *overrides,
+    ])
+
+
+def get_keys(directory, overrides=()):
+    simulator = engine.Engine(GLIDER + BLINKER + BLOCK)
+    return cache.ResultCache(str(directory / 'cache')).get_keys(simulator, RECT, load_config(directory, overrides))
+
+
+def test_keys(tmp_path):
+    keys = get_keys(tmp_path)
+    assert get_keys(tmp_path) == keys
+    # analysis options do not affect observing
+    for option, value in [('strict_noise_removal', 'false'), ('phase_detect_computation', 'true')]:
+        assert get_keys(tmp_path, [('observer', option, value)]) == keys
+    other_keys = get_keys(tmp_path, [('observer', 'generations', '7')])
+    assert all(other_keys[stage] != keys[stage] for stage in keys)
+
+    # observing episodes only depends on the episodes, simulating does not
+    episodes_keys = get_keys(tmp_path, [('observer', 'observe_episodes_only', 'true')])
+    assert episodes_keys['simulation'] == keys['simulation']
+    assert episodes_keys['observation'] != keys['observation']
+    moved_keys = get_keys(tmp_path, [('observer', 'observe_episodes_only', 'true'), ('episode 1', 'start', '2')])
+    assert moved_keys['simulation'] == keys['simulation']
+    assert moved_keys['observation'] != episodes_keys['observation']
+
+
+def test_cache_hit(tmp_path):
+    pattern_path = str(tmp_path / 'pattern.rle')
+    patterns.write_rle(pattern_path, GLIDER + BLINKER + BLOCK)
+    output = StringIO()
+    with redirect_stdout(output):
+        observer, _ = golicat.run(pattern_path, load_config(tmp_path), RECT)
+    assert "Using cached observation." not in output.getvalue()
+    with redirect_stdout(output):
+        cached_observer, _ = golicat.run(
+            pattern_path, load_config(tmp_path, [('observer', 'strict_noise_removal', 'false')]), RECT)
+    assert "Using cached observation." in output.getvalue()
+    assert get_memory(cached_observer) == get_memory(observer)
+
+
+def make_entry(size):
+    def write_entry(path):
+        with open(path_join(path, 'data'), 'wb') as f:
+            f.write(bytes(size))
+    return write_entry
+
+
+def test_evict_least_recently_used(tmp_path):
+    result_cache = cache.ResultCache(str(tmp_path), 2500)
+    with redirect_stdout(StringIO()):
+        for index, key in enumerate('ab'):
+            result_cache.put_entry('simulation', key, make_entry(1000))
+            utime(result_cache.get_entry('simulation', key), (1000 + index, 1000 + index))
+        # used most recently now
+        assert result_cache.get_entry('simulation', 'a')
+        result_cache.put_entry('graph', 'c', make_entry(1000))
+    assert result_cache.get_entry('simulation', 'a')
+    assert result_cache.get_entry('simulation', 'b') is None
+    assert result_cache.get_entry('graph', 'c')
+
+
+def test_put_entry_replaced(tmp_path, monkeypatch):
+    result_cache = cache.ResultCache(str(tmp_path))
+    result_cache.put_entry('graph', 'a', make_entry(10))
+    result_cache.put_entry('graph', 'a', make_entry(20))
+    entry_path = result_cache.get_entry('graph', 'a')
+    with open(path_join(entry_path, 'data'), 'rb') as f:
+        assert len(f.read()) == 20
+
+    # another process stores the entry between removing and replacing it
+    replace = cache.replace
+    def replace_raced(source, destination):
+        makedirs(destination)
+        make_entry(30)(destination)
+        replace(source, destination)
+    monkeypatch.setattr(cache, 'replace', replace_raced)
+    result_cache.put_entry('graph', 'a', make_entry(40))
+    with open(path_join(entry_path, 'data'), 'rb') as f:
+        assert len(f.read()) == 30
+    assert [name for name in (tmp_path / 'graph').iterdir() if name.name.startswith('.tmp-')] == []
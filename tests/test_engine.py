@@ -0,0 +1,92 @@
+
+# Engine algorithms against a naive stepper on the unbounded plane.
+
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import engine
+import patterns
+import rules
+
+ALGORITHM_OPTIONS = {
+    'hashlife': {},
+    'grid': {},
+    'bitgrid': {},
+    # small tiles, so that patterns span several
+    'tiled': {'processes': 2, 'tile_rows': 8, 'tile_units': 1},
+}
+
+
+def step_naive(cells, rule=rules.LIFE):
+    birth, survival = rules.parse_rule(rule)
+    counts = Counter((x + dx, y + dy) for (x, y) in cells
+                     for dx in (-1, 0, 1) for dy in (-1, 0, 1) if dx or dy)
+    return {cell for (cell, count) in counts.items()
+            if count in (survival if cell in cells else birth)}
+
+
+def make_soup(size, density=0.4, seed=0):
+    rng = np.random.default_rng(seed)
+    return patterns.array_to_cells(rng.random((size, size)) < density)
+
+
+def get_cells(simulator):
+    cells = simulator.getcells(simulator.getrect())
+    return set(zip(cells[0::2], cells[1::2]))
+
+
+@pytest.mark.parametrize('algorithm', list(ALGORITHM_OPTIONS))
+def test_engine_equals_naive_stepper(algorithm):
+    cells = make_soup(80)
+    simulator = engine.Engine(cells, algorithm=algorithm, **ALGORITHM_OPTIONS[algorithm])
+    try:
+        generation = 0
+        # single steps and leaps of other than powers of two
+        for steps in (1, 1, 5, 1, 12, 3):
+            simulator.run(steps)
+            for _ in range(steps):
+                cells = step_naive(cells)
+            generation += steps
+            assert get_cells(simulator) == cells
+            assert simulator.getgen() == str(generation)
+            assert simulator.getpop() == str(len(cells))
+        simulator.reset()
+        assert get_cells(simulator) == make_soup(80)
+    finally:
+        simulator.close()
+
+
+@pytest.mark.parametrize('algorithm', list(ALGORITHM_OPTIONS))
+def test_engine_from_array(algorithm):
+    values = np.zeros((6, 8), dtype=np.uint8)
+    values[2, 3:6] = 1  # blinker
+    simulator = engine.Engine.from_array(values, (-4, 10), algorithm=algorithm, **ALGORITHM_OPTIONS[algorithm])
+    try:
+        simulator.run(1)
+        assert get_cells(simulator) == {(0, 11), (0, 12), (0, 13)}
+        assert simulator.getrect() == [0, 11, 1, 3]
+    finally:
+        simulator.close()
+
+
+@pytest.mark.parametrize('algorithm', list(ALGORITHM_OPTIONS))
+@pytest.mark.parametrize('rule', ['B36/S23', '23/36', 'B2/S', 'B3678/S34678'])
+def test_engine_rules(algorithm, rule):
+    cells = make_soup(40, 0.3, 1)
+    simulator = engine.Engine(cells, rule, algorithm=algorithm, **ALGORITHM_OPTIONS[algorithm])
+    try:
+        simulator.run(1)
+        simulator.run(6)
+        for _ in range(7):
+            cells = step_naive(cells, rule)
+        assert get_cells(simulator) == cells
+        assert simulator.getrule() == rules.normalize_rule(rule)
+    finally:
+        simulator.close()
+
+
+def test_engine_rejects_b0():
+    with pytest.raises(ValueError):
+        engine.Engine([(0, 0)], 'B03/S23')
@@ -0,0 +1,23 @@
+
+# Episodes of computation as configured.
+
+from configparser import ConfigParser
+
+import apgol
+
+
+def test_get_episodes():
+    config = ConfigParser()
+    config.read_string('''
+[episodes]
+note = not an episode
+[episode_defaults]
+duration = 5
+[episode first]
+rect = 0,0,10,10
+start = 4
+duration = 20
+input = 01
+''')
+    assert apgol.get_episodes(config) == [apgol.Episode((0, 0, 10, 10), 4, 24, '01')]
+    assert min(apgol.get_episode_times(config)) == 3
@@ -0,0 +1,120 @@
+
+# Memory dumps written and read back.
+
+from contextlib import redirect_stdout
+from io import StringIO
+from os.path import abspath, dirname, join as path_join
+from shutil import copyfile
+
+import pytest
+
+import apgol
+import golicat
+import patterns
+
+REPOSITORY_PATH = dirname(dirname(abspath(__file__)))
+
+GLIDER = [(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)]
+BLINKER = [(12, 3), (13, 3), (14, 3)]
+BLOCK = [(4, 12), (5, 12), (4, 13), (5, 13)]
+
+
+def observe(directory, history_mode, generations=6):
+    """Observer of a run on a small pattern, without files written."""
+    config_path = str(directory / 'config.ini')
+    copyfile(path_join(REPOSITORY_PATH, 'config.ini'), config_path)
+    config = golicat.load_config(config_path, [
+        ('main', 'load_memory', 'false'),
+        ('main', 'save_memory', 'false'),
+        ('main', 'write_checkpoint', 'false'),
+        ('main', 'write_store', 'false'),
+        ('cache', 'enabled', 'false'),
+        ('environment', 'history', history_mode),
+        ('observer', 'generations', str(generations)),
+        ('observer', 'observe_episodes_only', 'false'),
+        ('observer', 'phase_reflect', 'false'),
+        ('observer', 'phase_detect_computation', 'false'),
+        ('debug', 'verbose_observe', 'false'),
+        ('profile', 'enabled', 'false'),
+    ])
+    pattern_path = str(directory / 'pattern.rle')
+    patterns.write_rle(pattern_path, GLIDER + BLINKER + BLOCK)
+    observer, _ = golicat.run(pattern_path, config)
+    return observer, config
+
+
+def get_memory(observer):
+    """Contents of an observer's memory, with cells as (location, time,
+    value)."""
+    def get_space(space):
+        return sorted((cell.location, cell.time, cell.value) for cell in space)
+    environment = observer.environment
+    memory = [environment.get_rect(), environment.rule, environment.get_times(),
+              [list(environment.get_values(time)) for time in environment.get_times()]]
+    for time in sorted(observer.components):
+        for kind in sorted(observer.components[time]):
+            memory.append((time, kind, sorted(get_space(comp.space) for comp in observer.components[time][kind])))
+    for time in sorted(observer.relations):
+        for kind in sorted(observer.relations[time]):
+            memory.append((time, kind, sorted((get_space(relation.first.space), get_space(relation.second.space))
+                                              for relation in observer.relations[time][kind])))
+    for kind in sorted(observer.processes):
+        memory.append((kind, [(sorted(get_space(comp.space) for comp in process.start),
+                               sorted(get_space(comp.space) for comp in process.end))
+                              for process in observer.processes[kind]]))
+    next_procs, _ = observer.get_process_adjacency()
+    processes = observer.get_all_processes()
+    indices = {id(process): index for (index, process) in enumerate(processes)}
+    memory.append(sorted((indices[id(process)], sorted(indices[id(next_proc)] for next_proc in next_processes))
+                         for (process, next_processes) in next_procs.items()))
+    return memory
+
+
+@pytest.mark.parametrize('history_mode', ['full', 'delta', 'quadtree'])
+def test_memory_round_trip(tmp_path, history_mode):
+    observer, config = observe(tmp_path, history_mode)
+    assert observer.get_all_processes()
+    path = str(tmp_path / 'memory')
+    observer.dump_memory(path)
+    loaded = apgol.GolObserver.from_memory_dump(path, None, config)
+    assert loaded.environment.history_mode == 'packed'
+    assert get_memory(loaded) == get_memory(observer)
+
+    # dumped again, e.g. after loading, the memory is unchanged
+    copy_path = str(tmp_path / 'memory-copy')
+    loaded.dump_memory(copy_path)
+    assert get_memory(apgol.GolObserver.from_memory_dump(copy_path, None, config)) == get_memory(observer)
+
+
+def test_memory_lazy_times(tmp_path):
+    observer, config = observe(tmp_path, 'full')
+    path = str(tmp_path / 'memory')
+    observer.dump_memory(path)
+    loaded = apgol.GolObserver.from_memory_dump(path, None, config)
+    # single times are decoded on access, others stay absent
+    time = observer.environment.get_times()[-1]
+    assert len(loaded.components[time]['alive-single']) == len(observer.components[time]['alive-single'])
+    assert time in loaded.components
+    assert 1000 not in loaded.components
+    assert sorted(loaded.components) == sorted(observer.components)
+
+
+def test_memory_lazy_processes(tmp_path):
+    observer, config = observe(tmp_path, 'delta')
+    path = str(tmp_path / 'memory')
+    observer.dump_memory(path)
+    loaded = apgol.GolObserver.from_memory_dump(path, None, config)
+    times = loaded.environment.get_times()
+    # processes and detection create only the components processes refer to
+    processes = loaded.get_all_processes()
+    with redirect_stdout(StringIO()):
+        loaded.detect_computation()
+    assert not any(time in dict.keys(loaded.components) for time in times)
+    # decoding their times later keeps these components
+    components = {id(comp) for time in times for comps in loaded.components[time].values() for comp in comps}
+    assert all(id(comp) in components for process in processes for comp in process.start | process.end)
+
+
+def test_packed_history_needs_frames():
+    with pytest.raises(ValueError):
+        apgol.GolEnvironment(None, [0, 0, 4, 4], 'packed')
@@ -0,0 +1,68 @@
+
+# Reading and writing .rle and .mc files.
+
+from os.path import abspath, dirname, join as path_join
+
+import numpy as np
+import pytest
+
+import patterns
+import quadtree
+
+REPOSITORY_PATH = dirname(dirname(abspath(__file__)))
+
+
+def make_cells(seed=0):
+    rng = np.random.default_rng(seed)
+    # negative positions and a long run, longer than an RLE line
+    cells = patterns.array_to_cells(rng.random((50, 90)) < 0.3, (-20, -7))
+    return cells | {(x, 60) for x in range(-30, 100)}
+
+
+@pytest.mark.parametrize('suffix', ['.rle', '.mc'])
+def test_round_trip(tmp_path, suffix):
+    cells = make_cells()
+    path = str(tmp_path / f'pattern{suffix}')
+    patterns.write_pattern(path, cells, '23/36')
+    assert patterns.read_pattern(path) == (cells, 'B36/S23')
+    values, origin, rule = patterns.read_pattern_array(path)
+    assert patterns.array_to_cells(values, origin) == cells
+    assert rule == 'B36/S23'
+
+
+@pytest.mark.parametrize('suffix', ['.rle', '.mc'])
+def test_round_trip_empty(tmp_path, suffix):
+    path = str(tmp_path / f'empty{suffix}')
+    patterns.write_pattern(path, set())
+    assert patterns.read_pattern(path) == (set(), 'B3/S23')
+
+
+@pytest.mark.parametrize('name', ['and-gate.rle', 'and-gate-double.rle', 'test-world.mc'])
+def test_rle_mc_conversion(tmp_path, name):
+    cells, rule = patterns.read_pattern(path_join(REPOSITORY_PATH, name))
+    assert cells
+    for suffix in ('.rle', '.mc'):
+        path = str(tmp_path / f'pattern{suffix}')
+        patterns.write_pattern(path, cells, rule)
+        assert patterns.read_pattern(path) == (cells, rule)
+
+
+def test_mc_file_round_trip(tmp_path):
+    # nodes, rule and header line are kept as they are
+    path = path_join(REPOSITORY_PATH, 'test-world.mc')
+    store, root, level, rule, header = quadtree.read_mc(path)
+    copy_path = str(tmp_path / 'test-world.mc')
+    quadtree.write_mc(copy_path, store, root, level, rule, header)
+    with open(path) as f, open(copy_path) as copy_f:
+        assert copy_f.read() == f.read()
+
+
+def test_rle_array_with_size(tmp_path):
+    path = tmp_path / 'glider.rle'
+    path.write_text('#CXRLE Pos=3,-2\nx = 3, y = 3, rule = B3/S23\nbo$2bo$3o!\n')
+    values, origin, rule = patterns.read_rle_array(str(path))
+    assert origin == (3, -2)
+    assert values.tolist() == [[0, 1, 0], [0, 0, 1], [1, 1, 1]]
+    path.write_text('x = 2, y = 2\n3o!\n')
+    with pytest.raises(ValueError):
+        patterns.read_rle_array(str(path))
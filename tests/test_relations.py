@@ -0,0 +1,61 @@
+
+# Batch relation recognisers against the per-pair ones.
+
+from configparser import ConfigParser
+
+import pytest
+
+import apgol
+import engine
+
+GLIDER = [(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)]
+BLOCK = [(6, 6), (7, 6), (6, 7), (7, 7)]
+RECT = [-1, -1, 11, 10]
+GENERATIONS = 3
+
+
+def make_observer(history_mode):
+    environment = apgol.GolEnvironment(engine.Engine(GLIDER + BLOCK), RECT, history_mode)
+    environment.setup()
+    for _ in range(GENERATIONS):
+        environment.simulate_step()
+    observer = apgol.GolObserver(environment, ConfigParser())
+    observer.component_recognisers['dead'] = lambda space, time: not observer._is_component_alive(space, time)
+    for time in environment.get_times():
+        observer.recognise_components('alive-single', time)
+        spaces = [frozenset([cell]) for cell in environment.get_cells(time) if not cell.value]
+        observer.recognise_components('dead', time, spaces)
+    return observer
+
+
+def get_relations(observer, kinds):
+    """Set of (time, kind, ends), where ends are pairs of component kind and
+    locations. Ends of links are unordered, as the batch recogniser finds
+    each link once."""
+    def get_end(comp):
+        return comp.kind, tuple(sorted(cell.location for cell in comp.space))
+    relations = set()
+    for time, kinds_relations in observer.relations.items():
+        for kind in kinds:
+            for relation in kinds_relations[kind]:
+                ends = (get_end(relation.first), get_end(relation.second))
+                if kind == 'alive-single-link':
+                    ends = tuple(sorted(ends))
+                relations.add((time, kind, ends))
+    return relations
+
+
+@pytest.mark.parametrize('history_mode', ['full', 'delta', 'quadtree'])
+@pytest.mark.parametrize('skip_double_dead', [True, False])
+def test_batch_relations_equal_per_pair(history_mode, skip_double_dead):
+    kinds = list(make_observer('full').relation_batch_recognisers)
+    batch = make_observer(history_mode)
+    batch.recognise_all_relations(kinds, skip_double_dead=skip_double_dead)
+    per_pair = make_observer(history_mode)
+    per_pair.relation_batch_recognisers = {}
+    per_pair.recognise_all_relations(kinds, skip_double_dead=skip_double_dead)
+
+    relations = get_relations(batch, kinds)
+    assert relations == get_relations(per_pair, kinds)
+    double_dead = any(first[0] == second[0] == 'dead' for (_, _, (first, second)) in relations)
+    assert double_dead != skip_double_dead
@@ -0,0 +1,101 @@
+
+# Observations written to an SQLite store, across resumed runs.
+
+from os.path import abspath, dirname, join as path_join
+from shutil import copyfile
+
+import golicat
+import patterns
+import sqlstore
+
+REPOSITORY_PATH = dirname(dirname(abspath(__file__)))
+
+GLIDER = [(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)]
+BLINKER = [(12, 3), (13, 3), (14, 3)]
+BLOCK = [(4, 12), (5, 12), (4, 13), (5, 13)]
+
+
+def observe(directory, generations, resume=False, cells=GLIDER + BLINKER + BLOCK):
+    """Observer of a run writing a checkpoint log and a store to
+    `directory`, resuming a run aborted before if `resume`."""
+    config_path = str(directory / 'config.ini')
+    copyfile(path_join(REPOSITORY_PATH, 'config.ini'), config_path)
+    config = golicat.load_config(config_path, [
+        ('main', 'load_memory', 'false'),
+        ('main', 'save_memory', 'false'),
+        ('main', 'write_checkpoint', 'true'),
+        ('main', 'resume_checkpoint', str(resume).lower()),
+        ('main', 'write_store', 'true'),
+        ('cache', 'enabled', 'false'),
+        ('environment', 'history', 'full'),
+        ('observer', 'generations', str(generations)),
+        ('observer', 'observe_episodes_only', 'false'),
+        ('observer', 'phase_reflect', 'false'),
+        ('observer', 'phase_detect_computation', 'false'),
+        ('debug', 'verbose_observe', 'false'),
+        ('profile', 'enabled', 'false'),
+    ])
+    pattern_path = str(directory / 'pattern.rle')
+    patterns.write_rle(pattern_path, cells)
+    observer, _ = golicat.run(pattern_path, config)
+    return observer, str(directory / config.get('main', 'path_store'))
+
+
+def get_process(process):
+    def get_space(comp):
+        return comp.kind, comp.time, tuple(sorted(cell.location for cell in comp.space))
+    return process.kind, tuple(sorted(map(get_space, process.start))), tuple(sorted(map(get_space, process.end)))
+
+
+def touches(process, rect):
+    left, top, right, bottom = rect
+    cells = [cell.location for comp in process.start | process.end for cell in comp.space]
+    return (max(x for (x, _) in cells) >= left and min(x for (x, _) in cells) <= right
+            and max(y for (_, y) in cells) >= bottom and min(y for (_, y) in cells) <= top)
+
+
+def test_store_resumed_run(tmp_path):
+    observe(tmp_path, 3)
+    observer, store_path = observe(tmp_path, 7, resume=True)
+    store = sqlstore.ObservationStore(store_path)
+    try:
+        # the resumed run continues the stored one
+        assert len(store.get_runs()) == 1
+        processes = observer.get_all_processes()
+        proc_ids = store.query_process_ids()
+        stored = store.get_processes(proc_ids)
+        assert sorted(get_process(stored[pi]) for pi in proc_ids) == sorted(map(get_process, processes))
+
+        for rect in [(0, 4, 4, 0), (10, 5, 15, 2), (-5, 20, 20, -5), (30, 40, 31, 39)]:
+            expected = sorted(get_process(process) for process in processes if touches(process, rect))
+            assert sorted(map(get_process, store.query_processes(rect=rect))) == expected
+
+        next_procs, _ = observer.get_process_adjacency()
+        links = {(get_process(process), get_process(next_proc))
+                 for (process, next_processes) in next_procs.items() for next_proc in next_processes}
+        assert links
+        stored_links = {(get_process(stored[proc_from]), get_process(stored[proc_to]))
+                        for (proc_from, procs_to) in store.query_process_links(proc_ids).items()
+                        for proc_to in procs_to}
+        assert stored_links == links
+    finally:
+        store.close()
+
+
+def test_store_runs_apart(tmp_path):
+    observer, store_path = observe(tmp_path, 4)
+    first_run = sqlstore.ObservationStore(store_path)
+    first_run_id, first_ids = first_run.run_id, first_run.query_process_ids()
+    first_run.close()
+    # a run that is not resumed gets its own run in the same file
+    other_observer, _ = observe(tmp_path, 2, cells=BLINKER)
+    store = sqlstore.ObservationStore(store_path)
+    try:
+        assert [run_id for (run_id, _, _) in store.get_runs()] == [first_run_id, store.run_id]
+        assert len(store.query_process_ids()) == len(other_observer.get_all_processes())
+        first_run = sqlstore.ObservationStore(store_path, run_id=first_run_id)
+        assert first_run.query_process_ids() == first_ids
+        assert len(first_ids) == len(observer.get_all_processes())
+        first_run.close()
+    finally:
+        store.close()